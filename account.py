@@ -0,0 +1,188 @@
+import asyncio
+import logging
+import time
+from ccxt.base.errors import NotSupported
+
+logger = logging.getLogger(__name__)
+
+
+class AccountCache:
+    """Keš stanja naloga (balans, pozicije, margina) iz user-data stream-a.
+
+    watch_balance i watch_positions drže keš ažurnim bez REST poziva;
+    fetch_balance/fetch_positions se zovu samo pri startu, posle prekida
+    stream-a i retko periodično (uniMMR ne stiže kroz stream). Trading
+    petlja čita keš direktno, a balans, uniMMR i pozicije se upisuju u
+    deljeno stanje, odakle ih api.py čita iz svoje replike. Worker procesi
+    ShardedEngine-a ne otvaraju svoje stream-ove, već preko follow() prate
+    ono što glavni proces objavi u stanju.
+
+    Keš je `live` tek kad su oba stream-a isporučila bar jednu poruku i od
+    tada nisu pukla. Dok nije, current_position() ide na REST, a periodična
+    resinhronizacija radi na svakih `fallback_interval` sekundi. Klijent bez
+    user-data stream-ova (NotSupported) ne vrti stream u krug sa REST
+    resinhronizacijom posle svakog pokušaja, već ostaje na periodičnoj.
+    """
+
+    def __init__(self, state=None, currency='USDT', resync_interval=300.0, retry_delay=5.0, fallback_interval=30.0):
+        self.state = state
+        self.currency = currency
+        self.resync_interval = resync_interval
+        self.retry_delay = retry_delay
+        self.fallback_interval = fallback_interval
+        self.balance = {'free': 0.0, 'used': 0.0, 'total': 0.0}
+        self.positions = {}
+        self.unimmr = 0.0
+        self.updated = None
+        self._listeners = []
+        self._tasks = []
+        self._streaming = set()
+
+    def add_listener(self, callback):
+        """Registruje callback(position) koji se poziva za svaku promenu pozicije."""
+        self._listeners.append(callback)
+
+    @property
+    def free(self):
+        return self.balance['free']
+
+    @property
+    def live(self):
+        return self._streaming == {'balance', 'positions'}
+
+    def position(self, symbol):
+        return self.positions.get(symbol, {'symbol': symbol, 'contracts': 0, 'side': None, 'entryPrice': None})
+
+    async def current_position(self, exchange, symbol):
+        """Pozicija iz keša dok su stream-ovi živi, inače sveža iz REST-a (i upisana u keš)."""
+        if self.live:
+            return self.position(symbol)
+        fresh = [p for p in await exchange.fetch_positions([symbol]) if p['symbol'] == symbol]
+        self.apply_position(fresh[0] if fresh else {'symbol': symbol, 'contracts': 0})
+        self.publish()
+        return self.position(symbol)
+
+    def apply_balance(self, balance):
+        account = balance.get(self.currency) or {}
+        total = account.get('total') or 0.0
+        self.balance = {
+            'free': account.get('free') if account.get('free') is not None else total,
+            'used': account.get('used') or 0.0,
+            'total': total
+        }
+        info = balance.get('info') or {}
+        if isinstance(info, dict) and info.get('totalMaintMargin') is not None:
+            # Odnos kapitala i margine održavanja (kao uniMMR; manji = bliže likvidaciji)
+            maint = float(info['totalMaintMargin'])
+            self.unimmr = float(info['totalMarginBalance']) / maint if maint else 0.0
+        self.updated = time.time()
+
+    def apply_position(self, position):
+        symbol = position['symbol']
+        if position.get('contracts'):
+            self.positions[symbol] = position
+        else:
+            self.positions.pop(symbol, None)
+        self.updated = time.time()
+        for callback in self._listeners:
+            callback(position)
+
+    def publish(self):
+        if self.state is None:
+            return
+        self.state.update({
+            'balance': self.free,
+            'unimmr': self.unimmr,
+            'account': {
+                'balance': dict(self.balance),
+                'positions': {s: {'side': p.get('side'), 'contracts': p.get('contracts'),
+                                  'entry_price': p.get('entryPrice'), 'unrealized_pnl': p.get('unrealizedPnl')}
+                              for s, p in self.positions.items()},
+                'updated': self.updated
+            }
+        })
+
+    async def resync(self, exchange):
+        """Puni ceo keš iz REST-a."""
+        self.apply_balance(await exchange.fetch_balance())
+        fresh = {p['symbol']: p for p in await exchange.fetch_positions() if p.get('contracts')}
+        for symbol in set(self.positions) - set(fresh):
+            self.apply_position({'symbol': symbol, 'contracts': 0})
+        for position in fresh.values():
+            self.apply_position(position)
+        self.publish()
+        logger.info(f"Nalog resinhronizovan: {self.currency} {self.free}, pozicija {len(self.positions)}")
+
+    def start(self, exchange):
+        """Pokreće stream-ove (jednom po procesu, naredni pozivi ne rade ništa)."""
+        if self._tasks:
+            return
+        self._tasks = [
+            asyncio.create_task(self._watch(exchange, 'balance', self._watch_balance), name="account:balance"),
+            asyncio.create_task(self._watch(exchange, 'positions', self._watch_positions), name="account:positions"),
+            asyncio.create_task(self._periodic_resync(exchange), name="account:resync")
+        ]
+
+    def follow(self, state):
+        """Puni keš iz 'account' ključa deljenog stanja (replika u worker procesu)."""
+        state.add_listener(self._on_state)
+
+    def _on_state(self, version, changes):
+        account = changes.get('account')
+        if not account:
+            return
+        self.balance = dict(account['balance'])
+        self.unimmr = changes.get('unimmr', self.unimmr)
+        fresh = {symbol: {'symbol': symbol, 'side': p['side'], 'contracts': p['contracts'],
+                          'entryPrice': p['entry_price'], 'unrealizedPnl': p['unrealized_pnl']}
+                 for symbol, p in account['positions'].items()}
+        for symbol in set(self.positions) - set(fresh):
+            self.apply_position({'symbol': symbol, 'contracts': 0})
+        for symbol, position in fresh.items():
+            if self.positions.get(symbol) != position:
+                self.apply_position(position)
+        self.updated = account['updated']
+
+    async def _watch_balance(self, exchange):
+        self.apply_balance(await exchange.watch_balance())
+        self.publish()
+
+    async def _watch_positions(self, exchange):
+        for position in await exchange.watch_positions():
+            self.apply_position(position)
+        self.publish()
+
+    async def _watch(self, exchange, name, step):
+        while True:
+            try:
+                await step(exchange)
+                self._streaming.add(name)
+            except asyncio.CancelledError:
+                raise
+            except NotSupported as e:
+                self._streaming.discard(name)
+                logger.warning(f"Klijent nema {name} stream ({e}), nalog se prati periodičnim REST-om")
+                return
+            except Exception as e:
+                self._streaming.discard(name)
+                logger.error(f"Prekid user-data stream-a: {e}, resinhronizacija za {self.retry_delay:.0f}s")
+                await asyncio.sleep(self.retry_delay)
+                try:
+                    await self.resync(exchange)
+                except Exception as e:
+                    logger.error(f"Greška pri resinhronizaciji naloga: {e}")
+
+    async def _periodic_resync(self, exchange):
+        while True:
+            try:
+                await self.resync(exchange)
+            except Exception as e:
+                logger.error(f"Greška pri resinhronizaciji naloga: {e}")
+            await asyncio.sleep(self.resync_interval if self.live else self.fallback_interval)
+
+    async def close(self):
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+        self._streaming.clear()
@@ -1,19 +1,43 @@
-import json
 import logging
 from fastapi import FastAPI, WebSocket
-from fastapi.responses import FileResponse
+from fastapi.responses import FileResponse, PlainTextResponse
 from fastapi.middleware.cors import CORSMiddleware
 import asyncio
+from contextlib import asynccontextmanager
+from state import StateStore
+from broadcast import BroadcastHub
+from scanner import WallScanner
+from metrics import REGISTRY
+from logger import setup_logging
+from config import (DATA_FILE, STATE_SOCKET, STATE_SNAPSHOT_INTERVAL, SCANNER_INTERVAL, SCANNER_DEPTH,
+                    SCANNER_STREAM_CHUNK, SCANNER_WEIGHT_PER_MINUTE, SCANNER_SPREAD_PCT, SCANNER_PROCESSES,
+                    LOG_LEVEL, LOG_LEVELS, LOG_RATE)
 
-# Konfiguracija logovanja
+# Konfiguracija logovanja (samo konzola, kroz red u pozadinsku nit)
+setup_logging(level=LOG_LEVEL, levels=LOG_LEVELS, rate=LOG_RATE)
 logger = logging.getLogger(__name__)
-logger.setLevel(logging.INFO)
-handler = logging.StreamHandler()
-handler.setFormatter(logging.Formatter('%(asctime)s - %(levelname)s - %(message)s'))
-logger.addHandler(handler)
+
+# Replika deljenog stanja, vlasnik je trading proces (main.py)
+state = StateStore(DATA_FILE, snapshot_interval=STATE_SNAPSHOT_INTERVAL)
+hub = BroadcastHub(state)
+scanner = None
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    global scanner
+    await state.connect(STATE_SOCKET)
+    if SCANNER_INTERVAL > 0:
+        scanner = WallScanner(limit=SCANNER_DEPTH, chunk_size=SCANNER_STREAM_CHUNK,
+                              weight_per_minute=SCANNER_WEIGHT_PER_MINUTE, spread_pct=SCANNER_SPREAD_PCT,
+                              processes=SCANNER_PROCESSES)
+        scanner.start(SCANNER_INTERVAL)
+    yield
+    if scanner:
+        await scanner.close()
+    await state.close()
 
 # FastAPI aplikacija
-app = FastAPI()
+app = FastAPI(lifespan=lifespan)
 
 # CORS middleware za frontend
 app.add_middleware(
@@ -27,6 +51,9 @@ app.add_middleware(
 # Globalna promenljiva iz main.py
 trading_task_running = False
 
+# Komande koje izvršava trading proces (main.handle_command)
+TRADING_COMMANDS = ('disable_tp_sl', 'close_position')
+
 @app.get("/logs/orderbook.png")
 async def serve_orderbook_image(t: str = None):
     """Vraća orderbook.png iz logs foldera."""
@@ -43,101 +70,109 @@ async def manual_control(command: dict):
     value = command.get("value", "on")
     logger.info(f"Manual kontrola: {cmd}, vrednost: {value}")
 
-    try:
-        with open("/app/data.json", "r") as f:
-            data = json.load(f)
-    except Exception as e:
-        logger.error(f"Greška pri čitanju data.json: {e}")
-        data = {
-            'price': 0, 'support': 0, 'resistance': 0, 'position': 'None',
-            'balance': 0, 'unimmr': 0, 'logs': [], 'manual': 'off',
-            'rokada': 'off', 'trade_amount': 0.01, 'leverage': 1, 'rsi': 'off'
-        }
-
     if cmd == "toggle":
-        data['manual'] = value
+        changes = {'manual': value}
     elif cmd in ["rokada_on", "rokada_off"]:
-        data['rokada'] = "on" if cmd == "rokada_on" else "off"
+        changes = {'rokada': "on" if cmd == "rokada_on" else "off"}
+    elif cmd in TRADING_COMMANDS:
+        if not state.connected:
+            # Komanda ne može da se isporuči, pa manual mod ostaje kakav je bio
+            logger.error(f"Komanda {cmd} nije izvršena: trading proces nije povezan")
+            return {"status": "error", "command": cmd, "message": "Trading proces nije povezan"}
+        # Komanda ide direktno trading procesu; manual mod se uključuje pre nje
+        state.update({'manual': "on"})
+        args = {'symbol': command['symbol']} if command.get('symbol') else {}
+        try:
+            reply = await state.request(cmd, args)
+        except (ConnectionError, TimeoutError) as e:
+            logger.error(f"Komanda {cmd} nije izvršena: {e}")
+            return {"status": "error", "command": cmd, "message": str(e)}
+        logger.info(f"Komanda {cmd}: {reply['status']}")
+        return {"command": cmd, "value": value, **reply}
     else:
-        data['manual'] = "on"
-        data['manual_command'] = cmd
+        logger.error(f"Nepoznata manual komanda: {cmd}")
+        return {"status": "error", "command": cmd, "message": f"Nepoznata komanda: {cmd}"}
 
-    try:
-        with open("/app/data.json", "w") as f:
-            json.dump(data, f, indent=2)
-        logger.info(f"data.json ažuriran sa komandom: {cmd}")
-    except Exception as e:
-        logger.error(f"Greška pri pisanju u data.json: {e}")
+    state.update(changes)
+    logger.info(f"Stanje ažurirano sa komandom: {cmd}")
 
     return {"status": "success", "command": cmd, "value": value}
 
 @app.post("/update_data")
 async def update_data(updates: dict):
-    """Ažurira data.json sa novim podacima."""
-    logger.info(f"Ažuriranje data.json: {updates}")
-    try:
-        with open("/app/data.json", "r") as f:
-            data = json.load(f)
-    except Exception as e:
-        logger.error(f"Greška pri čitanju data.json: {e}")
-        data = {
-            'price': 0, 'support': 0, 'resistance': 0, 'position': 'None',
-            'balance': 0, 'unimmr': 0, 'logs': [], 'manual': 'off',
-            'rokada': 'off', 'trade_amount': 0.01, 'leverage': 1, 'rsi': 'off'
-        }
-
-    data.update(updates)
-    try:
-        with open("/app/data.json", "w") as f:
-            json.dump(data, f, indent=2)
-        logger.info("data.json uspešno ažuriran")
-    except Exception as e:
-        logger.error(f"Greška pri pisanju u data.json: {e}")
+    """Ažurira deljeno stanje sa novim podacima."""
+    logger.info(f"Ažuriranje stanja: {updates}")
+    state.update(updates)
+    logger.info("Stanje uspešno ažurirano")
 
     return {"status": "success", "updates": updates}
 
 @app.get("/get_data")
 async def get_data():
-    """Vraća trenutne podatke iz data.json."""
-    try:
-        with open("/app/data.json", "r") as f:
-            data = json.load(f)
-        logger.info(f"Vraćam podatke iz data.json: {data}")
-        return data
-    except Exception as e:
-        logger.error(f"Greška pri čitanju data.json: {e}")
-        default_data = {
-            'price': 0, 'support': 0, 'resistance': 0, 'position': 'None',
-            'balance': 0, 'unimmr': 0, 'logs': [], 'manual': 'off',
-            'rokada': 'off', 'trade_amount': 0.01, 'leverage': 1, 'rsi': 'off'
-        }
-        return default_data
+    """Vraća trenutne podatke iz deljenog stanja."""
+    data = state.snapshot()
+    logger.debug(f"Vraćam podatke iz stanja (verzija {state.version})")
+    return data
+
+@app.get("/metrics", response_class=PlainTextResponse)
+async def metrics_endpoint():
+    """Prometheus metrike api procesa."""
+    return REGISTRY.render()
+
+@app.get("/account")
+async def get_account():
+    """Balans, margina i pozicije iz keša naloga trading procesa (bez poziva berzi)."""
+    return {**(state.get('account') or {}), 'unimmr': state.get('unimmr', 0)}
+
+@app.get("/walls")
+async def get_walls(limit: int = 50):
+    """Rangirana tabela najvećih zidova po simbolu iz skenera."""
+    if scanner is None:
+        return {"status": "error", "message": "Skener nije uključen (SCANNER_INTERVAL)"}
+    return scanner.report(limit)
+
+async def _wait_disconnect(websocket: WebSocket):
+    """Čeka da klijent zatvori vezu (dolazne poruke se ignorišu)."""
+    while True:
+        message = await websocket.receive()
+        if message['type'] == 'websocket.disconnect':
+            return
 
 @app.websocket("/ws")
 async def websocket_endpoint(websocket: WebSocket):
-    """WebSocket za real-time ažuriranje frontenda."""
+    """WebSocket za real-time ažuriranje frontenda (snapshot pa samo izmene)."""
     await websocket.accept()
     logger.info("WebSocket konekcija uspostavljena")
+    subscriber = hub.subscribe({
+        'isLive': True,
+        'takeFromHere': False,
+        'tradeAtNight': False,
+        'advancedMode': False,
+        'isRunning': trading_task_running
+    })
+    disconnected = asyncio.create_task(_wait_disconnect(websocket))
     try:
         while True:
+            getter = asyncio.create_task(subscriber.get())
+            await asyncio.wait({getter, disconnected}, return_when=asyncio.FIRST_COMPLETED)
+            if not getter.done():
+                getter.cancel()
+                break
             try:
-                with open("/app/data.json", "r") as f:
-                    data = json.load(f)
-                data.update({
-                    'isLive': True,
-                    'takeFromHere': False,
-                    'tradeAtNight': False,
-                    'advancedMode': False,
-                    'isRunning': trading_task_running
-                })
-                await websocket.send_json(data)
+                await websocket.send_json(getter.result())
                 logger.debug("Poslati podaci preko WebSocket-a")
             except Exception as e:
                 logger.error(f"Greška pri slanju WebSocket poruke: {e}")
                 break
-            await asyncio.sleep(1)
+            if subscriber.dropped:
+                break
     except Exception as e:
         logger.error(f"WebSocket greška: {e}")
     finally:
-        await websocket.close()
-        logger.info("WebSocket konekcija zatvorena")
\ No newline at end of file
+        hub.unsubscribe(subscriber)
+        disconnected.cancel()
+        try:
+            await websocket.close()
+        except Exception:
+            pass
+        logger.info("WebSocket konekcija zatvorena")
@@ -0,0 +1,178 @@
+import argparse
+import logging
+import numpy as np
+from config import STOP_LOSS_OFFSET, PRICE_PRECISION
+
+SIDE = {'LONG': 1, 'SHORT': -1}
+OUTCOMES = ('unfilled', 'take_profit', 'stop_loss', 'open')  # Vrednosti polja 'outcome' po indeksu
+
+
+def load_csv(path):
+    """Učitava top-of-book snimke iz CSV-a sa kolonama timestamp,bid,ask (sa zaglavljem).
+
+    Za snimke iz replay.OrderBookRecorder koristiti OrderBookRecording.top_of_book().
+    """
+    data = np.loadtxt(path, delimiter=',', skiprows=1, usecols=(0, 1, 2), ndmin=2)
+    return data[:, 0], data[:, 1], data[:, 2]
+
+
+def signals_to_arrays(signals, stop_loss=STOP_LOSS_OFFSET):
+    """Pretvara listu signala (sa 'timestamp') u nizove i primenjuje SL/TP kao watch_orderbook."""
+    take_profit = stop_loss * 2
+    times = np.array([s['timestamp'] for s in signals], dtype=float)
+    sides = np.array([SIDE[s['type']] for s in signals], dtype=np.int8)
+    entries = np.array([s['entry_price'] for s in signals], dtype=float)
+    stops = np.round(entries - sides * stop_loss, PRICE_PRECISION)
+    targets = np.round(entries + sides * take_profit, PRICE_PRECISION)
+    return times, sides, entries, stops, targets
+
+
+def _first_hit(values, start, stop, threshold, below, chunk=4096):
+    """Prvi indeks u [start, stop) gde je values <= threshold (below) odnosno >= threshold, ili -1."""
+    i = start
+    while i < stop:
+        j = min(i + chunk, stop)
+        window = values[i:j]
+        hits = window <= threshold if below else window >= threshold
+        k = int(hits.argmax())
+        if hits[k]:
+            return i + k
+        i = j
+    return -1
+
+
+def run_backtest(timestamps, bids, asks, signals, latency=0.0, entry_timeout=60.0,
+                 amount=1.0, fee_rate=0.0, dedupe=True):
+    """Simulira limit ulaze i SL/TP izlaze za signale nad top-of-book nizovima.
+
+    LONG limit se puni kad ask padne na ulaz ili ispod, SHORT kad bid dostigne
+    ulaz; nalog postaje aktivan tek posle `latency` sekundi, a otkazuje se
+    ako se ne napuni za `entry_timeout`. Izlaz je prvi dodir stop-a ili
+    take-profit-a (po bid za LONG, ask za SHORT), po ceni iz knjige. Ako je
+    dedupe uključen, isti (smer, ulaz) se ne otvara ponovo dok prethodni traje.
+    `signals` je lista signala ili tuple iz signals_to_arrays.
+    """
+    timestamps = np.asarray(timestamps, dtype=float)
+    bids = np.asarray(bids, dtype=float)
+    asks = np.asarray(asks, dtype=float)
+    if not isinstance(signals, tuple):
+        signals = signals_to_arrays(signals)
+    times, sides, entries, stops, targets = signals
+    n = len(timestamps)
+    count = len(times)
+
+    trades = np.zeros(count, dtype=[('signal_time', 'f8'), ('side', 'i1'), ('entry', 'f8'),
+                                    ('fill_time', 'f8'), ('exit_time', 'f8'), ('exit', 'f8'),
+                                    ('pnl', 'f8'), ('outcome', 'i1'), ('skipped', '?')])
+    trades['signal_time'] = times
+    trades['side'] = sides
+    trades['entry'] = entries
+    trades['fill_time'] = np.nan
+    trades['exit_time'] = np.nan
+    trades['exit'] = np.nan
+
+    # Indeks snimka od kog je nalog aktivan i do kog važi
+    active = np.searchsorted(timestamps, times + latency, side='left')
+    expiry = np.searchsorted(timestamps, times + latency + entry_timeout, side='right')
+    busy_until = {}
+
+    for k in range(count):
+        side = sides[k]
+        key = (side, entries[k])
+        if dedupe and busy_until.get(key, -np.inf) > times[k]:
+            trades['skipped'][k] = True
+            continue
+        start = int(active[k])
+        if side > 0:
+            fill = _first_hit(asks, start, int(expiry[k]), entries[k], below=True)
+        else:
+            fill = _first_hit(bids, start, int(expiry[k]), entries[k], below=False)
+        if fill < 0:
+            busy_until[key] = timestamps[min(int(expiry[k]), n - 1)] if n else times[k]
+            continue
+        trades['fill_time'][k] = timestamps[fill]
+        # Izlaz se proverava od sledećeg snimka posle punjenja
+        if side > 0:
+            stop_hit = _first_hit(bids, fill + 1, n, stops[k], below=True)
+            target_hit = _first_hit(bids, fill + 1, stop_hit if stop_hit >= 0 else n, targets[k], below=False)
+            prices = bids
+        else:
+            stop_hit = _first_hit(asks, fill + 1, n, stops[k], below=False)
+            target_hit = _first_hit(asks, fill + 1, stop_hit if stop_hit >= 0 else n, targets[k], below=True)
+            prices = asks
+        if target_hit >= 0:
+            exit_index, outcome = target_hit, 1
+        elif stop_hit >= 0:
+            exit_index, outcome = stop_hit, 2
+        else:
+            exit_index, outcome = n - 1, 3
+        exit_price = prices[exit_index]
+        fees = fee_rate * (entries[k] + exit_price) * amount
+        trades['exit_time'][k] = timestamps[exit_index]
+        trades['exit'][k] = exit_price
+        trades['pnl'][k] = (exit_price - entries[k]) * side * amount - fees
+        trades['outcome'][k] = outcome
+        busy_until[key] = timestamps[exit_index] if outcome != 3 else np.inf
+    return trades
+
+
+def summarize(trades):
+    """Sumarni pokazatelji: broj trgovina, win rate, PnL, max drawdown, latencija punjenja."""
+    closed = trades[(trades['outcome'] == 1) | (trades['outcome'] == 2)]
+    filled = trades[~np.isnan(trades['fill_time'])]
+    wins = int((closed['pnl'] > 0).sum())
+    order = np.argsort(closed['exit_time'], kind='stable')
+    equity = np.cumsum(closed['pnl'][order])
+    drawdown = float((np.maximum.accumulate(equity) - equity).max()) if len(equity) else 0.0
+    return {
+        'signals': int(len(trades)),
+        'skipped': int(trades['skipped'].sum()),
+        'filled': int(len(filled)),
+        'closed': int(len(closed)),
+        'take_profit': int((trades['outcome'] == 1).sum()),
+        'stop_loss': int((trades['outcome'] == 2).sum()),
+        'open': int((trades['outcome'] == 3).sum()),
+        'win_rate': wins / len(closed) if len(closed) else 0.0,
+        'total_pnl': float(trades['pnl'].sum()),
+        'avg_pnl': float(closed['pnl'].mean()) if len(closed) else 0.0,
+        'max_drawdown': drawdown,
+        'avg_time_to_fill': float((filled['fill_time'] - filled['signal_time']).mean()) if len(filled) else 0.0
+    }
+
+
+def latency_sensitivity(timestamps, bids, asks, signals, latencies=(0.0, 0.05, 0.1, 0.25, 0.5, 1.0), **kwargs):
+    """Ponavlja backtest za različita kašnjenja i vraća {latency: summary}."""
+    if not isinstance(signals, tuple):
+        signals = signals_to_arrays(signals)
+    return {latency: summarize(run_backtest(timestamps, bids, asks, signals, latency=latency, **kwargs))
+            for latency in latencies}
+
+
+if __name__ == "__main__":
+    from replay import OrderBookRecording, synthetic_books, replay
+
+    parser = argparse.ArgumentParser(description="Backtest signala iz generate_signals nad snimljenim knjigama")
+    parser.add_argument('path', nargs='?', help="snimak iz replay.OrderBookRecorder (bez njega sintetički podaci)")
+    parser.add_argument('--count', type=int, default=5000, help="broj sintetičkih knjiga")
+    parser.add_argument('--rokada', default='off')
+    parser.add_argument('--timeout', type=float, default=60.0, help="trajanje limit naloga u sekundama")
+    parser.add_argument('--fee', type=float, default=0.0, help="provizija po strani (udeo)")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.WARNING)
+    logging.getLogger().setLevel(logging.WARNING)
+    if args.path:
+        recording = OrderBookRecording(args.path)
+        timestamps, bids, asks = recording.top_of_book()
+        signals = replay(recording, rokada_status=args.rokada)['signals']
+    else:
+        books = list(synthetic_books(args.count, seed=42))
+        timestamps = np.array([b['timestamp'] for b in books])
+        bids = np.array([b['bids'][0, 0] for b in books])
+        asks = np.array([b['asks'][0, 0] for b in books])
+        signals = replay(books, rokada_status=args.rokada)['signals']
+    results = latency_sensitivity(timestamps, bids, asks, signals, entry_timeout=args.timeout, fee_rate=args.fee)
+    for latency, summary in results.items():
+        print(f"latency={latency:.2f}s trgovina={summary['closed']} win_rate={summary['win_rate']:.2%} "
+              f"pnl={summary['total_pnl']:.6f} drawdown={summary['max_drawdown']:.6f} "
+              f"tp={summary['take_profit']} sl={summary['stop_loss']} otvoreno={summary['open']}")
@@ -0,0 +1,149 @@
+import argparse
+import json
+import logging
+import os
+import subprocess
+import time
+import tracemalloc
+import numpy as np
+from orderbook import filter_walls, filter_walls_reference, detect_trend, LocalOrderBook
+from levels import generate_signals
+from replay import synthetic_books
+
+LEVELS = (20, 100, 500, 1000)
+WALL_DENSITIES = (0.0, 0.05, 0.2)
+RESULTS_DIR = 'bench_results'
+
+
+def make_books(levels, wall_density, count, seed=7):
+    """Sintetičke knjige u ccxt obliku (liste [cena, količina]) kao što stižu iz watch_order_book."""
+    return [{'bids': b['bids'].tolist(), 'asks': b['asks'].tolist()}
+            for b in synthetic_books(count, levels=levels, wall_density=wall_density, seed=seed)]
+
+
+def _stages(book):
+    """Faze per-tick puta; svaka je (naziv, funkcija bez argumenata) nad istom knjigom."""
+    mid = (book['bids'][0][0] + book['asks'][0][0]) / 2
+    local = LocalOrderBook(depth=max(len(book['bids']), len(book['asks'])))
+    local.apply_snapshot(book['bids'], book['asks'])
+    walls = filter_walls(book, mid)
+    trend = detect_trend(book, mid)
+    return [
+        ('to_array', lambda: (np.array(book['bids']), np.array(book['asks']))),
+        ('local_book_snapshot', lambda: local.apply_snapshot(book['bids'], book['asks'])),
+        ('local_book_apply', lambda: local.apply_book(book['bids'], book['asks'])),
+        ('filter_walls', lambda: filter_walls(book, mid)),
+        ('filter_walls_reference', lambda: filter_walls_reference(book, mid)),
+        ('filter_walls_local', lambda: filter_walls(local, mid)),
+        ('detect_trend', lambda: detect_trend(book, mid)),
+        ('detect_trend_local', lambda: detect_trend(local, mid)),
+        ('generate_signals', lambda: generate_signals(mid, walls, trend, 'on')),
+    ]
+
+
+def _percentiles(samples_ns):
+    samples = np.asarray(samples_ns, dtype=float) / 1000.0
+    return {
+        'p50_us': float(np.percentile(samples, 50)),
+        'p90_us': float(np.percentile(samples, 90)),
+        'p99_us': float(np.percentile(samples, 99)),
+        'max_us': float(samples.max()),
+        'mean_us': float(samples.mean())
+    }
+
+
+def _allocations(func, repeat=20):
+    """Neto zadržani blokovi i vršna memorija po pozivu (tracemalloc, posebna tura)."""
+    tracemalloc.start()
+    try:
+        func()
+        tracemalloc.reset_peak()
+        before = tracemalloc.take_snapshot()
+        for _ in range(repeat):
+            func()
+        after = tracemalloc.take_snapshot()
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    retained = sum(stat.count_diff for stat in after.compare_to(before, 'lineno') if stat.count_diff > 0)
+    return {'net_blocks_per_call': retained / repeat, 'peak_kib': peak / 1024}
+
+
+def run(levels=LEVELS, densities=WALL_DENSITIES, books=50, rounds=20):
+    """Meri svaku fazu za svaku kombinaciju dubine i gustine zidova."""
+    results = {}
+    for depth in levels:
+        for density in densities:
+            samples = {}
+            allocations = {}
+            for book in make_books(depth, density, books):
+                for name, func in _stages(book):
+                    timings = samples.setdefault(name, [])
+                    for _ in range(rounds):
+                        started = time.perf_counter_ns()
+                        func()
+                        timings.append(time.perf_counter_ns() - started)
+                    if name not in allocations:
+                        allocations[name] = _allocations(func)
+            key = f"levels={depth},walls={density}"
+            results[key] = {name: {**_percentiles(timings), **allocations[name]}
+                            for name, timings in samples.items()}
+    return results
+
+
+def _git_commit():
+    try:
+        return subprocess.check_output(['git', 'rev-parse', '--short', 'HEAD'], text=True).strip()
+    except Exception:
+        return 'unknown'
+
+
+def save(results, directory=RESULTS_DIR):
+    """Snima rezultate kao <commit>.json da bi se mogli porediti između commit-ova."""
+    os.makedirs(directory, exist_ok=True)
+    commit = _git_commit()
+    path = os.path.join(directory, f"{commit}.json")
+    with open(path, 'w') as f:
+        json.dump({'commit': commit, 'created': time.time(), 'results': results}, f, indent=2)
+    return path
+
+
+def compare(old_path, results, threshold=0.10):
+    """Ispisuje p50 razliku naspram starog fajla i označava regresije veće od `threshold`."""
+    with open(old_path, 'r') as f:
+        old = json.load(f)
+    regressions = 0
+    for key, stages in results.items():
+        for name, stats in stages.items():
+            previous = old['results'].get(key, {}).get(name)
+            if not previous:
+                continue
+            change = stats['p50_us'] / previous['p50_us'] - 1 if previous['p50_us'] else 0.0
+            flag = ' REGRESIJA' if change > threshold else ''
+            regressions += bool(flag)
+            print(f"{key:<26} {name:<24} {previous['p50_us']:>10.1f} -> {stats['p50_us']:>10.1f} us ({change:+.1%}){flag}")
+    return regressions
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Microbenchmark per-tick signal pipeline-a")
+    parser.add_argument('--levels', type=int, nargs='+', default=list(LEVELS))
+    parser.add_argument('--densities', type=float, nargs='+', default=list(WALL_DENSITIES))
+    parser.add_argument('--books', type=int, default=50, help="broj različitih knjiga po kombinaciji")
+    parser.add_argument('--rounds', type=int, default=20, help="ponavljanja po knjizi")
+    parser.add_argument('--compare', help="JSON prethodnog merenja za poređenje")
+    parser.add_argument('--no-save', action='store_true')
+    args = parser.parse_args()
+
+    # Pipeline loguje svaki tick, što ne treba da ulazi u merenje
+    logging.disable(logging.INFO)
+    results = run(args.levels, args.densities, args.books, args.rounds)
+    for key, stages in results.items():
+        print(key)
+        for name, stats in stages.items():
+            print(f"  {name:<24} p50={stats['p50_us']:>9.1f}us p99={stats['p99_us']:>9.1f}us "
+                  f"blocks={stats['net_blocks_per_call']:>7.1f} peak={stats['peak_kib']:>8.1f}KiB")
+    if not args.no_save:
+        print(f"Rezultati snimljeni u {save(results)}")
+    if args.compare:
+        raise SystemExit(1 if compare(args.compare, results) else 0)
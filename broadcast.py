@@ -0,0 +1,84 @@
+import asyncio
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+class Subscriber:
+    """Jedan WebSocket klijent sa ograničenim redom poruka.
+
+    Kada se red napuni, poruke koje čekaju se spajaju (conflation) u jednu,
+    tako da spor klijent dobija samo poslednje vrednosti. Klijent koji ni
+    posle max_conflations spajanja ne pročita ništa se izbacuje.
+    """
+
+    def __init__(self, queue_size=16, max_conflations=100):
+        self.queue = asyncio.Queue(maxsize=queue_size)
+        self.max_conflations = max_conflations
+        self.conflations = 0
+        self.dropped = False
+
+    def push(self, message):
+        if self.dropped:
+            return
+        try:
+            self.queue.put_nowait(message)
+            return
+        except asyncio.QueueFull:
+            pass
+        merged = self.queue.get_nowait()
+        while not self.queue.empty():
+            merged = _merge(merged, self.queue.get_nowait())
+        self.queue.put_nowait(_merge(merged, message))
+        self.conflations += 1
+        if self.conflations > self.max_conflations:
+            self.dropped = True
+            logger.warning("Spor WebSocket klijent izbačen iz broadcast-a")
+
+    async def get(self):
+        message = await self.queue.get()
+        self.conflations = 0
+        return message
+
+
+def _merge(older, newer):
+    """Spaja dve poruke; snapshot ostaje snapshot, ključevi iz novije pobeđuju."""
+    return {
+        'type': 'snapshot' if 'snapshot' in (older['type'], newer['type']) else 'delta',
+        'version': newer['version'],
+        'data': {**older['data'], **newer['data']}
+    }
+
+
+class BroadcastHub:
+    """Jedan producent (listener na StateStore) koji deli izmene svim klijentima.
+
+    Novi klijent prvo dobija ceo snapshot, posle toga samo promenjene ključeve.
+    Dok se stanje ne menja, nikome se ništa ne šalje.
+    """
+
+    def __init__(self, state, queue_size=16, max_conflations=100):
+        self.state = state
+        self.queue_size = queue_size
+        self.max_conflations = max_conflations
+        self.subscribers = set()
+        state.add_listener(self._on_change)
+
+    def _on_change(self, version, changes):
+        message = {'type': 'delta', 'version': version, 'data': changes}
+        for subscriber in list(self.subscribers):
+            subscriber.push(message)
+            if subscriber.dropped:
+                self.subscribers.discard(subscriber)
+
+    def subscribe(self, extras=None):
+        """Registruje klijenta i stavlja mu ceo snapshot (plus extras) kao prvu poruku."""
+        subscriber = Subscriber(self.queue_size, self.max_conflations)
+        data = self.state.snapshot()
+        data.update(extras or {})
+        subscriber.push({'type': 'snapshot', 'version': self.state.version, 'data': data})
+        self.subscribers.add(subscriber)
+        return subscriber
+
+    def unsubscribe(self, subscriber):
+        self.subscribers.discard(subscriber)
@@ -7,6 +7,13 @@ load_dotenv()
 api_key = os.getenv('API_KEY')
 api_secret = os.getenv('API_SECRET')
 
+def perpetual_symbols(markets):
+    """Aktivni USD-M perpetual simboli iz učitanih market-a."""
+    return [
+        symbol for symbol, market in markets.items()
+        if market['active'] and market.get('swap') and market.get('linear')
+    ]
+
 async def check_markets():
     exchange = ccxt.binance({
         'apiKey': api_key,
@@ -20,10 +27,7 @@ async def check_markets():
     try:
         await exchange.load_markets()
         markets = exchange.markets
-        perpetual_futures = [
-            symbol for symbol, market in markets.items()
-            if market['active'] and market['type'] == 'future'
-        ]
+        perpetual_futures = perpetual_symbols(markets)
         print("Dostupni USD-M Perpetual Futures simboli:", perpetual_futures)
     except Exception as e:
         print(f"Greška: {str(e)}")
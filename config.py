@@ -10,6 +10,7 @@ MIN_WALL_VOLUME = float(os.getenv('MIN_WALL_VOLUME', 10.0))
 HILL_WALL_VOLUME = float(os.getenv('HILL_WALL_VOLUME', 50.0))
 MOUNTAIN_WALL_VOLUME = float(os.getenv('MOUNTAIN_WALL_VOLUME', 100.0))
 EPIC_WALL_VOLUME = float(os.getenv('EPIC_WALL_VOLUME', 500.0))
+WALL_WINDOW = int(os.getenv('WALL_WINDOW', 10))  # Broj nivoa u jednom klasteru (zidu)
 
 # Preciznost
 PRICE_PRECISION = int(os.getenv('PRICE_PRECISION', 5))
@@ -18,4 +19,58 @@ VOLUME_PRECISION = int(os.getenv('VOLUME_PRECISION', 2))
 # Strategija
 TARGET_DIGITS = [int(d) for d in os.getenv('TARGET_DIGITS', '2,3,7,8').split(',')]
 SPECIAL_DIGITS = [int(d) for d in os.getenv('SPECIAL_DIGITS', '1,9').split(',')]
-PROFIT_TARGET = float(os.getenv('PROFIT_TARGET', 0.00010))  # 2:1 u odnosu na stop-loss
\ No newline at end of file
+PROFIT_TARGET = float(os.getenv('PROFIT_TARGET', 0.00010))  # 2:1 u odnosu na stop-loss
+STOP_LOSS_OFFSET = float(os.getenv('STOP_LOSS_OFFSET', 0.00005))  # SL udaljenost od ulaza, TP je 2x
+
+# Deljeno stanje između main i api procesa
+DATA_FILE = os.getenv('DATA_FILE', '/app/data.json')
+STATE_SOCKET = os.getenv('STATE_SOCKET', '/app/run/state.sock')
+STATE_SNAPSHOT_INTERVAL = float(os.getenv('STATE_SNAPSHOT_INTERVAL', 1.0))
+
+# Snimanje orderbook-ova za replay (prazno = isključeno)
+RECORD_PATH = os.getenv('RECORD_PATH', '')
+
+# Simboli kojima se trguje (zarezom odvojeni) i broj worker procesa za engine
+SYMBOLS = [s.strip() for s in os.getenv('SYMBOLS', os.getenv('PAR', 'ETH/BTC')).split(',') if s.strip()]
+ENGINE_WORKERS = int(os.getenv('ENGINE_WORKERS', 1))
+# Uzastopne greške pipeline-a posle kojih ga supervisor restartuje
+PIPELINE_MAX_FAILURES = int(os.getenv('PIPELINE_MAX_FAILURES', 10))
+
+# Skener zidova na svim perpetual simbolima (0 = isključen)
+SCANNER_INTERVAL = float(os.getenv('SCANNER_INTERVAL', 0))
+SCANNER_DEPTH = int(os.getenv('SCANNER_DEPTH', 50))
+SCANNER_STREAM_CHUNK = int(os.getenv('SCANNER_STREAM_CHUNK', 50))  # simbola po depth pretplati
+SCANNER_SPREAD_PCT = float(os.getenv('SCANNER_SPREAD_PCT', 0.002))  # raspon klastera relativno na mid cenu
+SCANNER_PROCESSES = int(os.getenv('SCANNER_PROCESSES', 2))
+
+# Binance limit težine REST zahteva je 2400 po minutu po IP adresi i dele ga trading (main)
+# i skener (api), pa oba procesa računaju svoj deo iz istog budžeta (ostatak do 2400 je rezerva)
+IP_WEIGHT_BUDGET = float(os.getenv('IP_WEIGHT_BUDGET', 2000))
+SCANNER_WEIGHT_SHARE = float(os.getenv('SCANNER_WEIGHT_SHARE', 0.3))  # deo budžeta za skener kad je uključen
+SCANNER_WEIGHT_PER_MINUTE = IP_WEIGHT_BUDGET * SCANNER_WEIGHT_SHARE if SCANNER_INTERVAL > 0 else 0.0
+RATE_LIMIT_WEIGHT = IP_WEIGHT_BUDGET - SCANNER_WEIGHT_PER_MINUTE
+RATE_LIMIT_RESERVE = float(os.getenv('RATE_LIMIT_RESERVE', 0.2))  # deo budžeta rezervisan za naloge
+
+# Najveća starost orderbook-a (po timestamp-u berze) na kojoj se još trguje
+BOOK_MAX_AGE_MS = float(os.getenv('BOOK_MAX_AGE_MS', 2000))
+
+# Rezervna WebSocket pretplata na orderbook i prag posle kog se izvor smatra prekinutim
+FEED_STANDBY = os.getenv('FEED_STANDBY', '1') == '1'
+FEED_GAP_TIMEOUT_MS = float(os.getenv('FEED_GAP_TIMEOUT_MS', 3000))
+
+# Dijagnostika: prag blokade event loop-a i spore iteracije watch_orderbook-a
+LOOP_LAG_THRESHOLD_MS = float(os.getenv('LOOP_LAG_THRESHOLD_MS', 250))
+SLOW_TICK_MS = float(os.getenv('SLOW_TICK_MS', 100))
+
+# Logovanje: globalni nivo, nivoi po modulu ("orderbook=DEBUG,feed=WARNING"),
+# rotacija bot.log po veličini i najviše poruka u sekundi po šablonu (0 = bez limita)
+LOG_LEVEL = os.getenv('LOG_LEVEL', 'INFO').upper()
+LOG_LEVELS = dict((name.strip(), level.strip().upper()) for name, level in
+                  (item.split('=', 1) for item in os.getenv('LOG_LEVELS', '').split(',') if '=' in item))
+LOG_MAX_BYTES = int(os.getenv('LOG_MAX_BYTES', 10 * 1024 * 1024))
+LOG_BACKUPS = int(os.getenv('LOG_BACKUPS', 5))
+LOG_RATE = float(os.getenv('LOG_RATE', 5))
+
+# Keš metapodataka marketa na disku (load_markets samo kad keš istekne)
+MARKET_CACHE_PATH = os.getenv('MARKET_CACHE_PATH', '/app/cache/markets.json')
+MARKET_CACHE_TTL = float(os.getenv('MARKET_CACHE_TTL', 3600))
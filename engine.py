@@ -0,0 +1,244 @@
+import asyncio
+import logging
+import multiprocessing
+import os
+import queue
+import time
+from logger import forward_logging
+
+logger = logging.getLogger(__name__)
+
+
+class SymbolHealth:
+    """Zdravlje jednog simbola; pipeline zove tick() po obrađenoj knjizi.
+
+    Posle degraded_after uzastopnih grešaka bez uspešnog tika status prelazi
+    u 'degraded', a prvi sledeći tick ga vraća u 'running'.
+    """
+
+    def __init__(self, symbol, degraded_after=3):
+        self.symbol = symbol
+        self.degraded_after = degraded_after
+        self.status = 'starting'
+        self.ticks = 0
+        self.errors = 0
+        self.failures = 0
+        self.restarts = 0
+        self.last_tick = None
+        self.last_error = None
+        self.feed = None
+
+    def tick(self):
+        self.ticks += 1
+        self.last_tick = time.time()
+        self.failures = 0
+        if self.status == 'degraded':
+            self.status = 'running'
+
+    def error(self, e):
+        self.errors += 1
+        self.failures += 1
+        self.last_error = str(e)
+        if self.status == 'running' and self.failures >= self.degraded_after:
+            self.status = 'degraded'
+
+    def to_dict(self):
+        return {
+            'status': self.status,
+            'ticks': self.ticks,
+            'errors': self.errors,
+            'failures': self.failures,
+            'restarts': self.restarts,
+            'last_tick': self.last_tick,
+            'last_error': self.last_error,
+            'feed': self.feed,
+            'worker': os.getpid()
+        }
+
+
+class TradingEngine:
+    """Po jedan nezavisan pipeline task po simbolu nad zajedničkim exchange klijentom.
+
+    pipeline(exchange, symbol, health) je korutina koja radi dok ne bude
+    otkazana. Ako pukne, greška ostaje izolovana na taj simbol: beleži se u
+    health i pipeline se ponovo pokreće sa eksponencijalnim backoff-om.
+    """
+
+    def __init__(self, exchange, pipeline, restart_delay=1.0, max_restart_delay=60.0):
+        self.exchange = exchange
+        self.pipeline = pipeline
+        self.restart_delay = restart_delay
+        self.max_restart_delay = max_restart_delay
+        self.tasks = {}
+        self.health = {}
+
+    def start(self, symbols):
+        for symbol in symbols:
+            if symbol in self.tasks:
+                continue
+            self.health[symbol] = SymbolHealth(symbol)
+            self.tasks[symbol] = asyncio.create_task(self._supervise(symbol), name=f"pipeline:{symbol}")
+
+    async def _supervise(self, symbol):
+        health = self.health[symbol]
+        delay = self.restart_delay
+        while True:
+            health.status = 'running'
+            started = time.monotonic()
+            try:
+                await self.pipeline(self.exchange, symbol, health)
+                health.status = 'stopped'
+                return
+            except asyncio.CancelledError:
+                health.status = 'stopped'
+                raise
+            except Exception as e:
+                health.error(e)
+                health.status = 'restarting'
+                logger.error(f"Pipeline za {symbol} pao: {e}, restart za {delay:.0f}s")
+            # Backoff se resetuje ako je pipeline radio duže od maksimalne pauze
+            if time.monotonic() - started > self.max_restart_delay:
+                delay = self.restart_delay
+            await asyncio.sleep(delay)
+            delay = min(delay * 2, self.max_restart_delay)
+            health.restarts += 1
+
+    async def run(self, symbols):
+        """Pokreće sve simbole i čeka dok engine ne bude otkazan."""
+        self.start(symbols)
+        try:
+            await asyncio.gather(*self.tasks.values())
+        finally:
+            await self.stop()
+
+    async def stop(self):
+        tasks = list(self.tasks.values())
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        self.tasks = {}
+
+    def health_report(self):
+        return {symbol: health.to_dict() for symbol, health in self.health.items()}
+
+    def worker_reports(self):
+        """Svi pipeline-i rade u ovom procesu, pa nema izveštaja drugih procesa."""
+        return {}
+
+
+def shard(symbols, workers):
+    """Deli simbole u `workers` grupa (round-robin), prazne grupe se izostavljaju."""
+    groups = [symbols[i::workers] for i in range(max(1, workers))]
+    return [group for group in groups if group]
+
+
+def _worker_main(symbols, exchange_factory, pipeline, prepare, health_queue, interval, log_queue=None, report=None):
+    """Ulazna tačka worker procesa: sopstvena petlja, exchange i engine za grupu simbola."""
+    if log_queue is not None:
+        forward_logging(log_queue)
+
+    async def main():
+        if prepare:
+            await prepare()
+        exchange = exchange_factory()
+        try:
+            await exchange.load_markets()
+            engine = TradingEngine(exchange, pipeline)
+            engine.start(symbols)
+            while True:
+                health_queue.put({'pid': os.getpid(), 'health': engine.health_report(),
+                                  'report': report() if report else None})
+                await asyncio.sleep(interval)
+        finally:
+            await exchange.close()
+
+    try:
+        asyncio.run(main())
+    except KeyboardInterrupt:
+        pass
+
+
+class ShardedEngine:
+    """Raspoređuje grupe simbola na worker procese kad jedna petlja postane CPU-bound.
+
+    Svaki proces ima svoj exchange klijent i TradingEngine. Workeri šalju
+    health izveštaje kroz multiprocessing red; proces koji umre se ponovo
+    pokreće, a njegovi simboli se do tada prijavljuju kao 'failed'.
+    exchange_factory, pipeline i prepare moraju biti funkcije na nivou modula
+    (prenose se u spawn proces po imenu). Sa `log_queue` (logger.worker_log_queue)
+    workeri logove šalju glavnom procesu umesto da sami pišu u log fajl.
+    `report()` (takođe funkcija na nivou modula) se zove u workeru uz svaki
+    health izveštaj, a poslednji rezultat po workeru vraća worker_reports()
+    (npr. metrike i kašnjenje petlje za /metrics i /loop glavnog procesa).
+    """
+
+    def __init__(self, exchange_factory, pipeline, workers, prepare=None, interval=1.0, restart_delay=5.0,
+                 log_queue=None, report=None):
+        self.exchange_factory = exchange_factory
+        self.pipeline = pipeline
+        self.workers = workers
+        self.prepare = prepare
+        self.interval = interval
+        self.restart_delay = restart_delay
+        self.log_queue = log_queue
+        self.report = report
+        self._reports = {}
+        self._context = multiprocessing.get_context('spawn')
+        self._health_queue = self._context.Queue()
+        self._processes = {}
+        self._health = {}
+
+    def _spawn(self, index, group):
+        process = self._context.Process(
+            target=_worker_main,
+            args=(group, self.exchange_factory, self.pipeline, self.prepare, self._health_queue, self.interval,
+                  self.log_queue, self.report),
+            name=f"engine-shard-{index}", daemon=True)
+        process.start()
+        self._processes[index] = (process, group)
+        logger.info(f"Pokrenut worker {process.pid} za {group}")
+
+    async def run(self, symbols):
+        for index, group in enumerate(shard(symbols, self.workers)):
+            self._spawn(index, group)
+        try:
+            while True:
+                self._drain_health()
+                for index, (process, group) in list(self._processes.items()):
+                    if process.is_alive():
+                        continue
+                    logger.error(f"Worker {process.pid} za {group} je pao (exit {process.exitcode}), restartujem")
+                    self._reports.pop(process.pid, None)
+                    for symbol in group:
+                        self._health.setdefault(symbol, {})['status'] = 'failed'
+                    await asyncio.sleep(self.restart_delay)
+                    self._spawn(index, group)
+                await asyncio.sleep(self.interval)
+        finally:
+            await self.stop()
+
+    def _drain_health(self):
+        while True:
+            try:
+                message = self._health_queue.get_nowait()
+            except queue.Empty:
+                return
+            self._health.update(message['health'])
+            if message['report'] is not None:
+                self._reports[message['pid']] = message['report']
+
+    async def stop(self):
+        for process, _ in self._processes.values():
+            process.terminate()
+        for process, _ in self._processes.values():
+            await asyncio.to_thread(process.join, 5)
+        self._processes = {}
+        self._reports = {}
+
+    def health_report(self):
+        return dict(self._health)
+
+    def worker_reports(self):
+        """Poslednji report() po PID-u živog workera."""
+        self._drain_health()
+        return dict(self._reports)
@@ -0,0 +1,257 @@
+import asyncio
+import itertools
+import time
+
+
+class FakeExchange:
+    """Lokalna zamena za ccxt binance futures klijent, za probu putanje naloga bez mreže.
+
+    Svaki REST poziv traje `latency` sekundi (jedan round-trip), a
+    create_orders šalje ceo batch u jednom round-trip-u kao Binance
+    batchOrders. `fail` je {tip naloga: broj odbijanja}, npr.
+    {'stop_market': 1} odbija prvi stop nalog. Odbijeni nalozi iz batch-a
+    vraćaju se kao kod ccxt-a: bez id-a, sa code/msg u info. Kao Binance,
+    dozvoljava samo jedan otvoren closePosition stop po simbolu i strani
+    (-4130), a reduceOnly nalozi samo smanjuju poziciju i odbijaju se dok
+    nema pozicije koju bi smanjili (-2022). Sa `marketable` se limit nalozi
+    popunjavaju odmah (ulaz preko spread-a).
+    """
+
+    def __init__(self, latency=0.05, fail=None, batch=True, mark_price=0.05, balance=100.0, marketable=False):
+        self.latency = latency
+        self.marketable = marketable
+        self.fail = dict(fail or {})
+        self.has = {'createOrders': batch}
+        self.precisionMode = 4
+        self.mark_price = mark_price
+        self.balance = balance
+        self.orders = {}
+        self.positions = {}
+        self.requests = []
+        self._ids = itertools.count(1)
+        self._streams = {}
+
+    def _stream(self, name):
+        if name not in self._streams:
+            self._streams[name] = asyncio.Queue()
+        return self._streams[name]
+
+    def _publish(self, order):
+        # watch_orders dobija svaku promenu statusa kao user-data stream
+        self._stream('orders').put_nowait(dict(order))
+
+    def _publish_position(self, symbol):
+        self._stream('positions').put_nowait(self._position(symbol))
+
+    async def _next(self, name):
+        stream = self._stream(name)
+        items = [await stream.get()]
+        while not stream.empty():
+            items.append(stream.get_nowait())
+        return items
+
+    async def load_markets(self, reload=False):
+        return {}
+
+    def market(self, symbol):
+        return {'symbol': symbol, 'precision': {'price': 0.00001}}
+
+    async def set_leverage(self, leverage, symbol=None, params={}):
+        await self._round_trip('set_leverage')
+
+    async def set_margin_mode(self, margin_mode, symbol=None, params={}):
+        await self._round_trip('set_margin_mode')
+
+    async def _round_trip(self, method):
+        self.requests.append((method, time.monotonic()))
+        await asyncio.sleep(self.latency)
+
+    def _reject(self, type, symbol=None, side=None, params=None):
+        if self.fail.get(type, 0) > 0:
+            self.fail[type] -= 1
+            return f"{type} nalog odbijen"
+        if (params or {}).get('closePosition') and any(
+                o['status'] == 'open' and o['symbol'] == symbol and o['side'] == side and o['info'].get('closePosition')
+                for o in self.orders.values()):
+            return "-4130 An open stop or take profit order with GTE and closePosition in the direction is existing"
+        if (params or {}).get('reduceOnly'):
+            position = self.positions.get(symbol)
+            if not position or position['side'] == ('long' if side == 'buy' else 'short'):
+                return "-2022 ReduceOnly Order is rejected"
+        return None
+
+    def _new_order(self, symbol, type, side, amount, price=None, params=None):
+        params = dict(params or {})
+        order = {
+            'id': str(next(self._ids)),
+            'clientOrderId': params.pop('clientOrderId', None),
+            'symbol': symbol,
+            'type': type,
+            'side': side,
+            'amount': amount,
+            'price': price,
+            'stopPrice': params.get('stopPrice'),
+            'filled': 0.0,
+            'status': 'open',
+            'timestamp': time.time() * 1000,
+            'info': params
+        }
+        self.orders[order['id']] = order
+        self._publish(order)
+        return dict(order)
+
+    async def create_order(self, symbol, type, side, amount, price=None, params={}):
+        await self._round_trip('create_order')
+        error = self._reject(type, symbol, side, params)
+        if error:
+            raise Exception(f"FakeExchange: {error}")
+        order = self._new_order(symbol, type, side, amount, price, params)
+        if type == 'market' or (type == 'limit' and self.marketable):
+            return self.fill(order['id'])
+        return order
+
+    async def create_orders(self, orders, params={}):
+        await self._round_trip('create_orders')
+        results = []
+        for o in orders:
+            error = self._reject(o['type'], o['symbol'], o['side'], o.get('params'))
+            if error:
+                results.append({'id': None, 'status': 'rejected', 'info': {'code': -2010, 'msg': error}})
+            else:
+                order = self._new_order(o['symbol'], o['type'], o['side'], o['amount'], o.get('price'), o.get('params'))
+                results.append(self.fill(order['id']) if o['type'] == 'limit' and self.marketable else order)
+        return results
+
+    async def create_limit_buy_order(self, symbol, amount, price, params={}):
+        return await self.create_order(symbol, 'limit', 'buy', amount, price, params)
+
+    async def create_limit_sell_order(self, symbol, amount, price, params={}):
+        return await self.create_order(symbol, 'limit', 'sell', amount, price, params)
+
+    async def create_market_order(self, symbol, side, amount, price=None, params={}):
+        return await self.create_order(symbol, 'market', side, amount, price, params)
+
+    async def cancel_order(self, id, symbol=None, params={}):
+        await self._round_trip('cancel_order')
+        order = self.orders.get(id)
+        if not order or order['status'] != 'open':
+            raise Exception(f"FakeExchange: nalog {id} nije otvoren")
+        order['status'] = 'canceled'
+        self._publish(order)
+        return dict(order)
+
+    async def fetch_open_orders(self, symbol=None, since=None, limit=None, params={}):
+        await self._round_trip('fetch_open_orders')
+        return [dict(o) for o in self.orders.values()
+                if o['status'] == 'open' and (symbol is None or o['symbol'] == symbol)]
+
+    async def fetch_order(self, id, symbol=None, params={}):
+        await self._round_trip('fetch_order')
+        if id not in self.orders:
+            raise Exception(f"FakeExchange: nalog {id} ne postoji")
+        return dict(self.orders[id])
+
+    def _position(self, symbol):
+        position = self.positions.get(symbol, {'contracts': 0, 'side': None, 'entryPrice': None})
+        return {'symbol': symbol, 'markPrice': self.mark_price, **position}
+
+    async def fetch_position(self, symbol, params={}):
+        await self._round_trip('fetch_position')
+        return self._position(symbol)
+
+    async def fetch_positions(self, symbols=None, params={}):
+        await self._round_trip('fetch_positions')
+        return [self._position(s) for s in self.positions if not symbols or s in symbols]
+
+    def _balance(self):
+        return {'USDT': {'free': self.balance, 'used': 0.0, 'total': self.balance},
+                'info': {'totalMaintMargin': '0', 'totalMarginBalance': str(self.balance)}}
+
+    async def fetch_balance(self, params={}):
+        await self._round_trip('fetch_balance')
+        return self._balance()
+
+    def set_balance(self, balance):
+        """Simulira promenu balansa (stiže kroz watch_balance)."""
+        self.balance = balance
+        self._stream('balance').put_nowait(self._balance())
+
+    async def watch_balance(self, params={}):
+        return (await self._next('balance'))[-1]
+
+    def push_order_book(self, symbol, bids, asks, timestamp=None, nonce=None):
+        """Simulira novu knjigu na depth stream-u (stiže kroz watch_order_book)."""
+        self._stream('book:' + symbol).put_nowait({
+            'symbol': symbol, 'bids': bids, 'asks': asks, 'nonce': nonce,
+            'timestamp': timestamp if timestamp is not None else time.time() * 1000
+        })
+
+    def drop_stream(self, symbol, error=None):
+        """Simulira prekid depth stream-a: sledeći watch_order_book podiže grešku."""
+        self._stream('book:' + symbol).put_nowait(error or Exception("FakeExchange: WebSocket prekinut"))
+
+    async def watch_order_book(self, symbol, limit=None, params={}):
+        items = await self._next('book:' + symbol)
+        for item in items:
+            if isinstance(item, Exception):
+                raise item
+        return items[-1]
+
+    async def fetch_order_book(self, symbol, limit=None, params={}):
+        await self._round_trip('fetch_order_book')
+        mid = self.mark_price
+        return {'symbol': symbol, 'bids': [[mid - 0.00001, 1.0]], 'asks': [[mid + 0.00001, 1.0]],
+                'nonce': None, 'timestamp': time.time() * 1000}
+
+    def set_mark_price(self, symbol, price):
+        """Simulira novu mark cenu (stiže kroz watch_mark_price)."""
+        self.mark_price = price
+        self._stream('mark:' + symbol).put_nowait({'symbol': symbol, 'markPrice': price})
+
+    def fill(self, id, amount=None):
+        """Simulira popunjavanje naloga (ceo ili `amount`) i menja poziciju.
+
+        reduceOnly/closePosition nalozi (i okinuti SL/TP) smanjuju poziciju,
+        ostali je otvaraju ili povećavaju. Delimično popunjen nalog ostaje otvoren.
+        """
+        order = self.orders[id]
+        amount = order['amount'] - order['filled'] if amount is None else amount
+        order['filled'] += amount
+        if order['filled'] >= order['amount']:
+            order['status'] = 'closed'
+        symbol = order['symbol']
+        position = self.positions.get(symbol)
+        if order['info'].get('reduceOnly') or order['info'].get('closePosition'):
+            if position:
+                left = 0 if order['info'].get('closePosition') else position['contracts'] - amount
+                if left > 0:
+                    position['contracts'] = left
+                else:
+                    del self.positions[symbol]
+                self._publish_position(symbol)
+        else:
+            side = 'long' if order['side'] == 'buy' else 'short'
+            if position and position['side'] == side:
+                position['contracts'] += amount
+            else:
+                self.positions[symbol] = {'contracts': amount, 'side': side,
+                                          'entryPrice': order['price'] or self.mark_price}
+            self._publish_position(symbol)
+        self._publish(order)
+        return dict(order)
+
+    async def watch_orders(self, symbol=None, since=None, limit=None, params={}):
+        return [o for o in await self._next('orders') if symbol is None or o['symbol'] == symbol]
+
+    async def watch_positions(self, symbols=None, since=None, limit=None, params={}):
+        return [p for p in await self._next('positions') if not symbols or p['symbol'] in symbols]
+
+    async def watch_mark_price(self, symbol, params={}):
+        return (await self._next('mark:' + symbol))[-1]
+
+    async def fetch_mark_price(self, symbol, params={}):
+        await self._round_trip('fetch_mark_price')
+        return {'symbol': symbol, 'markPrice': self.mark_price}
+
+    async def close(self):
+        pass
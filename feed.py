@@ -0,0 +1,267 @@
+import asyncio
+import collections
+import logging
+import random
+import time
+
+logger = logging.getLogger(__name__)
+
+
+def _now_ms():
+    return time.time() * 1000
+
+
+class FeedSource:
+    """Jedna WebSocket pretplata na orderbook (sopstveni exchange klijent)."""
+
+    def __init__(self, name, exchange):
+        self.name = name
+        self.exchange = exchange
+        self.status = 'connecting'
+        self.received = 0
+        self.reconnects = 0
+        self.gaps = 0
+        self.nonce = None
+        self.last_update = None
+        self.gap_started = None
+        self.last_error = None
+        self.task = None
+
+    def to_dict(self):
+        return {
+            'status': self.status,
+            'received': self.received,
+            'reconnects': self.reconnects,
+            'gaps': self.gaps,
+            'nonce': self.nonce,
+            'last_error': self.last_error
+        }
+
+
+class BookFeed:
+    """Konflacija orderbook stream-a: strategija uvek dobija najnoviju knjigu.
+
+    Pozadinski taskovi čitaju watch_order_book i samo pamte poslednju knjigu
+    i bude čitaoca; knjige koje stignu dok se prethodna obrađuje se
+    preskaču (broje se kao conflated). Za svaku knjigu meri se kašnjenje
+    prijema (lokalno vreme - timestamp berze), a next() vraća i starost
+    knjige u trenutku preuzimanja, pa pozivalac može da odbije trgovinu na
+    staroj knjizi.
+
+    Sa `standby` klijentom drže se dve nezavisne pretplate i prosleđuje se
+    knjiga sa većim update ID-em (nonce), pa ispad jednog izvora ne prekida
+    signale. Nonce unazad znači da je ccxt posle rupe u sekvenci ponovo
+    učitao snimak i beleži se kao rupa. Izvor koji pukne ponovo se povezuje
+    sa eksponencijalnim backoff-om i jitter-om, a trajanje rupe se meri do
+    prve sledeće knjige. Depth stream ćuti dok se knjiga ne menja, pa tišina
+    sama nije zastoj: izvor se ponovo pretplaćuje tek kad drugi izvor
+    isporuči noviju knjigu, a on ćuti duže od gap_timeout_ms. Klijenti mogu
+    biti zajednički za više simbola, pa se pri zastoju otkazuje samo
+    pretplata na simbol, ne ceo klijent. REST snimak preko
+    `snapshot_exchange` uzima se kad posle gap_timeout_ms nijedan izvor nije živ.
+    """
+
+    def __init__(self, exchange, symbol, limit=100, max_age_ms=2000, samples=1000, standby=None,
+                 snapshot_exchange=None, gap_timeout_ms=3000, backoff=1.0, max_backoff=30.0):
+        self.symbol = symbol
+        self.limit = limit
+        self.max_age_ms = max_age_ms
+        self.gap_timeout_ms = gap_timeout_ms
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        self.snapshot_exchange = snapshot_exchange
+        self.sources = [FeedSource('primary', exchange)]
+        if standby is not None:
+            self.sources.append(FeedSource('standby', standby))
+        self.received = 0
+        self.delivered = 0
+        self.conflated = 0
+        self.stale = 0
+        self.failovers = 0
+        self.snapshots = 0
+        self.gap_durations = collections.deque(maxlen=samples)
+        self.lags = collections.deque(maxlen=samples)
+        self.active = None
+        self._book = None
+        self._received_at = None
+        self._version = 0
+        self._consumed = 0
+        self._event = asyncio.Event()
+        self._error = None
+        self._watchdog = None
+
+    def start(self):
+        for source in self.sources:
+            if source.task is None or source.task.done():
+                source.task = asyncio.create_task(self._run(source), name=f"feed:{self.symbol}:{source.name}")
+        if self._watchdog is None and len(self.sources) > 1:
+            self._watchdog = asyncio.create_task(self._watch_stalls(), name=f"feed:{self.symbol}:watchdog")
+        return self
+
+    def _begin_gap(self, source, reason):
+        if source.gap_started is None:
+            source.gap_started = _now_ms()
+            source.gaps += 1
+            logger.warning(f"Feed {self.symbol}/{source.name}: rupa ({reason})")
+
+    def _end_gap(self, source):
+        if source.gap_started is not None:
+            self.gap_durations.append(_now_ms() - source.gap_started)
+            source.gap_started = None
+
+    async def _run(self, source):
+        attempt = 0
+        while True:
+            try:
+                while True:
+                    book = await source.exchange.watch_order_book(self.symbol, limit=self.limit)
+                    attempt = 0
+                    self._on_book(source, book)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                source.status = 'reconnecting'
+                source.last_error = str(e)
+                self._begin_gap(source, e)
+                if len(self.sources) == 1:
+                    # Bez rezervnog izvora greška ide čitaocu (watch_orderbook prelazi na REST)
+                    self._error = e
+                    self._event.set()
+            # Eksponencijalni backoff sa jitter-om da se izvori ne povezuju u istom trenutku
+            delay = min(self.max_backoff, self.backoff * 2 ** attempt) * random.uniform(0.5, 1.5)
+            attempt += 1
+            await asyncio.sleep(delay)
+            source.reconnects += 1
+
+    def _on_book(self, source, book):
+        received_at = _now_ms()
+        nonce = book.get('nonce')
+        if nonce is not None and source.nonce is not None and nonce < source.nonce:
+            # ccxt je posle rupe u update ID-evima ponovo učitao snimak
+            self._begin_gap(source, f"nonce {source.nonce} -> {nonce}")
+        self._end_gap(source)
+        source.status = 'live'
+        source.received += 1
+        source.nonce = nonce
+        source.last_update = received_at
+        self.received += 1
+        if book.get('timestamp'):
+            self.lags.append(received_at - book['timestamp'])
+        # Prosleđuje se samo knjiga novija od poslednje (drugi izvor može biti ispred)
+        if self._book is not None and source is not self.active:
+            newest = self._book.get('nonce')
+            if nonce is not None and newest is not None and nonce <= newest:
+                return
+            if nonce is None and (book.get('timestamp') or 0) <= (self._book.get('timestamp') or 0):
+                return
+            if self.active is not None and self.active.status != 'live':
+                self.failovers += 1
+                logger.warning(f"Feed {self.symbol}: prelazak na {source.name}")
+        self.active = source
+        self._book = book
+        self._received_at = received_at
+        self._version += 1
+        self._event.set()
+
+    def _stalled(self, source, now):
+        """Izvor je zaglavljen ako ćuti gap_timeout_ms, a drugi izvor je u međuvremenu isporučio noviju knjigu."""
+        if source.status != 'live' or now - source.last_update < self.gap_timeout_ms:
+            return False
+        for other in self.sources:
+            if other is source or other.status != 'live' or other.last_update <= source.last_update:
+                continue
+            if other.nonce is None or source.nonce is None or other.nonce > source.nonce:
+                return True
+        return False
+
+    async def _watch_stalls(self):
+        """Ponovo pretplaćuje izvor koji zaostaje za drugim izvorom (tiho tržište nije zastoj)."""
+        while True:
+            await asyncio.sleep(self.gap_timeout_ms / 1000)
+            now = _now_ms()
+            for source in self.sources:
+                if not self._stalled(source, now):
+                    continue
+                source.status = 'stalled'
+                self._begin_gap(source, 'zaostaje za drugim izvorom')
+                source.task.cancel()
+                await asyncio.gather(source.task, return_exceptions=True)
+                # Klijent dele i drugi simboli, pa se otkazuje samo ova pretplata
+                unwatch = getattr(source.exchange, 'un_watch_order_book', None)
+                if unwatch is not None:
+                    try:
+                        await unwatch(self.symbol)
+                    except Exception as e:
+                        logger.error(f"Feed {self.symbol}/{source.name}: greška pri odjavi pretplate: {e}")
+                source.reconnects += 1
+                source.task = asyncio.create_task(self._run(source), name=f"feed:{self.symbol}:{source.name}")
+
+    async def _snapshot(self):
+        """REST snimak kad nijedan stream ne isporučuje knjige."""
+        book = await self.snapshot_exchange.fetch_order_book(self.symbol, limit=self.limit)
+        self.snapshots += 1
+        self.active = None
+        self._book = book
+        self._received_at = _now_ms()
+        self._version += 1
+        logger.warning(f"Feed {self.symbol}: nema stream-a, koristim REST snimak")
+
+    def age_ms(self):
+        """Starost poslednje knjige po timestamp-u berze (ili vremenu prijema)."""
+        if self._book is None:
+            return None
+        origin = self._book.get('timestamp') or self._received_at
+        return _now_ms() - origin
+
+    async def next(self):
+        """Čeka knjigu noviju od poslednje preuzete i vraća (knjiga, starost u ms)."""
+        self.start()
+        while self._version == self._consumed and self._error is None:
+            self._event.clear()
+            if self.snapshot_exchange is None:
+                await self._event.wait()
+                continue
+            try:
+                await asyncio.wait_for(self._event.wait(), self.gap_timeout_ms / 1000)
+            except asyncio.TimeoutError:
+                # Živ stream koji ćuti znači da se knjiga nije menjala
+                if not any(source.status == 'live' for source in self.sources):
+                    await self._snapshot()
+        if self._error is not None:
+            error, self._error = self._error, None
+            raise error
+        self.conflated += self._version - self._consumed - 1
+        self._consumed = self._version
+        self.delivered += 1
+        age = self.age_ms()
+        if age > self.max_age_ms:
+            self.stale += 1
+        return self._book, age
+
+    def is_stale(self, age):
+        return age is not None and age > self.max_age_ms
+
+    def stats(self):
+        lags = sorted(self.lags)
+        gaps = list(self.gap_durations)
+        return {
+            'received': self.received,
+            'delivered': self.delivered,
+            'conflated': self.conflated,
+            'stale': self.stale,
+            'lag_p50_ms': round(lags[len(lags) // 2], 1) if lags else None,
+            'lag_max_ms': round(lags[-1], 1) if lags else None,
+            'active': self.active.name if self.active else None,
+            'failovers': self.failovers,
+            'snapshots': self.snapshots,
+            'gaps': len(gaps),
+            'gap_max_ms': round(max(gaps), 1) if gaps else None,
+            'gap_total_ms': round(sum(gaps), 1),
+            'sources': {s.name: s.to_dict() for s in self.sources}
+        }
+
+    async def close(self):
+        tasks = [s.task for s in self.sources if s.task] + ([self._watchdog] if self._watchdog else [])
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
@@ -1,70 +1,76 @@
 import logging
-from config import TARGET_DIGITS, SPECIAL_DIGITS, PROFIT_TARGET, MIN_WALL_VOLUME, HILL_WALL_VOLUME, MOUNTAIN_WALL_VOLUME, EPIC_WALL_VOLUME
+import numpy as np
+from config import TARGET_DIGITS, SPECIAL_DIGITS, PROFIT_TARGET, HILL_WALL_VOLUME, MOUNTAIN_WALL_VOLUME, EPIC_WALL_VOLUME, STOP_LOSS_OFFSET
+from ticks import TickScale
 
-logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
 
-def classify_wall_volume(volume):
-    if volume >= EPIC_WALL_VOLUME:
+WALL_TYPES = ("Zid", "Brdašce", "Brdo", "Planina")  # Po pragovima HILL/MOUNTAIN/EPIC
+ROKADA_OFFSET = 0.00002  # Pomeraj ulaza za rokada signale
+DEFAULT_SCALE = TickScale()  # Tik od PRICE_PRECISION decimala kad market nije poznat
+
+def classify_wall_volume(volume, hill_wall_volume=HILL_WALL_VOLUME,
+                         mountain_wall_volume=MOUNTAIN_WALL_VOLUME, epic_wall_volume=EPIC_WALL_VOLUME):
+    if volume >= epic_wall_volume:
         return "Planina"
-    elif volume >= MOUNTAIN_WALL_VOLUME:
+    elif volume >= mountain_wall_volume:
         return "Brdo"
-    elif volume >= HILL_WALL_VOLUME:
+    elif volume >= hill_wall_volume:
         return "Brdašce"
     return "Zid"
 
-def generate_signals(current_price, walls, trend, rokada_status="off"):
-    signals = []
-    support_walls = sorted(walls['support'], key=lambda x: x[1], reverse=True)
-    resistance_walls = sorted(walls['resistance'], key=lambda x: x[1], reverse=True)
+def generate_signals(current_price, walls, trend, rokada_status="off",
+                     target_digits=TARGET_DIGITS, special_digits=SPECIAL_DIGITS,
+                     hill_wall_volume=HILL_WALL_VOLUME, mountain_wall_volume=MOUNTAIN_WALL_VOLUME,
+                     epic_wall_volume=EPIC_WALL_VOLUME, scale=None):
+    """Signali sa zidova; cene se obrađuju kao celobrojni tikovi (scale: TickScale).
 
-    for price, volume in support_walls:
-        last_digit = int(str(round(price, 5))[-1])
-        wall_type = classify_wall_volume(volume)
-        if last_digit in TARGET_DIGITS:
-            if last_digit in [2, 3]:
-                signals.append({
-                    'type': 'LONG',
-                    'entry_price': price,
-                    'stop_loss': round(price - 0.00005, 5),  # 5 pipova
-                    'take_profit': round(price + 0.00010, 5),  # 2:1
-                    'wall_type': wall_type,
-                    'volume': volume
-                })
-        elif rokada_status == "on" and last_digit in SPECIAL_DIGITS and trend == 'DOWN':
-            if last_digit == 1:
-                signals.append({
-                    'type': 'SHORT',
-                    'entry_price': round(price - 0.00002, 5),
-                    'stop_loss': round(price + 0.00005, 5),  # 5 pipova
-                    'take_profit': round(price - 0.00010, 5),  # 2:1
-                    'wall_type': wall_type,
-                    'volume': volume
-                })
+    Poslednja cifra, ulaz, SL i TP se računaju nad tikovima za sve zidove
+    odjednom; u float se pretvara samo pri pravljenju signala.
+    """
+    scale = scale or DEFAULT_SCALE
+    stop_loss = scale.offset(STOP_LOSS_OFFSET)  # 5 pipova
+    take_profit = scale.offset(PROFIT_TARGET)  # 2:1
+    rokada_shift = scale.offset(ROKADA_OFFSET)
+    thresholds = [hill_wall_volume, mountain_wall_volume, epic_wall_volume]
+
+    signals = []
+    sides = (
+        # strana, LONG cifre, SHORT cifre, rokada trend, rokada cifra, smer rokade
+        ('support', [2, 3], [], 'DOWN', 1, -1),
+        ('resistance', [], [7, 8], 'UP', 9, 1),
+    )
+    for side, long_digits, short_digits, rokada_trend, rokada_digit, rokada_direction in sides:
+        levels = np.asarray(walls[side], dtype=float).reshape(-1, 2)
+        if not len(levels):
+            continue
+        levels = levels[np.argsort(-levels[:, 1], kind='stable')]
+        ticks = scale.to_ticks(levels[:, 0])
+        digits = scale.last_digit(ticks)
+        targeted = np.isin(digits, target_digits)
+        direct = targeted & np.isin(digits, long_digits + short_digits)
+        rokada = ~targeted & (digits == rokada_digit) & np.isin(digits, special_digits)
+        rokada &= rokada_status == "on" and trend == rokada_trend
+        wall_types = np.searchsorted(thresholds, levels[:, 1], side='right')
 
-    for price, volume in resistance_walls:
-        last_digit = int(str(round(price, 5))[-1])
-        wall_type = classify_wall_volume(volume)
-        if last_digit in TARGET_DIGITS:
-            if last_digit in [7, 8]:
-                signals.append({
-                    'type': 'SHORT',
-                    'entry_price': price,
-                    'stop_loss': round(price + 0.00005, 5),  # 5 pipova
-                    'take_profit': round(price - 0.00010, 5),  # 2:1
-                    'wall_type': wall_type,
-                    'volume': volume
-                })
-        elif rokada_status == "on" and last_digit in SPECIAL_DIGITS and trend == 'UP':
-            if last_digit == 9:
-                signals.append({
-                    'type': 'LONG',
-                    'entry_price': round(price + 0.00002, 5),
-                    'stop_loss': round(price - 0.00005, 5),  # 5 pipova
-                    'take_profit': round(price + 0.00010, 5),  # 2:1
-                    'wall_type': wall_type,
-                    'volume': volume
-                })
+        for i in np.flatnonzero(direct | rokada):
+            if direct[i]:
+                direction = 1 if long_digits else -1
+                entry = ticks[i]
+            else:
+                direction = rokada_direction
+                entry = ticks[i] + direction * rokada_shift
+            # SL/TP se mere od cene zida, kao i ranije
+            signals.append({
+                'type': 'LONG' if direction > 0 else 'SHORT',
+                'entry_price': scale.to_price(entry),
+                'stop_loss': scale.to_price(ticks[i] - direction * stop_loss),
+                'take_profit': scale.to_price(ticks[i] + direction * take_profit),
+                'wall_type': WALL_TYPES[wall_types[i]],
+                'volume': float(levels[i, 1])
+            })
 
     for signal in signals:
-        logging.info(f"Signal: {signal['type']} na {signal['entry_price']}, zid: {signal['wall_type']} ({signal['volume']} ETH)")
-    return signals
\ No newline at end of file
+        logger.debug("Signal: %s na %s, zid: %s (%s ETH)",
+                     signal['type'], signal['entry_price'], signal['wall_type'], signal['volume'])
+    return signals
@@ -1,6 +1,25 @@
 import sqlite3
 import os
+import asyncio
+import atexit
 import logging
+import multiprocessing
+import queue
+import time
+from collections import deque
+from datetime import datetime, timezone
+from logging.handlers import QueueHandler, QueueListener, RotatingFileHandler
+
+LOG_FORMAT = '%(asctime)s - %(levelname)s - %(message)s'
+
+# Moduli koji loguju na svakom tiku knjige; samo njihovi zapisi prolaze kroz rate limit
+HOT_PATH_LOGGERS = ('__main__', 'main', 'feed', 'orderbook', 'levels', 'scanner')
+# `extra` za događaje naloga i pozicija u tim modulima: uvek prolaze rate limit
+AUDIT = {'audit': True}
+
+_listener = None
+_worker_queue = None
+_worker_listener = None
 
 def setup_logger(name, log_file):
     """Konfiguriše logger za pisanje u fajl."""
@@ -13,6 +32,191 @@ def setup_logger(name, log_file):
     logger.addHandler(handler)
     return logger
 
+class RateLimitFilter(logging.Filter):
+    """Propušta najviše `rate` zapisa u sekundi po šablonu poruke (logger + msg).
+
+    Ključ je neformatirani šablon, pa poruke iz vruće putanje treba logovati
+    sa %-argumentima, ne f-stringom. Višak se samo broji, a broj preskočenih
+    se dopisuje sledećoj propuštenoj poruci. Ograničavaju se samo zapisi
+    logger-a iz `loggers` (i njihovih podlogger-a; None = svi). ERROR i jači
+    zapisi i zapisi sa extra=AUDIT (nalozi, pozicije) uvek prolaze.
+    """
+
+    def __init__(self, rate=5.0, burst=None, max_keys=1024, loggers=None):
+        super().__init__()
+        self.rate = rate
+        self.burst = burst or rate
+        self.max_keys = max_keys
+        self.loggers = None if loggers is None else tuple(loggers)
+        self._buckets = {}
+
+    def _limited(self, name):
+        return self.loggers is None or any(name == n or name.startswith(n + '.') for n in self.loggers)
+
+    def filter(self, record):
+        if record.levelno >= logging.ERROR or getattr(record, 'audit', False) or not self._limited(record.name):
+            return True
+        key = (record.name, record.msg)
+        now = record.created
+        bucket = self._buckets.get(key)
+        if bucket is None:
+            if len(self._buckets) >= self.max_keys:
+                self._buckets.clear()  # f-string poruke bi inače punile mapu bez kraja
+            bucket = self._buckets[key] = [self.burst, now, 0]
+        tokens = min(self.burst, bucket[0] + (now - bucket[1]) * self.rate)
+        bucket[1] = now
+        if tokens < 1:
+            bucket[0] = tokens
+            bucket[2] += 1
+            return False
+        bucket[0] = tokens - 1
+        if bucket[2]:
+            record.msg = f"{record.msg} (+{bucket[2]} preskočeno)"
+            bucket[2] = 0
+        return True
+
+class LazyQueueHandler(QueueHandler):
+    """QueueHandler koji zapis stavlja u red neformatiran.
+
+    Standardni prepare() formatira poruku u niti pozivaoca; ovde se to
+    ostavlja listener-u, pa argumenti ne smeju da se menjaju posle poziva.
+    """
+
+    def prepare(self, record):
+        return record
+
+def setup_logging(log_file=None, level='INFO', levels=None, handlers=(), max_bytes=10 * 1024 * 1024,
+                  backup_count=5, rate=5.0, console=True, rate_loggers=HOT_PATH_LOGGERS):
+    """Usmerava sve logove procesa kroz red u pozadinsku nit.
+
+    Root logger dobija samo LazyQueueHandler: poziv u petlji proverava nivo,
+    prolazi rate limit i stavlja zapis u red, a formatiranje i upis u fajl
+    (sa rotacijom po veličini), konzolu i dodatne `handlers` rade u niti
+    listener-a. `levels` je mapa ime modula -> nivo, npr. {'orderbook': 'DEBUG'}.
+    Rate limit važi samo za `rate_loggers` (moduli vruće putanje).
+    Drugi poziv u istom procesu ne radi ništa. U child procesu se log fajl
+    ne otvara: worker preko forward_logging šalje zapise glavnom procesu,
+    koji jedini piše i rotira fajl.
+    """
+    global _listener
+    if _listener is not None:
+        return _listener
+    targets = []
+    if log_file and multiprocessing.parent_process() is None:
+        if os.path.dirname(log_file) and not os.path.exists(os.path.dirname(log_file)):
+            os.makedirs(os.path.dirname(log_file))
+        targets.append(RotatingFileHandler(log_file, maxBytes=max_bytes, backupCount=backup_count,
+                                           encoding='utf-8'))
+    if console:
+        targets.append(logging.StreamHandler())
+    targets.extend(handlers)
+    for handler in targets:
+        if handler.formatter is None:
+            handler.setFormatter(logging.Formatter(LOG_FORMAT))
+
+    log_queue = queue.SimpleQueue()
+    queue_handler = LazyQueueHandler(log_queue)
+    if rate:
+        queue_handler.addFilter(RateLimitFilter(rate, loggers=rate_loggers))
+    root = logging.getLogger()
+    root.addHandler(queue_handler)
+    root.setLevel(level)
+    for name, module_level in (levels or {}).items():
+        logging.getLogger(name).setLevel(module_level)
+
+    _listener = QueueListener(log_queue, *targets, respect_handler_level=True)
+    _listener.start()
+    atexit.register(stop_logging)
+    return _listener
+
+def worker_log_queue():
+    """multiprocessing red za zapise worker procesa (pravi se pri prvom pozivu).
+
+    Zapise iz reda listener nit glavnog procesa predaje istim handler-ima
+    (fajl, konzola, log buffer dashboard-a) kao i sopstvene.
+    """
+    global _worker_queue, _worker_listener
+    if _worker_queue is None:
+        _worker_queue = multiprocessing.get_context('spawn').Queue()
+        handlers = _listener.handlers if _listener is not None else ()
+        _worker_listener = QueueListener(_worker_queue, *handlers, respect_handler_level=True)
+        _worker_listener.start()
+    return _worker_queue
+
+def forward_logging(log_queue):
+    """Preusmerava logove worker procesa u red glavnog procesa (worker_log_queue).
+
+    Zapis se formatira u workeru (argumenti ne moraju da se mogu pickle-ovati),
+    a filteri lokalnog handler-a (rate limit) ostaju na snazi.
+    """
+    global _listener
+    root = logging.getLogger()
+    handler = QueueHandler(log_queue)
+    for local in [h for h in root.handlers if isinstance(h, QueueHandler)]:
+        for log_filter in local.filters:
+            handler.addFilter(log_filter)
+        root.removeHandler(local)
+    root.addHandler(handler)
+    if _listener is not None:
+        _listener.stop()
+        _listener = None
+
+def stop_logging():
+    """Ispisuje zapise koji su ostali u redu i zaustavlja listener niti."""
+    global _listener, _worker_queue, _worker_listener
+    if _listener is not None:
+        _listener.stop()
+        _listener = None
+    if _worker_listener is not None:
+        _worker_listener.stop()
+        _worker_listener = None
+        _worker_queue = None
+
+class LogBufferHandler(logging.Handler):
+    """Čuva poslednje log linije u memoriji i odmah ih gura pretplatnicima.
+
+    Pretplatnici su asyncio redovi; emit može doći iz bilo kog thread-a pa se
+    linije predaju petlji preko call_soon_threadsafe. Ako je red pretplatnika
+    pun, izbacuje se najstarija linija.
+    """
+
+    def __init__(self, capacity=500):
+        super().__init__()
+        self.lines = deque(maxlen=capacity)
+        self._subscribers = {}
+
+    def emit(self, record):
+        try:
+            line = self.format(record)
+        except Exception:
+            self.handleError(record)
+            return
+        self.lines.append(line)
+        for subscriber, loop in list(self._subscribers.items()):
+            try:
+                loop.call_soon_threadsafe(self._offer, subscriber, line)
+            except RuntimeError:
+                self._subscribers.pop(subscriber, None)  # Petlja je zatvorena
+
+    @staticmethod
+    def _offer(subscriber, line):
+        if subscriber.full():
+            subscriber.get_nowait()
+        subscriber.put_nowait(line)
+
+    def tail(self, count=10):
+        """Vraća poslednjih `count` linija."""
+        return list(self.lines)[-count:]
+
+    def subscribe(self, queue_size=100):
+        """Vraća asyncio red u koji stižu nove linije (poziva se iz petlje)."""
+        subscriber = asyncio.Queue(maxsize=queue_size)
+        self._subscribers[subscriber] = asyncio.get_running_loop()
+        return subscriber
+
+    def unsubscribe(self, subscriber):
+        self._subscribers.pop(subscriber, None)
+
 def init_db():
     """Inicijalizuje SQLite bazu za logovanje trgovina."""
     if not os.path.exists('logs'):
@@ -24,6 +228,90 @@ def init_db():
     conn.commit()
     conn.close()
 
+class TradeJournal:
+    """Dnevnik trgovina sa jednom trajnom SQLite konekcijom (WAL) i batch upisom.
+
+    log() samo stavlja red u asyncio red i odmah se vraća; pozadinski writer
+    upisuje redove u batch-evima (kad se skupi batch_size redova ili prođe
+    flush_interval sekundi) u zasebnom thread-u, pa fsync ne blokira petlju.
+    """
+
+    def __init__(self, path='logs/trades.db', batch_size=100, flush_interval=1.0):
+        self.path = path
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self._queue = None
+        self._conn = None
+        self._writer = None
+
+    def _connect(self):
+        if os.path.dirname(self.path) and not os.path.exists(os.path.dirname(self.path)):
+            os.makedirs(os.path.dirname(self.path))
+        conn = sqlite3.connect(self.path, check_same_thread=False)
+        conn.execute('PRAGMA journal_mode=WAL')
+        conn.execute('PRAGMA synchronous=NORMAL')
+        conn.execute('''CREATE TABLE IF NOT EXISTS trades
+                        (timestamp TEXT, price REAL, level REAL, side TEXT, confidence REAL, result REAL)''')
+        conn.execute('CREATE INDEX IF NOT EXISTS idx_trades_timestamp ON trades (timestamp)')
+        conn.execute('CREATE INDEX IF NOT EXISTS idx_trades_side ON trades (side)')
+        conn.commit()
+        return conn
+
+    async def start(self):
+        """Otvara konekciju i pokreće pozadinski writer."""
+        self._conn = await asyncio.to_thread(self._connect)
+        self._queue = asyncio.Queue()
+        self._writer = asyncio.create_task(self._write_loop())
+
+    def log(self, price, level, side, confidence, result=None):
+        """Dodaje trgovinu u red za upis (ne blokira)."""
+        timestamp = datetime.now(timezone.utc).strftime('%Y-%m-%d %H:%M:%S')
+        self._queue.put_nowait((timestamp, price, level, side, confidence, result))
+
+    def _insert(self, rows):
+        with self._conn:
+            self._conn.executemany(
+                "INSERT INTO trades (timestamp, price, level, side, confidence, result) VALUES (?, ?, ?, ?, ?, ?)",
+                rows)
+
+    async def _write_loop(self):
+        stopping = False
+        while not stopping:
+            rows = []
+            item = await self._queue.get()
+            deadline = time.monotonic() + self.flush_interval
+            while item is not None:
+                rows.append(item)
+                if len(rows) >= self.batch_size:
+                    break
+                if not self._queue.empty():
+                    item = self._queue.get_nowait()
+                    continue
+                timeout = deadline - time.monotonic()
+                if timeout <= 0:
+                    break
+                try:
+                    item = await asyncio.wait_for(self._queue.get(), timeout)
+                except asyncio.TimeoutError:
+                    break
+            stopping = item is None  # None je signal za gašenje
+            if not rows:
+                continue
+            try:
+                await asyncio.to_thread(self._insert, rows)
+            except Exception as e:
+                logging.getLogger(__name__).error(f"Greška pri upisu {len(rows)} trgovina: {e}")
+
+    async def close(self):
+        """Upisuje sve što je ostalo u redu, zaustavlja writer i zatvara konekciju."""
+        if self._writer is None:
+            return
+        self._queue.put_nowait(None)
+        await self._writer
+        self._writer = None
+        await asyncio.to_thread(self._conn.close)
+        self._conn = None
+
 def log_trade(price, level, side, confidence, result=None):
     """Loguje trgovinu u SQLite bazu."""
     conn = sqlite3.connect('logs/trades.db')
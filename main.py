@@ -1,14 +1,32 @@
 import asyncio
-import ccxt.async_support as ccxt
 import os
 from dotenv import load_dotenv
 import logging
 import json
+import threading
+import time
 from fastapi import FastAPI, WebSocket
-from fastapi.responses import HTMLResponse
-from orderbook import filter_walls, detect_trend
+from fastapi.responses import HTMLResponse, PlainTextResponse
+from orderbook import filter_walls, detect_trend, LocalOrderBook
 from levels import generate_signals
-from logger import setup_logger, log_trade
+from logger import AUDIT, setup_logging, worker_log_queue, LogBufferHandler, TradeJournal
+from state import StateStore
+from config import (DATA_FILE, STATE_SOCKET, STATE_SNAPSHOT_INTERVAL, RECORD_PATH, STOP_LOSS_OFFSET, SYMBOLS, ENGINE_WORKERS,
+                    PIPELINE_MAX_FAILURES,
+                    RATE_LIMIT_WEIGHT, RATE_LIMIT_RESERVE, BOOK_MAX_AGE_MS, FEED_STANDBY, FEED_GAP_TIMEOUT_MS,
+                    LOOP_LAG_THRESHOLD_MS, SLOW_TICK_MS, LOG_LEVEL, LOG_LEVELS, LOG_MAX_BYTES, LOG_BACKUPS, LOG_RATE,
+                    MARKET_CACHE_PATH, MARKET_CACHE_TTL)
+from engine import TradingEngine, ShardedEngine
+from replay import OrderBookRecorder
+from ticks import TickScale
+from scheduler import RequestScheduler, ScheduledExchange
+from orders import place_bracket, BracketOrderError, LiveOrderIndex
+from positions import PositionMonitor
+from account import AccountCache
+from feed import BookFeed
+from metrics import REGISTRY
+from profiler import SamplingProfiler, LoopMonitor
+from session import ExchangeSession, MarketCache, create_binance
 from contextlib import asynccontextmanager
 
 # Konfiguracija logovanja
@@ -16,10 +34,13 @@ log_dir = '/app/logs'
 if not os.path.exists(log_dir):
     os.makedirs(log_dir)
 
-logger = setup_logger(__name__, os.path.join(log_dir, 'bot.log'))
-console_handler = logging.StreamHandler()
-console_handler.setFormatter(logging.Formatter('%(asctime)s - %(levelname)s - %(message)s'))
-logger.addHandler(console_handler)
+# Poslednje log linije u memoriji za live prikaz preko /ws (bez čitanja bot.log)
+log_buffer = LogBufferHandler(capacity=500)
+
+# Svi moduli loguju kroz red; fajl, konzolu i log_buffer puni pozadinska nit
+setup_logging(os.path.join(log_dir, 'bot.log'), level=LOG_LEVEL, levels=LOG_LEVELS, handlers=[log_buffer],
+              max_bytes=LOG_MAX_BYTES, backup_count=LOG_BACKUPS, rate=LOG_RATE)
+logger = logging.getLogger(__name__)
 
 # Učitavanje API ključeva
 load_dotenv()
@@ -35,15 +56,52 @@ app = FastAPI()
 # Globalne promenljive
 trading_task_running = False
 trading_task_instance = None
+engine = None
+
+# Deljeno stanje (umesto čitanja/pisanja data.json u svakoj iteraciji)
+state = StateStore(DATA_FILE, snapshot_interval=STATE_SNAPSHOT_INTERVAL).load()
+
+# Trgovine se upisuju u pozadini u batch-evima
+journal = TradeJournal(os.path.join(log_dir, 'trades.db'))
+
+# Živi ulazni nalozi po (simbol, strana, tik), sinhronizovani preko watch_orders
+live_orders = LiveOrderIndex()
+
+# Otvorene pozicije i trailing stop-ovi za sve simbole
+positions = PositionMonitor(live_orders)
+
+# Balans, pozicije i margina iz user-data stream-a (bez REST poziva u petlji)
+account = AccountCache(state)
+account.add_listener(positions.on_position)
+
+# Javni klijenti za orderbook stream-ove, zajednički za sve simbole (otvaraju se pri prvom simbolu)
+market_data = []
+
+# Kašnjenje event loop-a i profiler na zahtev (jedan u isto vreme)
+loop_monitor = LoopMonitor(threshold=LOOP_LAG_THRESHOLD_MS / 1000)
+profiler = None
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     logger.info("Pokrećem Psy Bot v3...")
+    state.set_command_handler(handle_command)
+    await state.serve(STATE_SOCKET)
+    await journal.start()
+    loop_monitor.start()
+    # Exchange klijent i marketi su spremni pre prvog start-a
+    session.warm()
     yield
     logger.info("Gasim Psy Bot v3...")
     if trading_task_instance:
         trading_task_instance.cancel()
         await asyncio.sleep(0)
+    await loop_monitor.stop()
+    await positions.close()
+    await account.close()
+    await close_market_data()
+    await session.close()
+    await journal.close()
+    await state.close()
 
 app.router.lifespan_context = lifespan
 
@@ -52,57 +110,114 @@ async def serve_index():
     with open("/html/index.html", "r") as f:
         return f.read()
 
+@app.get("/metrics", response_class=PlainTextResponse)
+async def metrics_endpoint():
+    """Prometheus metrike glavnog procesa i worker-a ShardedEngine-a (labela `worker` je PID)."""
+    reports = engine.worker_reports() if engine else {}
+    return REGISTRY.render({pid: report['metrics'] for pid, report in reports.items()})
+
+@app.post("/profile/start")
+async def profile_start(interval_ms: float = 5.0):
+    """Pokreće sampling profiler nad nitima event loop-a trading procesa."""
+    global profiler
+    if profiler and profiler.running:
+        return {"status": "error", "message": "Profiler već radi"}
+    if isinstance(engine, ShardedEngine):
+        # Profiler čita stekove niti ovog procesa, a pipeline-i rade u worker procesima
+        return {"status": "error", "message": "Profiler ne radi sa ENGINE_WORKERS > 1 (pipeline-i su u worker procesima)"}
+    profiler = SamplingProfiler(interval_ms / 1000, thread_id=threading.get_ident()).start()
+    logger.info(f"Profiler pokrenut (interval {interval_ms} ms)")
+    return {"status": "success"}
+
+@app.post("/profile/stop", response_class=PlainTextResponse)
+async def profile_stop():
+    """Zaustavlja profiler i vraća collapsed stekove (ulaz za flamegraph.pl / speedscope)."""
+    if not profiler or not profiler.running:
+        return PlainTextResponse("Profiler ne radi\n", status_code=409)
+    await asyncio.to_thread(profiler.stop)
+    logger.info(f"Profiler zaustavljen posle {profiler.duration:.1f}s, uzoraka {sum(profiler.samples.values())}")
+    return profiler.collapsed()
+
+@app.get("/profile", response_class=PlainTextResponse)
+async def profile(seconds: float = 10.0, interval_ms: float = 5.0, format: str = 'collapsed'):
+    """Profiliše `seconds` sekundi i vraća collapsed stekove ili (format=top) najskuplje funkcije."""
+    started = await profile_start(interval_ms)
+    if started['status'] != 'success':
+        return PlainTextResponse(started['message'] + "\n", status_code=409)
+    await asyncio.sleep(seconds)
+    collapsed = await profile_stop()
+    if format == 'top':
+        return PlainTextResponse(''.join(f"{row['share']:6.1%} {row['samples']:>7} {row['function']}\n"
+                                         for row in profiler.top()))
+    return collapsed
+
+@app.get("/loop")
+async def loop_stats():
+    """Kašnjenje event loop-a i poslednje blokade sa stekom koji ih je izazvao."""
+    reports = engine.worker_reports() if engine else {}
+    if not reports:
+        return loop_monitor.stats()
+    return {**loop_monitor.stats(), 'workers': {pid: report['loop'] for pid, report in reports.items()}}
+
 @app.get("/health")
 async def health_check():
-    return {"status": "healthy", "trading_active": trading_task_running}
+    symbols = engine.health_report() if engine else {}
+    status = "degraded" if any(h.get('status') in ('degraded', 'restarting', 'failed') for h in symbols.values()) else "healthy"
+    return {"status": status, "trading_active": trading_task_running, "symbols": symbols}
+
+async def handle_ws_commands(websocket: WebSocket):
+    """Prima start/stop komande sa dashboard-a dok klijent ne zatvori vezu."""
+    global trading_task_running, trading_task_instance
+    while True:
+        message = await websocket.receive()
+        if message['type'] == 'websocket.disconnect':
+            return
+        try:
+            data = json.loads(message.get('text') or '{}')
+        except ValueError:
+            continue
+        if data.get('action') == 'start' and not trading_task_running:
+            logger.info("Pokrećem trading task...")
+            trading_task_running = True
+            trading_task_instance = asyncio.create_task(trading_task())
+        elif data.get('action') == 'stop' and trading_task_running:
+            logger.info("Zaustavljam trading task...")
+            trading_task_running = False
+            if trading_task_instance:
+                trading_task_instance.cancel()
+                trading_task_instance = None
 
 @app.websocket("/ws")
 async def websocket_endpoint(websocket: WebSocket):
-    global trading_task_running, trading_task_instance
     await websocket.accept()
+    lines = log_buffer.subscribe()
+    commands = asyncio.create_task(handle_ws_commands(websocket))
     try:
+        for log in log_buffer.tail(10):
+            await websocket.send_text(log.strip())
+        # Nove linije se šalju čim se pojave u log-u
         while True:
-            try:
-                data = await websocket.receive_json()
-                if data.get('action') == 'start' and not trading_task_running:
-                    logger.info("Pokrećem trading task...")
-                    trading_task_running = True
-                    trading_task_instance = asyncio.create_task(trading_task())
-                elif data.get('action') == 'stop' and trading_task_running:
-                    logger.info("Zaustavljam trading task...")
-                    trading_task_running = False
-                    if trading_task_instance:
-                        trading_task_instance.cancel()
-                        trading_task_instance = None
-            except:
-                pass
-            log_file = os.path.join(log_dir, 'bot.log')
-            if os.path.exists(log_file):
-                with open(log_file, "r") as f:
-                    logs = f.readlines()
-                    for log in logs[-10:]:
-                        await websocket.send_text(log.strip())
-            await asyncio.sleep(5)
+            getter = asyncio.create_task(lines.get())
+            await asyncio.wait({getter, commands}, return_when=asyncio.FIRST_COMPLETED)
+            if not getter.done():
+                getter.cancel()
+                break
+            await websocket.send_text(getter.result().strip())
     except Exception as e:
         logger.error(f"Greška u WebSocket-u: {str(e)}")
     finally:
-        await websocket.close()
-
-async def fetch_balance(exchange):
-    try:
-        balance = await exchange.fetch_balance()
-        usdt_balance = balance['USDT']['free'] if 'USDT' in balance else 0
-        logger.info(f"USDT balans: {usdt_balance}")
-        return usdt_balance
-    except Exception as e:
-        logger.error(f"Greška pri dohvatanju balansa: {str(e)}")
-        return 0
+        log_buffer.unsubscribe(lines)
+        commands.cancel()
+        try:
+            await websocket.close()
+        except Exception:
+            pass
 
 async def setup_futures(exchange, symbol, leverage):
     try:
-        await exchange.set_leverage(leverage, symbol)
-        await exchange.set_margin_mode('isolated', symbol)
-        logger.info(f"Postavljen leverage {leverage}x i izolovani margin za {symbol}")
+        # Preskače se ako su leverage i margin mod već postavljeni u ovoj sesiji
+        if await session.configure(symbol, leverage, 'isolated', exchange=exchange):
+            logger.info(f"Postavljen leverage {leverage}x i izolovani margin za {symbol}", extra=AUDIT)
     except Exception as e:
         logger.error(f"Greška pri postavljanju leverage/margin za {symbol}: {str(e)}")
         raise
@@ -110,194 +225,347 @@ async def setup_futures(exchange, symbol, leverage):
 async def fetch_orderbook_rest(exchange, symbol):
     try:
         orderbook = await exchange.fetch_order_book(symbol, limit=100)
-        logger.info(f"REST API: Orderbook za {symbol} povučen")
+        logger.debug("REST API: Orderbook za %s povučen", symbol)
         return orderbook
     except Exception as e:
         logger.error(f"Greška pri REST povlačenju orderbook-a: {str(e)}")
         return None
 
 async def cancel_tp_sl(exchange, symbol):
+    """Otkazuje sve SL/TP naloge na simbolu i vraća njihove ID-eve."""
     try:
         orders = await exchange.fetch_open_orders(symbol)
-        for order in orders:
-            if order['type'] in ['stop_market', 'take_profit_market']:
-                await exchange.cancel_order(order['id'], symbol)
-                logger.info(f"Cancelovan order: {order['id']} ({order['type']})")
+        stops = [order for order in orders if order['type'] in ['stop_market', 'take_profit_market']]
+        await asyncio.gather(*(exchange.cancel_order(order['id'], symbol) for order in stops))
+        for order in stops:
+            logger.info(f"Cancelovan order: {order['id']} ({order['type']})", extra=AUDIT)
+        return [order['id'] for order in stops]
     except Exception as e:
         logger.error(f"Greška pri cancel-ovanju TP/SL: {str(e)}")
+        raise
 
 async def close_position(exchange, symbol):
+    """Zatvara poziciju market nalogom; vraća nalog ili None ako pozicije nema.
+
+    Pozicija se čita iz keša naloga samo dok su user-data stream-ovi živi,
+    inače se povlači preko REST-a da se ne zatvara zastarela količina.
+    """
     try:
-        position = await exchange.fetch_position(symbol)
+        position = await account.current_position(exchange, symbol)
         if position['contracts'] > 0:
             side = 'sell' if position['side'] == 'long' else 'buy'
             amount = position['contracts']
-            await exchange.create_market_order(symbol, side, amount, params={'closePosition': True})
-            logger.info(f"Zatvorena pozicija: {side} {amount} na {symbol}")
+            # closePosition važi samo za stop/take-profit naloge; market nalog zatvara reduceOnly sa količinom
+            order = await exchange.create_market_order(symbol, side, amount, params={'reduceOnly': True})
+            logger.info(f"Zatvorena pozicija: {side} {amount} na {symbol}", extra=AUDIT)
+            return order
+        return None
     except Exception as e:
         logger.error(f"Greška pri zatvaranju pozicije: {str(e)}")
+        raise
+
+async def handle_command(command, args):
+    """Manualne komande iz api procesa (preko state socket-a).
+
+    Izvršavaju se u sopstvenom tasku, pa ne čekaju sledeću knjigu u
+    watch_orderbook-u. Bez `symbol` argumenta komanda važi za sve simbole;
+    greška na jednom simbolu ne prekida ostale, a rezultat je po simbolu
+    ({'status': 'success', 'result': ...} ili {'status': 'error', 'message': ...}).
+    """
+    exchange = session.exchange
+    if exchange is None:
+        raise RuntimeError("Exchange sesija nije otvorena")
+    symbols = [args['symbol']] if args.get('symbol') else trading_symbols()
+    if command == 'disable_tp_sl':
+        action = cancel_tp_sl
+    elif command == 'close_position':
+        action = close_position
+    else:
+        raise ValueError(f"Nepoznata komanda: {command}")
+    results = await asyncio.gather(*(action(exchange, symbol) for symbol in symbols), return_exceptions=True)
+    report = {}
+    for symbol, result in zip(symbols, results):
+        if isinstance(result, Exception):
+            report[symbol] = {'status': 'error', 'message': str(result)}
+        else:
+            report[symbol] = {'status': 'success', 'result': result}
+    if command == 'close_position':
+        # Pozicija se briše samo za simbole koji su zaista zatvoreni
+        closed = [symbol for symbol in symbols if report[symbol]['status'] == 'success']
+        changes = {f"market:{symbol}": {**state.get(f"market:{symbol}"), 'position': 'None'}
+                   for symbol in closed if state.get(f"market:{symbol}")}
+        if trading_symbols()[0] in closed:
+            changes['position'] = 'None'
+        state.update(changes)
+    if not any(row['status'] == 'success' for row in report.values()):
+        raise RuntimeError('; '.join(f"{symbol}: {row['message']}" for symbol, row in report.items()))
+    return report
+
+def symbol_setting(symbol, key, default=None):
+    """Postavka za simbol: symbol_settings[symbol][key] iz stanja, inače globalna vrednost."""
+    overrides = state.get('symbol_settings') or {}
+    return overrides.get(symbol, {}).get(key, state.get(key, default))
 
-async def manage_trailing_stop(exchange, symbol, order, stop_loss, take_profit):
+def trading_symbols():
+    return state.get('symbols') or SYMBOLS
+
+async def watch_orderbook(exchange, symbol, recorder=None, scale=None, health=None):
+    scale = scale or TickScale()
+    book = LocalOrderBook(symbol)
+    # Manualne komande i zbirna polja dashboard-a vodi prvi simbol
+    primary = symbol == trading_symbols()[0]
+    # Uvek najnovija knjiga; petlja se budi kad stigne nova umesto fiksne pauze.
+    # Sa rezervom se knjige čitaju preko dva javna klijenta zajednička za sve
+    # simbole procesa (odvojeno od naloga i user-data stream-a).
+    sources = market_data_sources() if FEED_STANDBY else [exchange]
+    feed = BookFeed(sources[0], symbol, limit=100, max_age_ms=BOOK_MAX_AGE_MS,
+                    standby=sources[1] if FEED_STANDBY else None, snapshot_exchange=exchange,
+                    gap_timeout_ms=FEED_GAP_TIMEOUT_MS)
     try:
-        position = await exchange.fetch_position(symbol)
-        current_price = position['markPrice']
-        entry_price = order['price']
-        amount = order['amount']
-        if order['side'] == 'buy':  # LONG
-            new_stop = current_price - stop_loss
-            if new_stop > entry_price:
-                logger.info(f"Trailing stop za {symbol} pomeren na {new_stop}")
-                await exchange.create_order(
-                    symbol, 'stop_market', 'sell', amount, None,
-                    {'stopPrice': new_stop, 'closePosition': True}
-                )
-        else:  # SHORT
-            new_stop = current_price + stop_loss
-            if new_stop < entry_price:
-                logger.info(f"Trailing stop za {symbol} pomeren na {new_stop}")
-                await exchange.create_order(
-                    symbol, 'stop_market', 'buy', amount, None,
-                    {'stopPrice': new_stop, 'closePosition': True}
-                )
-    except Exception as e:
-        logger.error(f"Greška u trailing stop-loss-u za {symbol}: {str(e)}")
+        await _watch_orderbook(exchange, symbol, feed, book, primary, recorder, scale, health)
+    finally:
+        await feed.close()
 
-async def watch_orderbook(exchange, symbol):
-    global trading_task_running
+async def _watch_orderbook(exchange, symbol, feed, book, primary, recorder, scale, health):
+    # Metrike se uzimaju jednom po simbolu; upis u petlji je samo brojanje
+    stage = {name: REGISTRY.histogram('stage_seconds', "Trajanje faza per-tick puta", stage=name, symbol=symbol)
+             for name in ('filter_walls', 'detect_trend', 'generate_signals', 'orders', 'cancel_stale',
+                          'tick', 'signal_to_ack')}
+    book_age = REGISTRY.histogram('book_age_seconds', "Starost knjige pri preuzimanju (po timestamp-u berze)", symbol=symbol)
+    signals_total = REGISTRY.counter('signals_total', "Generisani signali", symbol=symbol)
+    orders_total = REGISTRY.counter('brackets_total', "Postavljeni bracket-i (ulaz+SL+TP)", symbol=symbol)
+    errors_total = REGISTRY.counter('errors_total', "Greške u petlji simbola", symbol=symbol)
+    rest_total = REGISTRY.counter('rest_fallbacks_total', "Prelasci na REST orderbook", symbol=symbol)
+    stale_total = REGISTRY.counter('stale_books_total', "Preskočene stare knjige", symbol=symbol)
+    failures = 0
     while trading_task_running:
         try:
-            # Učitaj data.json
-            with open('/app/data.json', 'r') as f:
-                data = json.load(f)
-            rokada_status = data.get('rokada', 'off')
-            trade_amount = data.get('trade_amount', 0.01)
-            leverage = data.get('leverage', 1)
-            manual_mode = data.get('manual', 'off')
-            manual_command = data.get('manual_command', '')
-
-            # Obrada manualnih komandi
-            if manual_mode == 'on' and manual_command:
-                if manual_command == 'disable_tp_sl':
-                    await cancel_tp_sl(exchange, symbol)
-                    data['manual_command'] = ''  # Reset komande
-                elif manual_command == 'close_position':
-                    await close_position(exchange, symbol)
-                    data['manual_command'] = ''
-                    data['position'] = 'None'
-                with open('/app/data.json', 'w') as f:
-                    json.dump(data, f)
-
-            orderbook = await exchange.watch_order_book(symbol, limit=100)
-            logger.info(f"WebSocket: Orderbook za {symbol} povučen")
-            current_price = (orderbook['bids'][0][0] + orderbook['asks'][0][0]) / 2
-            walls = filter_walls(orderbook, current_price)
-            trend = detect_trend(orderbook, current_price)
-            signals = generate_signals(current_price, walls, trend, rokada_status)
+            # Postavke iz deljenog stanja (memorija, bez I/O)
+            rokada_status = symbol_setting(symbol, 'rokada', 'off')
+            trade_amount = symbol_setting(symbol, 'trade_amount', 0.01)
+            manual_mode = state.get('manual', 'off')
+
+            orderbook, age = await feed.next()
+            received = time.perf_counter_ns()
+            book_age.record(age / 1000)
+            logger.debug("WebSocket: Orderbook za %s povučen (starost %.0f ms)", symbol, age)
+            if health:
+                health.feed = feed.stats()
+            if feed.is_stale(age):
+                logger.warning("Orderbook za %s je star %.0f ms (prag %s ms), ne trgujem", symbol, age, feed.max_age_ms)
+                stale_total.inc()
+                continue
+            if recorder:
+                recorder.record(orderbook)
+            # ccxt već spaja depth diff-ove; lokalna knjiga primenjuje samo nivoe koji su se promenili
+            book.apply_book(orderbook['bids'], orderbook['asks'], orderbook.get('nonce'))
+            current_price = book.mid_price
+            # Trajanje faza ove iteracije, za log spore iteracije
+            timings = {}
+            started = time.perf_counter_ns()
+            walls = filter_walls(book, current_price, scale=scale)
+            timings['filter_walls'] = stage['filter_walls'].record_ns(started)
+            started = time.perf_counter_ns()
+            trend = detect_trend(book, current_price)
+            timings['detect_trend'] = stage['detect_trend'].record_ns(started)
+            started = time.perf_counter_ns()
+            signals = generate_signals(current_price, walls, trend, rokada_status, scale=scale)
+            timings['generate_signals'] = stage['generate_signals'].record_ns(started)
+            signals_total.inc(len(signals))
 
+            wanted = set()
             for signal in signals:
-                logger.info(f"Signal za {symbol}: {signal}")
-                stop_loss = 0.00005
+                logger.info("Signal za %s: %s", symbol, dict(signal))
+                stop_loss = STOP_LOSS_OFFSET
                 take_profit = stop_loss * 2
-                signal['stop_loss'] = (
-                    round(signal['entry_price'] - stop_loss, 5)
-                    if signal['type'] == 'LONG'
-                    else round(signal['entry_price'] + stop_loss, 5)
-                )
-                signal['take_profit'] = (
-                    round(signal['entry_price'] + take_profit, 5)
-                    if signal['type'] == 'LONG'
-                    else round(signal['entry_price'] - take_profit, 5)
-                )
-
-                if manual_mode == 'off':  # Trguj samo ako nije manual mod
-                    if signal['type'] == 'LONG':
-                        order = await exchange.create_limit_buy_order(
-                            symbol, amount=trade_amount, price=signal['entry_price']
-                        )
-                        logger.info(f"Kreiran LONG nalog: {order}")
-                        await exchange.create_order(
-                            symbol, 'stop_market', 'sell', trade_amount, None,
-                            {'stopPrice': signal['stop_loss'], 'closePosition': True}
-                        )
-                        await exchange.create_order(
-                            symbol, 'take_profit_market', 'sell', trade_amount, None,
-                            {'stopPrice': signal['take_profit'], 'closePosition': True}
-                        )
-                        log_trade(
-                            signal['entry_price'], signal['entry_price'],
-                            'LONG', signal['volume'], None
-                        )
-                        asyncio.create_task(
-                            manage_trailing_stop(exchange, symbol, order, stop_loss, take_profit)
-                        )
-                    elif signal['type'] == 'SHORT':
-                        order = await exchange.create_limit_sell_order(
-                            symbol, amount=trade_amount, price=signal['entry_price']
-                        )
-                        logger.info(f"Kreiran SHORT nalog: {order}")
-                        await exchange.create_order(
-                            symbol, 'stop_market', 'buy', trade_amount, None,
-                            {'stopPrice': signal['stop_loss'], 'closePosition': True}
-                        )
-                        await exchange.create_order(
-                            symbol, 'take_profit_market', 'buy', trade_amount, None,
-                            {'stopPrice': signal['take_profit'], 'closePosition': True}
-                        )
-                        log_trade(
-                            signal['entry_price'], signal['entry_price'],
-                            'SHORT', signal['volume'], None
-                        )
-                        asyncio.create_task(
-                            manage_trailing_stop(exchange, symbol, order, stop_loss, take_profit)
+                # SL/TP u celobrojnim tikovima, u float tek za nalog
+                direction = 1 if signal['type'] == 'LONG' else -1
+                entry_tick = scale.to_ticks(signal['entry_price'])
+                signal['stop_loss'] = scale.to_price(entry_tick - direction * scale.offset(stop_loss))
+                signal['take_profit'] = scale.to_price(entry_tick + direction * scale.offset(take_profit))
+
+                side = 'buy' if signal['type'] == 'LONG' else 'sell'
+                key = live_orders.key(symbol, side, signal['entry_price'])
+                wanted.add(key)
+
+                # Trguj samo ako nije manual mod i ako isti nalog već ne čeka na berzi
+                if manual_mode == 'off' and key not in live_orders:
+                    # Ide samo ulaz; reduceOnly SL/TP Binance prima tek kad postoji pozicija (-2022)
+                    started = time.perf_counter_ns()
+                    try:
+                        bracket = await place_bracket(
+                            exchange, symbol, side, trade_amount,
+                            signal['entry_price'], signal['stop_loss'], signal['take_profit']
                         )
+                    except BracketOrderError as e:
+                        # Bracket je već povučen; ostali signali ovog tika se i dalje obrađuju
+                        logger.error("Bracket za %s nije postavljen: %s", symbol, e)
+                        errors_total.inc()
+                        continue
+                    finally:
+                        timings['orders'] = timings.get('orders', 0) + stage['orders'].record_ns(started)
+                    stage['signal_to_ack'].record_ns(received)
+                    orders_total.inc()
+                    live_orders.add(bracket)
+                    # Ulaz popunjen odmah (ili događaj stigao pre add()): SL/TP se šalju bez čekanja stream-a
+                    await live_orders.protect(exchange, bracket)
+                    order = bracket['entry']
+                    logger.info("Kreiran %s nalog: %s", signal['type'], order, extra=AUDIT)
+                    journal.log(
+                        signal['entry_price'], signal['entry_price'],
+                        signal['type'], signal['volume'], None
+                    )
+                    positions.track(bracket, stop_loss)
+
+                # Ažuriraj deljeno stanje (na disk ide periodični snimak)
+                market_key = f"market:{symbol}"
+                market = {
+                    'price': float(current_price),
+                    'position': signal['type'] if manual_mode == 'off' else state.get(market_key, {}).get('position', 'None'),
+                    'support': walls['support'][0][0] if walls['support'] else 0,
+                    'resistance': walls['resistance'][0][0] if walls['resistance'] else 0
+                }
+                state.update({market_key: market, **(market if primary else {})})
 
-                # Ažuriraj data.json
-                data['price'] = current_price
-                data['position'] = signal['type'] if manual_mode == 'off' else data['position']
-                data['support'] = walls['support'][0][0] if walls['support'] else 0
-                data['resistance'] = walls['resistance'][0][0] if walls['resistance'] else 0
-                with open('/app/data.json', 'w') as f:
-                    json.dump(data, f)
+            # Ulazi čiji signal je nestao se otkazuju
+            if manual_mode == 'off':
+                started = time.perf_counter_ns()
+                await live_orders.cancel_stale(exchange, symbol, wanted)
+                timings['cancel_stale'] = stage['cancel_stale'].record_ns(started)
+
+            elapsed = stage['tick'].record_ns(received)
+            if elapsed * 1000 > SLOW_TICK_MS:
+                slowest = max(timings, key=timings.get)
+                logger.warning("Spora iteracija za %s: %.1f ms, najduže %s (%.1f ms), faze: %s",
+                               symbol, elapsed * 1000, slowest, timings[slowest] * 1000,
+                               ', '.join(f"{name}={seconds * 1000:.1f}" for name, seconds in timings.items()))
+            failures = 0
+            if health:
+                health.tick()
 
         except Exception as e:
-            logger.error(f"Greška u WebSocket-u za {symbol}: {str(e)}, prelazim na REST")
+            logger.error("Greška u WebSocket-u za %s: %s, prelazim na REST", symbol, e)
+            errors_total.inc()
+            failures += 1
+            if failures >= PIPELINE_MAX_FAILURES:
+                # Supervisor beleži grešku i ponovo pokreće pipeline (nov feed i klijenti)
+                raise
+            rest_total.inc()
+            if health:
+                health.error(e)
             orderbook = await fetch_orderbook_rest(exchange, symbol)
             if orderbook:
-                current_price = (orderbook['bids'][0][0] + orderbook['asks'][0][0]) / 2
-                walls = filter_walls(orderbook, current_price)
-                trend = detect_trend(orderbook, current_price)
-                signals = generate_signals(current_price, walls, trend, rokada_status)
+                book.apply_snapshot(orderbook['bids'], orderbook['asks'], orderbook.get('nonce'))
+                current_price = book.mid_price
+                walls = filter_walls(book, current_price, scale=scale)
+                trend = detect_trend(book, current_price)
+                signals = generate_signals(current_price, walls, trend, rokada_status, scale=scale)
                 for signal in signals:
-                    logger.info(f"REST Signal za {symbol}: {signal}")
-        await asyncio.sleep(1)
+                    logger.info("REST Signal za %s: %s", symbol, signal)
+            await asyncio.sleep(1)
 
-async def trading_task():
-    global trading_task_running
-    exchange = ccxt.binance({
+def create_exchange():
+    # REST zahteve raspoređuje RequestScheduler (prioriteti i težine), ne ccxt throttle
+    exchange = create_binance({
         'apiKey': api_key,
         'secret': api_secret,
-        'enableRateLimit': True,
-        'options': {'adjustForTimeDifference': True, 'defaultType': 'future'}
+        'enableRateLimit': False,
+        'options': {'adjustForTimeDifference': True}
     })
+    # Limit je po IP adresi, pa ga sa ShardedEngine-om dele roditelj i svi worker procesi
+    clients = ENGINE_WORKERS + 1 if ENGINE_WORKERS > 1 and len(trading_symbols()) > 1 else 1
+    scheduler = RequestScheduler(RATE_LIMIT_WEIGHT / clients, reserve=RATE_LIMIT_RESERVE)
+    return ScheduledExchange(exchange, scheduler)
+
+def create_market_data_exchange():
+    """Javni klijent samo za orderbook stream (bez ključeva i REST budžeta)."""
+    exchange = create_binance()
+    # Marketi iz sesije ili keša, da pretplata ne čeka ceo load_markets
+    if session.exchange is not None:
+        exchange.set_markets(session.exchange.markets, session.exchange.currencies)
+    else:
+        MarketCache(MARKET_CACHE_PATH, MARKET_CACHE_TTL).apply(exchange)
+    return exchange
+
+def market_data_sources():
+    """Primarni i rezervni javni klijent za orderbook stream-ove (jedan par po procesu)."""
+    if not market_data:
+        market_data.extend([create_market_data_exchange(), create_market_data_exchange()])
+    return market_data
+
+async def close_market_data():
+    await asyncio.gather(*(client.close() for client in market_data), return_exceptions=True)
+    market_data.clear()
+
+def create_worker_exchange():
+    """Klijent worker procesa ShardedEngine-a; marketi iz keša, pa je load_markets no-op."""
+    exchange = create_exchange()
+    MarketCache(MARKET_CACHE_PATH, MARKET_CACHE_TTL).apply(exchange)
+    return exchange
+
+# Klijent, marketi i podešavanja leverage-a žive između start/stop komandi
+session = ExchangeSession(create_exchange, MARKET_CACHE_PATH, ttl=MARKET_CACHE_TTL)
+
+async def run_symbol(exchange, symbol, health=None):
+    """Pipeline jednog simbola: leverage/margin, tick size, pa watch_orderbook."""
+    path = RECORD_PATH
+    if path and len(trading_symbols()) > 1:
+        path = f"{path}.{symbol.replace('/', '_').replace(':', '_')}"
+    recorder = OrderBookRecorder(path) if path else None
+    try:
+        await setup_futures(exchange, symbol, symbol_setting(symbol, 'leverage', 1))
+        scale = TickScale.from_market(exchange.market(symbol), exchange.precisionMode)
+        logger.info(f"Tick size za {symbol}: {scale.tick_size}")
+        live_orders.register(symbol, scale)
+        orders_task = asyncio.create_task(live_orders.watch(exchange, symbol))
+        positions.start(exchange, symbol, scale)
+        try:
+            await watch_orderbook(exchange, symbol, recorder, scale, health)
+        finally:
+            orders_task.cancel()
+            await positions.stop(symbol)
+    finally:
+        if recorder:
+            recorder.close()
+
+async def prepare_worker():
+    """Priprema worker procesa ShardedEngine-a: replika stanja, keš naloga i dnevnik trgovina."""
+    global trading_task_running
+    trading_task_running = True
+    # User-data stream-ove drži samo glavni proces; pozicije stižu kroz repliku stanja
+    account.follow(state)
+    await state.connect(STATE_SOCKET)
+    await journal.start()
+    loop_monitor.start()
+
+def worker_report():
+    """Metrike i kašnjenje petlje worker procesa, za /metrics i /loop glavnog procesa."""
+    return {'metrics': REGISTRY.snapshot(), 'loop': loop_monitor.stats()}
+
+async def trading_task():
+    global trading_task_running, engine
+    symbols = trading_symbols()
 
+    current = None
     try:
-        await exchange.load_markets()
-        logger.info("Marketi učitani")
-        symbol = os.getenv('PAR', 'ETH/BTC')
-        with open('/app/data.json', 'r') as f:
-            data = json.load(f)
-        leverage = data.get('leverage', 1)
-        usdt_balance = await fetch_balance(exchange)
-        data['balance'] = usdt_balance
-        with open('/app/data.json', 'w') as f:
-            json.dump(data, f)
-        await setup_futures(exchange, symbol, leverage)
-        await watch_orderbook(exchange, symbol)
+        # Klijent i keš naloga ostaju otvoreni posle stop-a (zatvaraju se pri gašenju)
+        exchange = await session.get()
+        account.start(exchange)
+        if ENGINE_WORKERS > 1 and len(symbols) > 1:
+            current = ShardedEngine(create_worker_exchange, run_symbol, ENGINE_WORKERS, prepare=prepare_worker,
+                                    log_queue=worker_log_queue(), report=worker_report)
+        else:
+            current = TradingEngine(exchange, run_symbol)
+        engine = current
+        logger.info(f"Pokrećem engine za {symbols}")
+        await current.run(symbols)
     except Exception as e:
         logger.error(f"Greška u trading petlji: {str(e)}")
         trading_task_running = False
     finally:
-        await exchange.close()
+        # /health ne prijavljuje zaustavljen engine (novi start je možda već postavio svoj)
+        if engine is current:
+            engine = None
 
 if __name__ == "__main__":
     import uvicorn
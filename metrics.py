@@ -0,0 +1,170 @@
+import threading
+import time
+
+# Log-linearni bucket-i (kao HDR histogram): 2^SUB_BITS linearnih bucket-a ispod
+# 2^SUB_BITS mikrosekundi, zatim po 2^(SUB_BITS-1) bucket-a za svaki stepen dvojke.
+# Relativna greška kvantila je ispod 1/2^(SUB_BITS-1) (~1.6%).
+SUB_BITS = 7
+SUB_COUNT = 1 << SUB_BITS
+HALF_COUNT = SUB_COUNT >> 1
+MAX_SHIFT = 40 - SUB_BITS  # do ~2^40 us (~12 dana)
+BUCKETS = SUB_COUNT + MAX_SHIFT * HALF_COUNT
+QUANTILES = (0.5, 0.9, 0.99, 0.999)
+
+
+def _bucket(value):
+    if value < SUB_COUNT:
+        return value if value > 0 else 0
+    shift = min(value.bit_length() - SUB_BITS, MAX_SHIFT)
+    return min(SUB_COUNT + (shift - 1) * HALF_COUNT + (value >> shift) - HALF_COUNT, BUCKETS - 1)
+
+
+def _bucket_value(index):
+    """Sredina bucket-a u mikrosekundama."""
+    if index < SUB_COUNT:
+        return float(index)
+    shift = (index - SUB_COUNT) // HALF_COUNT + 1
+    mantissa = (index - SUB_COUNT) % HALF_COUNT + HALF_COUNT
+    return ((mantissa << shift) + ((mantissa + 1) << shift)) / 2
+
+
+class Histogram:
+    """Histogram trajanja sa fiksnim log-linearnim bucket-ima (upis je O(1), bez alokacija)."""
+
+    def __init__(self):
+        self.counts = [0] * BUCKETS
+        self.count = 0
+        self.sum = 0.0
+        self.max = 0.0
+
+    def record(self, seconds):
+        self.counts[_bucket(int(seconds * 1e6))] += 1
+        self.count += 1
+        self.sum += seconds
+        if seconds > self.max:
+            self.max = seconds
+
+    def record_ns(self, started_ns):
+        """Upisuje i vraća vreme (s) proteklo od perf_counter_ns() vrednosti `started_ns`."""
+        seconds = (time.perf_counter_ns() - started_ns) / 1e9
+        self.record(seconds)
+        return seconds
+
+    def quantile(self, q):
+        if not self.count:
+            return 0.0
+        rank = q * self.count
+        seen = 0
+        for index, count in enumerate(self.counts):
+            seen += count
+            if count and seen >= rank:
+                return min(_bucket_value(index) / 1e6, self.max)
+        return self.max
+
+    def snapshot(self):
+        return {'counts': {index: count for index, count in enumerate(self.counts) if count},
+                'count': self.count, 'sum': self.sum, 'max': self.max}
+
+    @classmethod
+    def from_snapshot(cls, data):
+        histogram = cls()
+        for index, count in data['counts'].items():
+            histogram.counts[index] = count
+        histogram.count = data['count']
+        histogram.sum = data['sum']
+        histogram.max = data['max']
+        return histogram
+
+
+class Counter:
+    def __init__(self):
+        self.value = 0
+
+    def inc(self, amount=1):
+        self.value += amount
+
+    def snapshot(self):
+        return self.value
+
+    @classmethod
+    def from_snapshot(cls, value):
+        counter = cls()
+        counter.value = value
+        return counter
+
+
+def _labels(labels, extra=None):
+    items = list(labels) + ([extra] if extra else [])
+    if not items:
+        return ''
+    escaped = (f'{k}="' + str(v).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n') + '"'
+               for k, v in items)
+    return '{' + ','.join(escaped) + '}'
+
+
+class Registry:
+    """Skup metrika jednog procesa sa izvozom u Prometheus tekstualnom formatu.
+
+    Metrike se uzimaju jednom (histogram()/counter()) i čuvaju u promenljivoj,
+    pa upis u vrućoj putanji ne traži ni rečnik ni zaključavanje. Drugi
+    procesi (worker-i ShardedEngine-a) šalju snapshot() glavnom procesu, a
+    render(remote) ih izvozi zajedno sa lokalnim, uz labelu `worker`.
+    """
+
+    def __init__(self, prefix='psybot'):
+        self.prefix = prefix
+        self._metrics = {}
+        self._help = {}
+        self._lock = threading.Lock()
+
+    def _get(self, kind, name, help, labels, factory):
+        key = (name, tuple(sorted(labels.items())))
+        metric = self._metrics.get(key)
+        if metric is None:
+            with self._lock:
+                metric = self._metrics.setdefault(key, factory())
+                self._help.setdefault(name, (kind, help))
+        return metric
+
+    def histogram(self, name, help='', **labels):
+        return self._get('summary', name, help, labels, Histogram)
+
+    def counter(self, name, help='', **labels):
+        return self._get('counter', name, help, labels, Counter)
+
+    def snapshot(self):
+        """Presek svih metrika kao lista (ime, vrsta, opis, labele, vrednost) za slanje drugom procesu."""
+        return [(name, *self._help[name], labels, metric.snapshot())
+                for (name, labels), metric in list(self._metrics.items())]
+
+    def render(self, remote=None):
+        """Prometheus tekst; `remote` je mapa worker -> snapshot() iz drugih procesa."""
+        lines = []
+        by_name = {}
+        kinds = dict(self._help)
+        for (name, labels), metric in list(self._metrics.items()):
+            by_name.setdefault(name, []).append((labels, metric))
+        for worker, rows in (remote or {}).items():
+            for name, kind, help, labels, data in rows:
+                kinds.setdefault(name, (kind, help))
+                metric = (Counter if kind == 'counter' else Histogram).from_snapshot(data)
+                by_name.setdefault(name, []).append((tuple(labels) + (('worker', worker),), metric))
+        for name, series in sorted(by_name.items()):
+            kind, help = kinds[name]
+            full = f"{self.prefix}_{name}"
+            lines.append(f"# HELP {full} {help}")
+            lines.append(f"# TYPE {full} {kind}")
+            for labels, metric in series:
+                if kind == 'counter':
+                    lines.append(f"{full}{_labels(labels)} {metric.value}")
+                    continue
+                for q in QUANTILES:
+                    value = f"{metric.quantile(q):.6f}" if metric.count else 'NaN'
+                    lines.append(f"{full}{_labels(labels, ('quantile', q))} {value}")
+                lines.append(f"{full}_sum{_labels(labels)} {metric.sum:.6f}")
+                lines.append(f"{full}_count{_labels(labels)} {metric.count}")
+        return '\n'.join(lines) + '\n'
+
+
+# Registar procesa; svaki proces (main, api, worker-i) ima svoj
+REGISTRY = Registry()
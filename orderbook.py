@@ -1,12 +1,76 @@
+import itertools
 import logging
 import numpy as np
-from config import WALL_RANGE_SPREAD, MIN_WALL_VOLUME, PRICE_PRECISION, VOLUME_PRECISION
+from numpy.lib.stride_tricks import sliding_window_view
+from config import WALL_RANGE_SPREAD, MIN_WALL_VOLUME, PRICE_PRECISION, VOLUME_PRECISION, WALL_WINDOW
 
-logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
 
-def filter_walls(orderbook, current_price, threshold=0.01):
+def _find_clusters(levels, threshold, window, wall_range_spread, min_wall_volume, scale=None):
+    """Vektorski pronalazi sve klastere od `window` nivoa koji čine zid.
+
+    Isti ugovor kao stara petlja: prozori počinju na 0..len-window-1,
+    rezultat je lista [prosečna cena, ukupni volumen]. Sa `scale` (TickScale)
+    se raspon i prosek računaju nad celobrojnim tikovima (tačna kumulativna
+    suma), a prosek se zaokružuje na ceo tik (pola naviše) i vraća na
+    decimalama tika.
+    """
+    count = len(levels) - window
+    if count <= 0:
+        return []
+    prices = levels[:, 0]
+    volumes = levels[:, 1]
+    total_volume = volumes.sum()
+
+    # Svi prozori odjednom (pogled bez kopiranja), poslednji prozor se preskače kao u petlji
+    volume_windows = sliding_window_view(volumes, window)[:count]
+    cluster_volumes = volume_windows.sum(axis=1)
+    if scale is None:
+        price_windows = sliding_window_view(prices, window)[:count]
+        spreads = price_windows.max(axis=1) - price_windows.min(axis=1)
+        mask = spreads <= wall_range_spread
+    else:
+        ticks = scale.to_ticks(prices)
+        tick_windows = sliding_window_view(ticks, window)[:count]
+        spreads = tick_windows.max(axis=1) - tick_windows.min(axis=1)
+        mask = spreads <= int(wall_range_spread / scale.tick_size + 1e-9)
+
+    mask &= (cluster_volumes >= min_wall_volume) & (cluster_volumes > threshold * total_volume)
+    if not mask.any():
+        return []
+    if scale is None:
+        # Zaokruživanje u Python-u (samo nad pronađenim zidovima) da bi rezultat bio identičan petlji
+        avg_prices = [round(float(price), PRICE_PRECISION) for price in price_windows[mask].mean(axis=1)]
+    else:
+        tick_sums = np.concatenate(([0], np.cumsum(ticks)))
+        starts = np.flatnonzero(mask)
+        tick_totals = tick_sums[starts + window] - tick_sums[starts]
+        # Celobrojni prosek sa zaokruživanjem pola tika naviše (round() bi ga vukao na parne cifre)
+        avg_prices = scale.to_price((tick_totals + window // 2) // window)
+    return [[price, round(float(volume), VOLUME_PRECISION)]
+            for price, volume in zip(avg_prices, cluster_volumes[mask])]
+
+def filter_walls(orderbook, current_price, threshold=0.01, window=WALL_WINDOW,
+                 wall_range_spread=WALL_RANGE_SPREAD, min_wall_volume=MIN_WALL_VOLUME, scale=None):
     if not orderbook or 'bids' not in orderbook or 'asks' not in orderbook:
-        logging.error("Orderbook nije ispravan, vraćam prazan dictionary")
+        logger.error("Orderbook nije ispravan, vraćam prazan dictionary")
+        return {'support': [], 'resistance': []}
+
+    bids = np.asarray(orderbook['bids'], dtype=float).reshape(-1, 2)
+    asks = np.asarray(orderbook['asks'], dtype=float).reshape(-1, 2)
+
+    walls = {
+        'support': _find_clusters(bids, threshold, window, wall_range_spread, min_wall_volume, scale),
+        'resistance': _find_clusters(asks, threshold, window, wall_range_spread, min_wall_volume, scale)
+    }
+    logger.debug("Pronađeni zidovi: %s", walls)
+    return walls
+
+def filter_walls_reference(orderbook, current_price, threshold=0.01, window=WALL_WINDOW,
+                           wall_range_spread=WALL_RANGE_SPREAD, min_wall_volume=MIN_WALL_VOLUME):
+    """Originalna implementacija sa Python petljom, čuva se kao referenca za poređenje."""
+    if not orderbook or 'bids' not in orderbook or 'asks' not in orderbook:
+        logger.error("Orderbook nije ispravan, vraćam prazan dictionary")
         return {'support': [], 'resistance': []}
 
     bids = np.array(orderbook['bids'])
@@ -19,21 +83,21 @@ def filter_walls(orderbook, current_price, threshold=0.01):
     total_ask_volume = sum(ask_volumes)
     
     support_walls = []
-    for i in range(len(bids) - 10):
-        cluster_volumes = bid_volumes[i:i+10]
-        cluster_prices = bids[i:i+10, 0]
+    for i in range(len(bids) - window):
+        cluster_volumes = bid_volumes[i:i+window]
+        cluster_prices = bids[i:i+window, 0]
         cluster_volume = sum(cluster_volumes)
-        if max(cluster_prices) - min(cluster_prices) <= WALL_RANGE_SPREAD and cluster_volume >= MIN_WALL_VOLUME:
+        if max(cluster_prices) - min(cluster_prices) <= wall_range_spread and cluster_volume >= min_wall_volume:
             if cluster_volume > threshold * total_bid_volume:
                 avg_price = np.mean(cluster_prices)
                 support_walls.append([round(float(avg_price), PRICE_PRECISION), round(float(cluster_volume), VOLUME_PRECISION)])
     
     resistance_walls = []
-    for i in range(len(asks) - 10):
-        cluster_volumes = ask_volumes[i:i+10]
-        cluster_prices = asks[i:i+10, 0]
+    for i in range(len(asks) - window):
+        cluster_volumes = ask_volumes[i:i+window]
+        cluster_prices = asks[i:i+window, 0]
         cluster_volume = sum(cluster_volumes)
-        if max(cluster_prices) - min(cluster_prices) <= WALL_RANGE_SPREAD and cluster_volume >= MIN_WALL_VOLUME:
+        if max(cluster_prices) - min(cluster_prices) <= wall_range_spread and cluster_volume >= min_wall_volume:
             if cluster_volume > threshold * total_ask_volume:
                 avg_price = np.mean(cluster_prices)
                 resistance_walls.append([round(float(avg_price), PRICE_PRECISION), round(float(cluster_volume), VOLUME_PRECISION)])
@@ -42,14 +106,203 @@ def filter_walls(orderbook, current_price, threshold=0.01):
         'support': support_walls,
         'resistance': resistance_walls
     }
-    logging.info(f"Pronađeni zidovi: {walls}")
+    logger.debug("Pronađeni zidovi: %s", walls)
     return walls
 
+def _as_levels(levels):
+    """[[cena, količina], ...] -> float niz (n, 2); fromiter je višestruko brži od np.asarray nad listom listi."""
+    if isinstance(levels, np.ndarray):
+        return levels.astype(float, copy=False).reshape(-1, 2)
+    return np.fromiter(itertools.chain.from_iterable(levels), dtype=float, count=2 * len(levels)).reshape(-1, 2)
+
+class LocalOrderBook:
+    """Lokalna knjiga naloga u unapred alociranim, sortiranim NumPy nizovima.
+
+    Bids su sortirani opadajuće, asks rastuće, svaki red je [cena, količina].
+    Izmene (diff) se primenjuju u mestu, a ukupni volumeni i sume pritiska
+    za detect_trend se održavaju inkrementalno. ccxt stream vraća celu spojenu
+    knjigu, pa apply_book iz nje izdvaja samo promenjene nivoe. Objekat se
+    ponaša kao ccxt orderbook (book['bids'], book['asks']) pa ga filter_walls
+    čita direktno.
+    """
+
+    def __init__(self, symbol=None, depth=1000, band=0.01):
+        self.symbol = symbol
+        self.depth = depth
+        self.band = band
+        self.nonce = None
+        self._levels = {'bids': np.zeros((depth, 2)), 'asks': np.zeros((depth, 2))}
+        # Ključevi za binarnu pretragu: -cena za bids (da bi niz bio rastući), cena za asks
+        self._keys = {'bids': np.zeros(depth), 'asks': np.zeros(depth)}
+        self._count = {'bids': 0, 'asks': 0}
+        self.total_volume = {'bids': 0.0, 'asks': 0.0}
+        self._band_volume = {'bids': 0.0, 'asks': 0.0}
+        self._band_cut = {'bids': np.inf, 'asks': -np.inf}
+
+    def __contains__(self, side):
+        return side in self._levels
+
+    def __getitem__(self, side):
+        return self._levels[side][:self._count[side]]
+
+    @property
+    def bids(self):
+        return self['bids']
+
+    @property
+    def asks(self):
+        return self['asks']
+
+    @property
+    def total_bid_volume(self):
+        return self.total_volume['bids']
+
+    @property
+    def total_ask_volume(self):
+        return self.total_volume['asks']
+
+    @property
+    def mid_price(self):
+        if not self._count['bids'] or not self._count['asks']:
+            return None
+        return (self._levels['bids'][0, 0] + self._levels['asks'][0, 0]) / 2
+
+    def _in_band(self, side, price):
+        if side == 'bids':
+            return price > self._band_cut['bids']
+        return price < self._band_cut['asks']
+
+    def _load_side(self, side, levels):
+        data = _as_levels(levels)
+        order = np.argsort(-data[:, 0] if side == 'bids' else data[:, 0], kind='stable')
+        data = data[order][:self.depth]
+        data = data[data[:, 1] > 0]
+        n = len(data)
+        self._levels[side][:n] = data
+        self._keys[side][:n] = -data[:, 0] if side == 'bids' else data[:, 0]
+        self._count[side] = n
+        self.total_volume[side] = float(data[:, 1].sum())
+
+    def apply_snapshot(self, bids, asks, nonce=None):
+        """Učitava kompletan snapshot (npr. REST ili ccxt) u postojeće nizove."""
+        self._load_side('bids', bids)
+        self._load_side('asks', asks)
+        self.nonce = nonce
+        self._reset_band()
+
+    def update(self, side, price, amount):
+        """Primenjuje jednu izmenu nivoa u mestu; amount 0 briše nivo."""
+        levels = self._levels[side]
+        keys = self._keys[side]
+        n = self._count[side]
+        key = -price if side == 'bids' else price
+        i = int(np.searchsorted(keys[:n], key))
+        exists = i < n and keys[i] == key
+        old_amount = levels[i, 1] if exists else 0.0
+
+        if amount <= 0:
+            if not exists:
+                return
+            levels[i:n - 1] = levels[i + 1:n]
+            keys[i:n - 1] = keys[i + 1:n]
+            self._count[side] = n - 1
+        elif exists:
+            levels[i, 1] = amount
+        else:
+            if n == self.depth:
+                if i == n:
+                    return  # Nivo je dublji od kapaciteta knjige
+                # Izbacuje se najdublji nivo da bi se napravilo mesto
+                dropped_price, dropped_amount = levels[n - 1]
+                self.total_volume[side] -= dropped_amount
+                if self._in_band(side, dropped_price):
+                    self._band_volume[side] -= dropped_amount
+                n -= 1
+            levels[i + 1:n + 1] = levels[i:n]
+            keys[i + 1:n + 1] = keys[i:n]
+            levels[i] = (price, amount)
+            keys[i] = key
+            self._count[side] = n + 1
+
+        delta = max(amount, 0.0) - old_amount
+        self.total_volume[side] += delta
+        if self._in_band(side, price):
+            self._band_volume[side] += delta
+
+    def apply_diff(self, bids=(), asks=(), nonce=None):
+        """Primenjuje diff poruku ([[cena, količina], ...] po strani) u mestu."""
+        for price, amount in bids:
+            self.update('bids', float(price), float(amount))
+        for price, amount in asks:
+            self.update('asks', float(price), float(amount))
+        if nonce is not None:
+            self.nonce = nonce
+
+    def _changes(self, side, levels):
+        """Nivoi po kojima se `levels` (cela knjiga jedne strane) razlikuje od trenutne; obrisani imaju količinu 0."""
+        new = _as_levels(levels)
+        new = new[new[:, 1] > 0][:self.depth]  # ccxt strane su već sortirane
+        old = self[side]
+        if len(old) == len(new) and np.array_equal(old[:, 0], new[:, 0]):
+            # Česti slučaj: isti nivoi cena, promenjene su samo količine
+            return new[old[:, 1] != new[:, 1]].tolist()
+        old_keys = self._keys[side][:len(old)]
+        new_keys = -new[:, 0] if side == 'bids' else new[:, 0]
+        # Nivoi nove knjige kojih nema ili imaju drugu količinu u staroj
+        i = np.minimum(np.searchsorted(old_keys, new_keys), max(len(old) - 1, 0))
+        changed = (old_keys[i] != new_keys) | (old[i, 1] != new[:, 1]) if len(old) else np.ones(len(new), bool)
+        # Nivoi stare knjige kojih više nema
+        j = np.minimum(np.searchsorted(new_keys, old_keys), max(len(new) - 1, 0))
+        removed = old[new_keys[j] != old_keys, 0] if len(new) else old[:, 0]
+        return [(price, 0.0) for price in removed.tolist()] + new[changed].tolist()
+
+    def apply_book(self, bids, asks, nonce=None, max_changes=0.25):
+        """Usklađuje knjigu sa celom ccxt knjigom primenom samo promenjenih nivoa.
+
+        Ako se promenilo više od `max_changes` udela nivoa (npr. posle
+        prekida stream-a), jeftinije je učitati ceo snapshot.
+        """
+        changes = {side: self._changes(side, levels) for side, levels in (('bids', bids), ('asks', asks))}
+        size = max(len(bids) + len(asks), 1)
+        if len(changes['bids']) + len(changes['asks']) > max_changes * size:
+            self.apply_snapshot(bids, asks, nonce)
+        else:
+            self.apply_diff(changes['bids'], changes['asks'], nonce)
+
+    def _reset_band(self):
+        self._band_cut = {'bids': np.inf, 'asks': -np.inf}
+        self._band_volume = {'bids': 0.0, 'asks': 0.0}
+
+    def _move_band(self, side, cut):
+        """Pomera granicu pojasa i koriguje sumu samo za nivoe koji su prešli granicu."""
+        levels = self._levels[side]
+        keys = self._keys[side][:self._count[side]]
+        old_cut = self._band_cut[side]
+        key_old = -old_cut if side == 'bids' else old_cut
+        key_new = -cut if side == 'bids' else cut
+        # U pojasu su nivoi sa ključem strogo manjim od granice
+        lo = int(np.searchsorted(keys, min(key_old, key_new), side='left'))
+        hi = int(np.searchsorted(keys, max(key_old, key_new), side='left'))
+        moved = float(levels[lo:hi, 1].sum())
+        self._band_volume[side] += moved if key_new > key_old else -moved
+        self._band_cut[side] = cut
+
+    def pressure(self, current_price):
+        """Vraća (buy_pressure, sell_pressure) kao u detect_trend."""
+        self._move_band('bids', current_price * (1 - self.band))
+        self._move_band('asks', current_price * (1 + self.band))
+        return self._band_volume['bids'], self._band_volume['asks']
+
+
 def detect_trend(orderbook, current_price):
-    buy_pressure = sum([amount for price, amount in orderbook['bids'] if price > current_price * 0.99])
-    sell_pressure = sum([amount for price, amount in orderbook['asks'] if price < current_price * 1.01])
+    if isinstance(orderbook, LocalOrderBook):
+        # Lokalna knjiga već održava sume u pojasu, nema ponovnog sabiranja
+        buy_pressure, sell_pressure = orderbook.pressure(current_price)
+    else:
+        buy_pressure = sum([amount for price, amount in orderbook['bids'] if price > current_price * 0.99])
+        sell_pressure = sum([amount for price, amount in orderbook['asks'] if price < current_price * 1.01])
     if buy_pressure > sell_pressure * 1.5:
         return 'UP'
     elif sell_pressure > buy_pressure * 1.5:
         return 'DOWN'
-    return 'NEUTRAL'
\ No newline at end of file
+    return 'NEUTRAL'
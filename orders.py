@@ -0,0 +1,460 @@
+import argparse
+import asyncio
+import logging
+import time
+import uuid
+from ccxt.base.errors import NotSupported
+from ticks import TickScale
+from metrics import REGISTRY
+
+logger = logging.getLogger(__name__)
+
+ORDER_LATENCY = {leg: REGISTRY.histogram('order_seconds', "Round-trip postavljanja naloga", leg=leg)
+                 for leg in ('batch', 'limit', 'stop_market', 'take_profit_market')}
+ORDER_REJECTS = REGISTRY.counter('order_rejects_total', "Odbijeni delovi bracket-a")
+
+# clientOrderId delova bracket-a je "<tag>-<uloga>"; tag počinje sa BRACKET_PREFIX
+BRACKET_PREFIX = 'psy'
+ROLES = {'e': 'entry', 's': 'stop_loss', 't': 'take_profit'}
+
+
+class BracketOrderError(Exception):
+    """Ulaz sa SL/TP nije postavljen; već postavljeni delovi su povučeni."""
+
+
+def new_tag():
+    return f"{BRACKET_PREFIX}{uuid.uuid4().hex[:12]}"
+
+
+def client_order_id(tag, role):
+    return f"{tag}-{role}"
+
+
+def parse_client_order_id(order):
+    """(tag, deo bracket-a) iz clientOrderId-a, ili (None, None) za tuđe naloge."""
+    client_id = order.get('clientOrderId') or ''
+    tag, _, role = client_id.rpartition('-')
+    if not tag.startswith(BRACKET_PREFIX) or role[:1] not in ROLES:
+        return None, None
+    return tag, ROLES[role[:1]]
+
+
+def bracket_legs(symbol, side, amount, entry_price, stop_loss, take_profit, tag=None):
+    """Ulazni limit nalog i zaštitni stop_market/take_profit_market nalozi kao ccxt create_orders zahtevi.
+
+    SL i TP su reduceOnly sa količinom ulaza (closePosition dozvoljava samo
+    jedan stop po strani, pa drugi bracket na istom simbolu ne bi prošao).
+    Binance odbija reduceOnly nalog dok nema pozicije koju bi smanjio
+    (-2022), pa se SL/TP šalju tek kad se ulaz popuni (LiveOrderIndex.protect).
+    Sa `tag`-om svaki deo dobija clientOrderId po kome ga LiveOrderIndex
+    prepoznaje i posle restarta.
+    """
+    exit_side = 'sell' if side == 'buy' else 'buy'
+
+    def params(role, **extra):
+        return {**extra, 'clientOrderId': client_order_id(tag, role)} if tag else extra
+
+    return [
+        {'symbol': symbol, 'type': 'limit', 'side': side, 'amount': amount, 'price': entry_price,
+         'params': params('e')},
+        {'symbol': symbol, 'type': 'stop_market', 'side': exit_side, 'amount': amount, 'price': None,
+         'params': params('s', stopPrice=stop_loss, reduceOnly=True)},
+        {'symbol': symbol, 'type': 'take_profit_market', 'side': exit_side, 'amount': amount, 'price': None,
+         'params': params('t', stopPrice=take_profit, reduceOnly=True)},
+    ]
+
+
+async def submit_legs(exchange, legs):
+    """Šalje naloge u jednom round-trip-u; vraća nalog ili Exception za svaki deo.
+
+    Sa podrškom za batch (Binance batchOrders) ide jedan zahtev, inače se
+    create_order pozivi šalju konkurentno.
+    """
+    if exchange.has.get('createOrders'):
+        started = time.perf_counter_ns()
+        try:
+            results = await exchange.create_orders(legs)
+        except Exception as e:
+            ORDER_REJECTS.inc(len(legs))
+            return [e] * len(legs)
+        finally:
+            ORDER_LATENCY['batch'].record_ns(started)
+        results = [r if r.get('id') else Exception(r.get('info', {}).get('msg', 'nalog odbijen')) for r in results]
+    else:
+        results = await asyncio.gather(*(_timed_create(exchange, leg) for leg in legs), return_exceptions=True)
+    ORDER_REJECTS.inc(sum(isinstance(r, Exception) for r in results))
+    return results
+
+
+async def _timed_create(exchange, leg):
+    started = time.perf_counter_ns()
+    try:
+        return await exchange.create_order(leg['symbol'], leg['type'], leg['side'], leg['amount'],
+                                           leg['price'], leg['params'])
+    finally:
+        ORDER_LATENCY[leg['type']].record_ns(started)
+
+
+async def rollback(exchange, symbol, entry, placed):
+    """Otkazuje postavljene naloge; popunjeni deo ulaza (ceo ili delimično) zatvara market nalogom."""
+    results = await asyncio.gather(*(exchange.cancel_order(o['id'], symbol) for o in placed), return_exceptions=True)
+    for order, result in zip(placed, results):
+        if isinstance(result, Exception):
+            logger.error(f"Rollback: otkazivanje {order['id']} ({order['type']}) nije uspelo: {result}")
+        if not entry or order['id'] != entry['id']:
+            continue
+        # Otkazivanje ne uspeva kad je ulaz već popunjen; uspešno otkazan ulaz je možda delimično popunjen
+        filled = entry['amount'] if isinstance(result, Exception) else (result.get('filled') or 0)
+        if filled:
+            exit_side = 'sell' if entry['side'] == 'buy' else 'buy'
+            await exchange.create_market_order(symbol, exit_side, filled, params={'reduceOnly': True})
+            logger.info(f"Rollback: zatvorena pozicija {exit_side} {filled} na {symbol}")
+
+
+async def place_bracket(exchange, symbol, side, amount, entry_price, stop_loss, take_profit):
+    """Postavlja ulaz bracket-a i vraća {'tag', 'entry', 'stop_loss', 'take_profit', 'exits'}.
+
+    SL i TP su u `exits` kao zahtevi za create_orders i šalju se tek kad se
+    ulaz popuni (LiveOrderIndex.protect), jer reduceOnly nalog bez pozicije
+    Binance odbija. Ako ulaz ne prođe, podiže se BracketOrderError.
+    """
+    tag = new_tag()
+    entry, *exits = bracket_legs(symbol, side, amount, entry_price, stop_loss, take_profit, tag)
+    result, = await submit_legs(exchange, [entry])
+    if isinstance(result, Exception):
+        raise BracketOrderError(f"Ulazni nalog za {symbol} odbijen: {result}")
+    return {'tag': tag, 'entry': result, 'stop_loss': None, 'take_profit': None, 'exits': exits}
+
+
+async def place_sequential(exchange, symbol, side, amount, entry_price, stop_loss, take_profit):
+    """Stari redosled (ulaz, pa SL, pa TP), za poređenje latencije."""
+    results = []
+    for leg in bracket_legs(symbol, side, amount, entry_price, stop_loss, take_profit):
+        results.append(await exchange.create_order(leg['symbol'], leg['type'], leg['side'], leg['amount'],
+                                                   leg['price'], leg['params']))
+    return results
+
+
+
+# Statusi posle kojih nalog više nije živ
+CLOSED_STATUSES = ('closed', 'canceled', 'expired', 'rejected')
+
+
+class LiveOrderIndex:
+    """Indeks bracket-a po (simbol, strana, cena ulaza u tikovima).
+
+    Za svaki bracket čuva ulaz, SL i TP dok pozicija koju otvara ne bude
+    zatvorena: popunjen ulaz ostaje u indeksu (sa `filled`), pa isti signal
+    ne otvara još jednu poziciju. Bracket izlazi kad se ulaz otkaže bez
+    popunjavanja ili kad se SL/TP izvrši; tada se drugi zaštitni nalog
+    otkazuje (OCO). SL i TP se postavljaju kroz protect() tek kad se ulaz
+    popuni (iz watch_orders, sync-a ili odmah posle add()). Nalozi se vezuju
+    za bracket po clientOrderId tagu, pa se posle restarta usvajaju iz
+    fetch_open_orders, a tuđi nalozi se ne diraju; ulaz bez SL/TP naloga čiji
+    bracket indeks ne zna (nema cene SL/TP) se tada povlači.
+    Stanje se održava iz watch_orders (user-data stream); watch_orderbook
+    preskače signale koji već imaju bracket i otkazuje nepopunjene ulaze
+    kojima je signal nestao. Bez stream-a (klijent bez watch_orders) watch()
+    periodično zove sync(), koji naloge nestale iz otvorenih povlači preko
+    fetch_order i propušta kroz apply(), pa OCO radi i tada.
+    """
+
+    def __init__(self, max_early=1000, retries=1):
+        self.scales = {}
+        self.max_early = max_early
+        self.retries = retries
+        self._brackets = {}
+        self._tags = {}
+        self._early = {}
+        self._synced = {}
+
+    def register(self, symbol, scale):
+        self.scales[symbol] = scale
+
+    def key(self, symbol, side, price):
+        scale = self.scales.get(symbol) or TickScale()
+        return symbol, side, scale.to_ticks(price)
+
+    def __contains__(self, key):
+        return key in self._brackets
+
+    def __len__(self):
+        return len(self._brackets)
+
+    def add(self, bracket, key=None):
+        entry = bracket['entry']
+        key = key or self.key(entry['symbol'], entry['side'], entry['price'])
+        bracket.setdefault('filled', entry.get('filled') or 0)
+        self._brackets[key] = bracket
+        self._tags[bracket['tag']] = key
+        for order in self._early.pop(bracket['tag'], []):
+            self.apply(order)
+        return key
+
+    def get(self, tag):
+        key = self._tags.get(tag)
+        return self._brackets.get(key) if key else None
+
+    def set_leg(self, tag, leg, order):
+        """Zamenjuje SL/TP bracket-a (trailing stop) bez čekanja watch_orders događaja."""
+        bracket = self.get(tag)
+        if bracket is not None:
+            bracket[leg] = order
+
+    def discard(self, tag):
+        key = self._tags.pop(tag, None)
+        return self._brackets.pop(key, None) if key else None
+
+    def live(self, symbol):
+        return {key: bracket for key, bracket in self._brackets.items() if key[0] == symbol}
+
+    @staticmethod
+    def _open_legs(bracket):
+        return [bracket[leg] for leg in ('stop_loss', 'take_profit')
+                if bracket.get(leg) and bracket[leg].get('status', 'open') not in CLOSED_STATUSES]
+
+    def apply(self, order):
+        """Ažuriranje iz watch_orders; vraća naloge koje treba otkazati (SL/TP bez svrhe)."""
+        tag, leg = parse_client_order_id(order)
+        bracket = self.get(tag) if tag else None
+        if bracket is None:
+            if tag:
+                # Događaj može stići pre nego što place_bracket vrati bracket; primenjuje se u add()
+                if len(self._early) >= self.max_early:
+                    self._early.clear()
+                self._early.setdefault(tag, []).append(order)
+            return []  # Tuđi nalozi se ne diraju
+        if leg == 'entry':
+            bracket['entry'] = order
+            if order.get('filled') or order['status'] == 'closed':
+                bracket['filled'] = order.get('filled') or order['amount']
+            if order['status'] in CLOSED_STATUSES and not bracket['filled']:
+                # Ulaz otkazan bez popunjavanja: SL/TP više nemaju šta da štite
+                self.discard(tag)
+                return self._open_legs(bracket)
+            return []
+        current = bracket.get(leg)
+        if order['status'] not in CLOSED_STATUSES:
+            bracket[leg] = order  # Novi trailing stop ili ažuriranje postojećeg
+            return []
+        if current and current['id'] != order['id']:
+            return []  # Stari stop koji je trailing već zamenio
+        bracket[leg] = None
+        if order['status'] == 'closed' or not self._open_legs(bracket):
+            # SL ili TP je izvršen (pozicija zatvorena): ostatak bracket-a se otkazuje
+            self.discard(tag)
+            entry = bracket['entry']
+            return self._open_legs(bracket) + ([entry] if entry.get('status', 'open') == 'open' else [])
+        return []
+
+    def _adopt(self, symbol, tag, orders):
+        """Bracket iz otvorenih naloga (posle restarta ili ponovnog povezivanja)."""
+        bracket = self.get(tag) or {'tag': tag, 'entry': None}
+        for leg in ('stop_loss', 'take_profit'):
+            bracket[leg] = orders.get(leg)
+        if orders.get('entry'):
+            bracket['entry'] = orders['entry']
+            bracket['filled'] = orders['entry'].get('filled') or bracket.get('filled') or 0
+            return self.add(bracket, self._tags.get(tag))
+        if bracket['entry'] is not None:
+            # Ulaza više nema među otvorenim nalozima, a SL/TP jesu: ulaz je popunjen
+            bracket['filled'] = bracket.get('filled') or bracket['entry']['amount']
+            return self.add(bracket, self._tags.get(tag))
+        # Ulaz popunjen pre restarta: cena nije poznata, pa ključ nosi tag
+        leg = bracket['stop_loss'] or bracket['take_profit']
+        bracket['entry'] = {'symbol': symbol, 'side': 'buy' if leg['side'] == 'sell' else 'sell',
+                            'amount': leg['amount'], 'price': None, 'status': 'closed'}
+        bracket['filled'] = leg['amount']
+        return self.add(bracket, (symbol, bracket['entry']['side'], tag))
+
+    async def _reconcile(self, exchange, symbol, grouped):
+        """Propušta kroz apply() naloge indeksa koji više nisu otvoreni; vraća tagove izbačenih bracket-a."""
+        missing = []
+        for bracket in self.live(symbol).values():
+            still_open = grouped.get(bracket['tag'], {})
+            for leg in ('entry', 'stop_loss', 'take_profit'):
+                order = bracket.get(leg)
+                if (order and order.get('id') and leg not in still_open
+                        and order.get('status', 'open') not in CLOSED_STATUSES):
+                    missing.append(order)
+        if not missing:
+            return set()
+        results = await asyncio.gather(*(exchange.fetch_order(o['id'], symbol) for o in missing),
+                                       return_exceptions=True)
+        discarded, cancel = set(), []
+        for order, result in zip(missing, results):
+            if isinstance(result, Exception):
+                logger.warning(f"Provera naloga {order['id']} na {symbol} nije uspela: {result}")
+                continue
+            tag, _ = parse_client_order_id(result)
+            cancel += self.apply(result)
+            if tag and self.get(tag) is None:
+                discarded.add(tag)
+        await self._cancel_orders(exchange, symbol, cancel)
+        return discarded
+
+    async def sync(self, exchange, symbol):
+        """Usklađuje indeks za simbol sa otvorenim nalozima iz REST-a (start, prekid stream-a, rad bez stream-a)."""
+        grouped = {}
+        for order in await exchange.fetch_open_orders(symbol):
+            tag, leg = parse_client_order_id(order)
+            if tag:
+                grouped.setdefault(tag, {})[leg] = order
+        for tag in await self._reconcile(exchange, symbol, grouped):
+            grouped.pop(tag, None)  # Njegovi preostali nalozi su upravo otkazani
+        # Ulaz bez SL/TP koji indeks ne zna (posle restarta): cene SL/TP su izgubljene
+        orphans = [grouped.pop(tag)['entry'] for tag, orders in list(grouped.items())
+                   if set(orders) == {'entry'} and self.get(tag) is None]
+        for entry in orphans:
+            logger.warning(f"Ulaz {entry['id']} na {symbol} nema podatke za SL/TP, povlačim ga")
+            await rollback(exchange, symbol, entry, [entry])
+        for bracket in self.live(symbol).values():
+            # Popunjen ulaz koji još čeka SL/TP nema otvorenih naloga, a bracket ostaje
+            if bracket['tag'] not in grouped and not (bracket['filled'] and bracket.get('exits')):
+                self.discard(bracket['tag'])
+        for tag, orders in grouped.items():
+            if orders.get('entry') or orders.get('stop_loss') or orders.get('take_profit'):
+                self._adopt(symbol, tag, orders)
+        await self.protect_filled(exchange, symbol)
+        count = len(self.live(symbol))
+        if self._synced.get(symbol) != count:
+            # Periodični sync (rad bez stream-a) loguje samo promene
+            self._synced[symbol] = count
+            logger.info(f"Bracket-i za {symbol}: {count}")
+
+    async def watch(self, exchange, symbol, retry_delay=5.0, poll_interval=2.0):
+        """Drži indeks u sinhronizaciji; posle prekida stream-a ponovo puni iz REST-a.
+
+        Ako klijent nema watch_orders (NotSupported), indeks se usklađuje
+        sync()-om na svakih `poll_interval` sekundi.
+        """
+        streaming = True
+        while True:
+            try:
+                await self.sync(exchange, symbol)
+                if not streaming:
+                    await asyncio.sleep(poll_interval)
+                    continue
+                while True:
+                    for order in await exchange.watch_orders(symbol):
+                        await self._cancel_orders(exchange, symbol, self.apply(order))
+                    await self.protect_filled(exchange, symbol)
+            except asyncio.CancelledError:
+                raise
+            except NotSupported as e:
+                streaming = False
+                logger.warning(f"Klijent nema watch_orders ({e}), nalozi za {symbol} se usklađuju preko REST-a")
+            except Exception as e:
+                logger.error(f"Greška u watch_orders za {symbol}: {e}")
+                await asyncio.sleep(retry_delay)
+
+    async def protect(self, exchange, bracket):
+        """Postavlja SL i TP bracket-a čiji je ulaz (bar delimično) popunjen; vraća False ako je bracket povučen.
+
+        Šalju se jednom (`exits` se skida sa bracket-a pre slanja), u jednom
+        round-trip-u. Deo koji ne prođe šalje se ponovo do `retries` puta;
+        ako i dalje fali, pozicija ne sme da ostane bez zaštite: postavljeni
+        delovi i ostatak ulaza se otkazuju, a popunjeni deo zatvara.
+        """
+        if not bracket['filled'] or not bracket.get('exits'):
+            return True
+        exits = bracket.pop('exits')
+        symbol = bracket['entry']['symbol']
+        results = await submit_legs(exchange, exits)
+        for attempt in range(self.retries):
+            missing = [i for i, result in enumerate(results) if isinstance(result, Exception)]
+            if not missing:
+                break
+            logger.warning(f"Ponavljam {[exits[i]['type'] for i in missing]} za {symbol} (pokušaj {attempt + 1})")
+            for i, result in zip(missing, await submit_legs(exchange, [exits[i] for i in missing])):
+                results[i] = result
+        placed = [result for result in results if not isinstance(result, Exception)]
+        failed = [exits[i]['type'] for i, result in enumerate(results) if isinstance(result, Exception)]
+        if failed:
+            self.discard(bracket['tag'])
+            await rollback(exchange, symbol, bracket['entry'], placed + [bracket['entry']])
+            logger.error(f"{failed} za {symbol} nije postavljen, bracket {bracket['tag']} povučen")
+            return False
+        for leg, order in zip(('stop_loss', 'take_profit'), results):
+            # watch_orders je možda već upisao isti nalog
+            bracket[leg] = bracket.get(leg) or order
+        logger.info(f"SL/TP za {symbol} postavljeni posle popunjavanja ulaza ({bracket['tag']})")
+        return True
+
+    async def protect_filled(self, exchange, symbol):
+        """protect() za sve bracket-e simbola kojima je ulaz popunjen, a SL/TP još nisu poslati."""
+        pending = [bracket for bracket in self.live(symbol).values() if bracket['filled'] and bracket.get('exits')]
+        if pending:
+            await asyncio.gather(*(self.protect(exchange, bracket) for bracket in pending))
+
+    @staticmethod
+    async def _cancel_orders(exchange, symbol, orders):
+        results = await asyncio.gather(*(exchange.cancel_order(o['id'], symbol) for o in orders),
+                                       return_exceptions=True)
+        for order, result in zip(orders, results):
+            if isinstance(result, Exception):
+                logger.warning(f"Otkazivanje {order['id']} ({order['type']}) na {symbol} nije uspelo: {result}")
+
+    async def _cancel_bracket(self, exchange, symbol, bracket):
+        entry = bracket['entry']
+        try:
+            canceled = await exchange.cancel_order(entry['id'], symbol)
+        except Exception as e:
+            # Najverovatnije je popunjen u međuvremenu; bracket ostaje, SL/TP štite poziciju
+            logger.warning(f"Otkazivanje ulaza {entry['id']} na {symbol} nije uspelo: {e}")
+            bracket['filled'] = bracket['filled'] or entry['amount']
+            await self.protect(exchange, bracket)
+            return False
+        if canceled.get('filled'):
+            # Delimično popunjen: reduceOnly SL/TP ostaju kao zaštita popunjenog dela
+            bracket['entry'] = canceled
+            bracket['filled'] = canceled['filled']
+            await self.protect(exchange, bracket)
+            return False
+        self.discard(bracket['tag'])
+        await self._cancel_orders(exchange, symbol, self._open_legs(bracket))
+        return True
+
+    async def cancel_stale(self, exchange, symbol, wanted):
+        """Otkazuje nepopunjene ulaze (i njihove SL/TP) čiji ključ nije u `wanted`; vraća broj otkazanih."""
+        stale = [bracket for key, bracket in self.live(symbol).items() if key not in wanted and not bracket['filled']]
+        if not stale:
+            return 0
+        logger.info("Otkazujem %d zastarelih naloga na %s", len(stale), symbol)
+        return sum(await asyncio.gather(*(self._cancel_bracket(exchange, symbol, b) for b in stale)))
+
+
+if __name__ == "__main__":
+    from fake_exchange import FakeExchange
+
+    parser = argparse.ArgumentParser(description="Latencija postavljanja ulaza+SL+TP nad lokalnim lažnim exchange-om")
+    parser.add_argument('--latency', type=float, default=0.05, help="round-trip u sekundama")
+    parser.add_argument('--fail', default='', help="tip naloga koji se jednom odbija, npr. stop_market")
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO)
+
+    async def place_protected(exchange, *order):
+        # Ulaz preko spread-a se odmah popunjava, pa SL/TP idu u sledećem round-trip-u
+        bracket = await place_bracket(exchange, *order)
+        index = LiveOrderIndex()
+        index.add(bracket)
+        if not await index.protect(exchange, bracket):
+            raise BracketOrderError(f"SL/TP za {order[0]} nije postavljen, pozicija zatvorena")
+
+    async def demo():
+        order = ('ETH/USDT:USDT', 'buy', 0.01, 0.05, 0.04995, 0.0501)
+        fail = {args.fail: 1} if args.fail else None
+        for name, exchange, place in (
+                ('sekvencijalno', FakeExchange(args.latency, marketable=True), place_sequential),
+                ('batch', FakeExchange(args.latency, fail, marketable=True), place_protected),
+                ('konkurentno', FakeExchange(args.latency, fail, batch=False, marketable=True), place_protected)):
+            started = time.perf_counter()
+            try:
+                await place(exchange, *order)
+                outcome = 'ok'
+            except BracketOrderError as e:
+                outcome = str(e)
+            print(f"{name:<14} {(time.perf_counter() - started) * 1000:7.1f} ms, "
+                  f"zahteva {len(exchange.requests)}: {outcome}")
+
+    asyncio.run(demo())
@@ -0,0 +1,149 @@
+import asyncio
+import logging
+import time
+from ccxt.base.errors import NotSupported
+from ticks import TickScale
+from orders import client_order_id
+
+logger = logging.getLogger(__name__)
+
+
+class PositionMonitor:
+    """Jedna tabela trailing stop stanja za sve bracket-e, po tagu bracket-a.
+
+    Svaki bracket ima svoj red (strana, količina, ulazna cena, trenutni
+    stop), pa drugi bracket na istom simbolu ne briše stop prethodnog.
+    Trailing radi tek kad je ulaz popunjen, što se čita iz LiveOrderIndex-a;
+    bracket koji je nestao iz indeksa (otkazan ili zatvoren preko SL/TP)
+    izlazi iz tabele. start() za svaki simbol pokreće task koji prati mark
+    cenu preko watch_mark_price, a ako klijent nema taj stream, povlači je
+    preko fetch_mark_price (kroz scheduler) na svakih `poll_interval` sekundi.
+    Kad mark cena pomeri kandidat za stop bar jedan tik u korist pozicije (i
+    iznad/ispod ulaza), stop se zamenjuje: prvo se postavi novi reduceOnly
+    stop_market na popunjenu količinu, pa se otkaže stari, tako da pozicija
+    nijednog trenutka nije bez zaštite. Binance menja samo LIMIT naloge
+    (edit_order), pa je zamena jedini način za stop naloge.
+    Svi taskovi se vode ovde i gase kroz stop()/close().
+    """
+
+    def __init__(self, orders, poll_interval=1.0):
+        self.orders = orders
+        self.poll_interval = poll_interval
+        self.table = {}
+        self.scales = {}
+        self._tasks = {}
+
+    def track(self, bracket, distance):
+        """Uključuje trailing za bracket iz place_bracket (ulaz, SL, TP)."""
+        entry, stop_order = bracket['entry'], bracket.get('stop_loss')
+        self.table[bracket['tag']] = {
+            'symbol': entry['symbol'],
+            'side': 'long' if entry['side'] == 'buy' else 'short',
+            'entry_price': entry['price'],
+            'distance': distance,
+            'mark_price': None,
+            'stop_price': (stop_order.get('stopPrice') or stop_order.get('triggerPrice')) if stop_order else None,
+            'replacements': 0,
+            'updated': time.time()
+        }
+
+    def start(self, exchange, symbol, scale=None):
+        if symbol in self._tasks:
+            return
+        self.scales[symbol] = scale or TickScale()
+        self._tasks[symbol] = [
+            asyncio.create_task(self._watch_mark_price(exchange, symbol), name=f"mark:{symbol}")
+        ]
+
+    async def stop(self, symbol):
+        tasks = self._tasks.pop(symbol, [])
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+
+    async def close(self):
+        for symbol in list(self._tasks):
+            await self.stop(symbol)
+
+    def on_position(self, position):
+        """Promena pozicije iz keša naloga: zatvorena pozicija uklanja redove popunjenih bracket-a."""
+        if position.get('contracts'):
+            return
+        symbol = position['symbol']
+        closed = []
+        for tag, row in self.table.items():
+            bracket = self.orders.get(tag)
+            # Red čiji ulaz još čeka popunjavanje ostaje
+            if row['symbol'] == symbol and (bracket is None or bracket['filled']):
+                closed.append(tag)
+        for tag in closed:
+            del self.table[tag]
+        if closed:
+            logger.info(f"Pozicija na {symbol} zatvorena")
+
+    async def _next_mark_price(self, exchange, symbol, streaming):
+        if streaming:
+            return await exchange.watch_mark_price(symbol)
+        await asyncio.sleep(self.poll_interval)
+        return await exchange.fetch_mark_price(symbol)
+
+    async def _watch_mark_price(self, exchange, symbol, retry_delay=5.0):
+        streaming = callable(getattr(exchange, 'watch_mark_price', None))
+        if not streaming:
+            logger.warning(f"Klijent nema mark price stream, {symbol} se prati preko REST-a")
+        while True:
+            try:
+                ticker = await self._next_mark_price(exchange, symbol, streaming)
+                mark_price = ticker.get('markPrice') or ticker.get('last')
+                for tag, row in list(self.table.items()):
+                    if row['symbol'] == symbol:
+                        row['mark_price'] = mark_price
+                        await self._trail(exchange, tag, row)
+            except asyncio.CancelledError:
+                raise
+            except NotSupported as e:
+                streaming = False
+                logger.warning(f"Mark price stream nije podržan ({e}), {symbol} se prati preko REST-a")
+            except Exception as e:
+                logger.error(f"Greška u trailing stop-u za {symbol}: {e}")
+                await asyncio.sleep(retry_delay)
+
+    async def _trail(self, exchange, tag, row):
+        bracket = self.orders.get(tag)
+        if bracket is None:
+            # Bracket otkazan ili zatvoren preko SL/TP
+            self.table.pop(tag, None)
+            return
+        if not bracket['filled'] or not row['distance'] or not row['mark_price'] or not row['entry_price']:
+            return
+        if bracket.get('stop_loss') is None:
+            return  # SL se još postavlja (LiveOrderIndex.protect)
+        symbol = row['symbol']
+        scale = self.scales[symbol]
+        direction = 1 if row['side'] == 'long' else -1
+        candidate = scale.to_ticks(row['mark_price']) - direction * scale.offset(row['distance'])
+        # Stop se pomera samo u korist pozicije i tek kad pređe ulaznu cenu
+        if direction * (candidate - scale.to_ticks(row['entry_price'])) <= 0:
+            return
+        if row.get('stop_price') and direction * (candidate - scale.to_ticks(row['stop_price'])) <= 0:
+            return
+        stop_price = scale.to_price(candidate)
+        exit_side = 'sell' if direction > 0 else 'buy'
+        row['replacements'] += 1
+        order = await exchange.create_order(
+            symbol, 'stop_market', exit_side, bracket['filled'], None,
+            {'stopPrice': stop_price, 'reduceOnly': True,
+             'clientOrderId': client_order_id(tag, f"s{row['replacements']}")}
+        )
+        previous = bracket.get('stop_loss')
+        self.orders.set_leg(tag, 'stop_loss', order)
+        row.update({'stop_price': stop_price, 'updated': time.time()})
+        logger.info("Trailing stop za %s pomeren na %s", symbol, stop_price)
+        if previous:
+            try:
+                await exchange.cancel_order(previous['id'], symbol)
+            except Exception as e:
+                logger.warning(f"Stari stop {previous['id']} na {symbol} nije otkazan: {e}")
+
+    def report(self):
+        return {tag: dict(row) for tag, row in self.table.items()}
@@ -0,0 +1,151 @@
+import asyncio
+import collections
+import logging
+import os
+import sys
+import threading
+import time
+from metrics import REGISTRY
+
+logger = logging.getLogger(__name__)
+
+
+def _frame_name(frame):
+    code = frame.f_code
+    return f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})"
+
+
+def collapse_stack(frame):
+    """Stek od korena do lista u collapsed formatu (funkcije odvojene sa ';')."""
+    names = []
+    while frame is not None:
+        names.append(_frame_name(frame))
+        frame = frame.f_back
+    return ';'.join(reversed(names))
+
+
+def format_collapsed(samples):
+    """Counter stekova -> tekst za flamegraph.pl / speedscope ("stek broj" po liniji)."""
+    return ''.join(f"{stack} {count}\n" for stack, count in samples.most_common())
+
+
+class SamplingProfiler:
+    """Sampling profiler za jednu nit: pomoćna nit na svakih `interval` sekundi
+    čita trenutni stek ciljne niti (sys._current_frames) i broji ga.
+
+    Ciljna nit se ne prekida niti instrumentuje, pa je trošak samo čitanje
+    steka na svakih nekoliko milisekundi.
+    """
+
+    def __init__(self, interval=0.005, thread_id=None):
+        self.interval = interval
+        self.thread_id = thread_id or threading.main_thread().ident
+        self.samples = collections.Counter()
+        self.started = None
+        self.duration = None
+        self._stop = threading.Event()
+        self._thread = None
+
+    @property
+    def running(self):
+        return self._thread is not None and self._thread.is_alive()
+
+    def start(self):
+        self.samples = collections.Counter()
+        self.started = time.monotonic()
+        self.duration = None
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._sample, name="sampling-profiler", daemon=True)
+        self._thread.start()
+        return self
+
+    def _sample(self):
+        while not self._stop.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            if frame is not None:
+                self.samples[collapse_stack(frame)] += 1
+
+    def stop(self):
+        self._stop.set()
+        if self._thread:
+            self._thread.join()
+        self.duration = time.monotonic() - self.started if self.started else None
+        return self.samples
+
+    def collapsed(self):
+        return format_collapsed(self.samples)
+
+    def top(self, limit=20):
+        """Funkcije sa najviše uzoraka na vrhu steka (self vreme)."""
+        leaves = collections.Counter()
+        for stack, count in self.samples.items():
+            leaves[stack.rsplit(';', 1)[-1]] += count
+        total = sum(leaves.values()) or 1
+        return [{'function': name, 'samples': count, 'share': count / total} for name, count in leaves.most_common(limit)]
+
+
+class LoopMonitor:
+    """Meri kašnjenje asyncio petlje i hvata stek kad je petlja blokirana.
+
+    Task u petlji se budi na svakih `interval` sekundi i upisuje koliko je
+    zakasnio (histogram event_loop_lag_seconds). Nezavisna nit prati
+    poslednji otkucaj; ako petlja ne otkuca duže od `threshold`, loguje
+    stek niti petlje u tom trenutku, tj. kod koji je blokira.
+    """
+
+    def __init__(self, interval=0.1, threshold=0.25, history=50):
+        self.interval = interval
+        self.threshold = threshold
+        self.stalls = collections.deque(maxlen=history)
+        self.lag = REGISTRY.histogram('event_loop_lag_seconds', "Kašnjenje buđenja asyncio petlje")
+        self._stalls_total = REGISTRY.counter('event_loop_stalls_total', "Blokade petlje duže od praga")
+        self._last_beat = time.monotonic()
+        self._thread_id = None
+        self._task = None
+        self._stop = threading.Event()
+        self._watcher = None
+
+    def start(self):
+        self._thread_id = threading.get_ident()
+        self._last_beat = time.monotonic()
+        self._stop.clear()
+        self._task = asyncio.create_task(self._beat(), name="loop-monitor")
+        self._watcher = threading.Thread(target=self._watch, name="loop-watchdog", daemon=True)
+        self._watcher.start()
+        return self
+
+    async def _beat(self):
+        while True:
+            started = time.monotonic()
+            await asyncio.sleep(self.interval)
+            now = time.monotonic()
+            self.lag.record(max(0.0, now - started - self.interval))
+            self._last_beat = now
+
+    def _watch(self):
+        reported = None
+        while not self._stop.wait(self.interval):
+            beat = self._last_beat
+            blocked = time.monotonic() - beat
+            if blocked < self.threshold or reported == beat:
+                continue
+            reported = beat
+            frame = sys._current_frames().get(self._thread_id)
+            stack = collapse_stack(frame) if frame is not None else ''
+            self._stalls_total.inc()
+            self.stalls.append({'time': time.time(), 'blocked_ms': round(blocked * 1000, 1), 'stack': stack})
+            logger.warning(f"Event loop blokiran {blocked * 1000:.0f} ms u: {';'.join(stack.split(';')[-3:]) or '?'}")
+
+    def stats(self):
+        return {
+            'lag_p50_ms': round(self.lag.quantile(0.5) * 1000, 2),
+            'lag_p99_ms': round(self.lag.quantile(0.99) * 1000, 2),
+            'lag_max_ms': round(self.lag.max * 1000, 2),
+            'stalls': list(self.stalls)
+        }
+
+    async def stop(self):
+        self._stop.set()
+        if self._task:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
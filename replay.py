@@ -0,0 +1,219 @@
+import argparse
+import logging
+import os
+import struct
+import time
+import numpy as np
+from orderbook import filter_walls, detect_trend, LocalOrderBook
+from levels import generate_signals
+
+logger = logging.getLogger(__name__)
+
+# Format snimka (append-only, little-endian):
+#   fajl:   MAGIC, pa zapisi jedan za drugim
+#   zapis:  timestamp (float64, sekunde), broj bids (uint32), broj asks (uint32),
+#           zatim (bids + asks) x [cena, količina] kao float64
+#   indeks: <fajl>.idx, za svaki zapis [timestamp float64, offset int64]
+MAGIC = b'PSYOB1\x00\x00'
+RECORD_HEADER = struct.Struct('<dII')
+INDEX_DTYPE = np.dtype([('timestamp', '<f8'), ('offset', '<i8')])
+
+# Parametri strategije koji se mogu proslediti replay-u (nazivi kao u config.py, malim slovima)
+FILTER_PARAMS = ('window', 'wall_range_spread', 'min_wall_volume')
+SIGNAL_PARAMS = ('target_digits', 'special_digits', 'hill_wall_volume', 'mountain_wall_volume', 'epic_wall_volume')
+
+
+class OrderBookRecorder:
+    """Upisuje orderbook-ove u kompaktan binarni fajl sa vremenskim indeksom.
+
+    Baferi se prazne na disk posle `flush_every` zapisa ili `flush_interval`
+    sekundi od poslednjeg pražnjenja, pa se snimak može čitati dok bot radi
+    i ne gubi se više od toga ako proces padne.
+    """
+
+    def __init__(self, path, flush_every=100, flush_interval=1.0):
+        self.path = path
+        self.flush_every = flush_every
+        self.flush_interval = flush_interval
+        if os.path.dirname(path) and not os.path.exists(os.path.dirname(path)):
+            os.makedirs(os.path.dirname(path))
+        new_file = not os.path.exists(path) or os.path.getsize(path) == 0
+        self._data = open(path, 'ab')
+        self._index = open(path + '.idx', 'ab')
+        if new_file:
+            self._data.write(MAGIC)
+        self.count = 0
+        self._unflushed = 0
+        self._flushed_at = time.monotonic()
+
+    def record(self, orderbook, timestamp=None):
+        """Dodaje jedan orderbook (ccxt dict ili LocalOrderBook)."""
+        if timestamp is None:
+            exchange_ts = orderbook.get('timestamp') if isinstance(orderbook, dict) else None
+            timestamp = exchange_ts / 1000 if exchange_ts else time.time()
+        bids = np.asarray(orderbook['bids'], dtype='<f8').reshape(-1, 2)[:, :2]
+        asks = np.asarray(orderbook['asks'], dtype='<f8').reshape(-1, 2)[:, :2]
+        offset = self._data.tell()
+        self._data.write(RECORD_HEADER.pack(timestamp, len(bids), len(asks)))
+        self._data.write(np.ascontiguousarray(bids).tobytes())
+        self._data.write(np.ascontiguousarray(asks).tobytes())
+        self._index.write(np.array([(timestamp, offset)], dtype=INDEX_DTYPE).tobytes())
+        self.count += 1
+        self._unflushed += 1
+        if self._unflushed >= self.flush_every or time.monotonic() - self._flushed_at >= self.flush_interval:
+            self.flush()
+
+    def flush(self):
+        # Podaci pre indeksa, da indeks na disku nikad ne pokazuje iza kraja fajla
+        self._data.flush()
+        self._index.flush()
+        self._unflushed = 0
+        self._flushed_at = time.monotonic()
+
+    def close(self):
+        self.flush()
+        self._data.close()
+        self._index.close()
+
+
+class OrderBookRecording:
+    """Čitanje snimka preko memory-mapa; zapisi se vraćaju kao NumPy pogledi bez kopiranja."""
+
+    def __init__(self, path):
+        self.path = path
+        self._data = np.memmap(path, dtype=np.uint8, mode='r')
+        if bytes(self._data[:len(MAGIC)]) != MAGIC:
+            raise ValueError(f"{path} nije snimak orderbook-a")
+        index_path = path + '.idx'
+        if os.path.exists(index_path) and os.path.getsize(index_path):
+            self.index = np.memmap(index_path, dtype=INDEX_DTYPE, mode='r')
+        else:
+            self.index = self._rebuild_index()
+
+    def _rebuild_index(self):
+        """Prolazi kroz ceo fajl i pravi indeks u memoriji (ako .idx fali)."""
+        entries = []
+        offset = len(MAGIC)
+        while offset + RECORD_HEADER.size <= len(self._data):
+            timestamp, n_bids, n_asks = RECORD_HEADER.unpack_from(self._data, offset)
+            entries.append((timestamp, offset))
+            offset += RECORD_HEADER.size + (n_bids + n_asks) * 16
+        return np.array(entries, dtype=INDEX_DTYPE)
+
+    def __len__(self):
+        return len(self.index)
+
+    def __getitem__(self, i):
+        offset = int(self.index['offset'][i])
+        timestamp, n_bids, n_asks = RECORD_HEADER.unpack_from(self._data, offset)
+        start = offset + RECORD_HEADER.size
+        levels = np.frombuffer(self._data, dtype='<f8', count=(n_bids + n_asks) * 2,
+                               offset=start).reshape(-1, 2)
+        return {'timestamp': timestamp, 'bids': levels[:n_bids], 'asks': levels[n_bids:]}
+
+    def __iter__(self):
+        for i in range(len(self)):
+            yield self[i]
+
+    def top_of_book(self):
+        """Vraća nizove (timestamp, najbolji bid, najbolji ask) bez petlje po zapisima.
+
+        Zapisi kojima fali jedna strana knjige nemaju top-of-book i preskaču se.
+        """
+        offsets = np.asarray(self.index['offset'], dtype=np.int64)
+        # Broj bids i asks su dva uint32 odmah posle timestamp-a u zaglavlju
+        counts = self._data[offsets[:, None] + 8 + np.arange(8)].view('<u4').reshape(-1, 2).astype(np.int64)
+        valid = (counts[:, 0] > 0) & (counts[:, 1] > 0)
+        offsets = offsets[valid]
+        bid_offsets = offsets + RECORD_HEADER.size
+        ask_offsets = bid_offsets + counts[valid, 0] * 16
+        bids = self._data[bid_offsets[:, None] + np.arange(8)].view('<f8').ravel()
+        asks = self._data[ask_offsets[:, None] + np.arange(8)].view('<f8').ravel()
+        return np.array(self.index['timestamp'])[valid], bids, asks
+
+    def between(self, start=None, end=None):
+        """Vraća zapise u vremenskom intervalu [start, end) preko binarne pretrage indeksa."""
+        timestamps = self.index['timestamp']
+        lo = 0 if start is None else int(np.searchsorted(timestamps, start, side='left'))
+        hi = len(self) if end is None else int(np.searchsorted(timestamps, end, side='left'))
+        for i in range(lo, hi):
+            yield self[i]
+
+
+def synthetic_books(count, levels=100, mid=0.05, tick=0.00001, wall_density=0.05,
+                    wall_size=20.0, seed=None, start=0.0, interval=0.1):
+    """Generator sintetičkih orderbook-ova (random walk cene + nasumični zidovi)."""
+    rng = np.random.default_rng(seed)
+    offsets = np.arange(levels) * tick
+    for i in range(count):
+        mid = max(mid + rng.normal(0, tick), tick * levels)
+        bid_prices = np.round(mid - tick / 2 - offsets, 8)
+        ask_prices = np.round(mid + tick / 2 + offsets, 8)
+        bid_sizes = rng.exponential(1.0, levels)
+        ask_sizes = rng.exponential(1.0, levels)
+        bid_sizes[rng.random(levels) < wall_density] += wall_size
+        ask_sizes[rng.random(levels) < wall_density] += wall_size
+        yield {
+            'timestamp': start + i * interval,
+            'bids': np.column_stack((bid_prices, bid_sizes)),
+            'asks': np.column_stack((ask_prices, ask_sizes))
+        }
+
+
+def replay(books, rokada_status='off', depth=1000, **params):
+    """Pušta orderbook-ove kroz filter_walls -> detect_trend -> generate_signals.
+
+    Dodatni parametri (FILTER_PARAMS, SIGNAL_PARAMS) zamenjuju vrednosti iz
+    config.py. Vraća dict sa listom signala (svaki sa timestamp-om snimka) i
+    propusnošću: broj knjiga, trajanje i knjiga/signala po sekundi.
+    """
+    unknown = set(params) - set(FILTER_PARAMS) - set(SIGNAL_PARAMS)
+    if unknown:
+        raise ValueError(f"Nepoznati parametri strategije: {sorted(unknown)}")
+    filter_kwargs = {k: v for k, v in params.items() if k in FILTER_PARAMS}
+    signal_kwargs = {k: v for k, v in params.items() if k in SIGNAL_PARAMS}
+    book = LocalOrderBook(depth=depth)
+    signals = []
+    count = 0
+    started = time.perf_counter()
+    for snapshot in books:
+        book.apply_book(snapshot['bids'], snapshot['asks'])
+        current_price = book.mid_price
+        if current_price is None:
+            continue
+        walls = filter_walls(book, current_price, **filter_kwargs)
+        trend = detect_trend(book, current_price)
+        for signal in generate_signals(current_price, walls, trend, rokada_status, **signal_kwargs):
+            signal['timestamp'] = snapshot.get('timestamp')
+            signals.append(signal)
+        count += 1
+    elapsed = time.perf_counter() - started
+    return {
+        'books': count,
+        'seconds': elapsed,
+        'books_per_second': count / elapsed if elapsed else 0.0,
+        'signals_per_second': len(signals) / elapsed if elapsed else 0.0,
+        'signals': signals
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Replay snimljenih ili sintetičkih orderbook-ova")
+    parser.add_argument('path', nargs='?', help="snimak (ako se izostavi, koriste se sintetički podaci)")
+    parser.add_argument('--count', type=int, default=10000, help="broj sintetičkih knjiga")
+    parser.add_argument('--levels', type=int, default=100, help="dubina sintetičkih knjiga")
+    parser.add_argument('--start', type=float, help="početak intervala (unix sekunde)")
+    parser.add_argument('--end', type=float, help="kraj intervala (unix sekunde)")
+    parser.add_argument('--rokada', default='off')
+    args = parser.parse_args()
+
+    # Pipeline loguje svaki tick na INFO nivou, što bi dominiralo merenjem
+    logging.basicConfig(level=logging.WARNING)
+    logging.getLogger().setLevel(logging.WARNING)
+    if args.path:
+        source = OrderBookRecording(args.path).between(args.start, args.end)
+    else:
+        source = synthetic_books(args.count, levels=args.levels, seed=42)
+    result = replay(source, rokada_status=args.rokada)
+    print(f"Knjiga: {result['books']}, signala: {len(result['signals'])}, trajanje: {result['seconds']:.3f}s")
+    print(f"Knjiga/s: {result['books_per_second']:.0f}, signala/s: {result['signals_per_second']:.0f}")
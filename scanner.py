@@ -0,0 +1,184 @@
+import asyncio
+import logging
+import time
+from concurrent.futures import ProcessPoolExecutor
+import ccxt.pro as ccxt
+import numpy as np
+from orderbook import filter_walls
+from levels import classify_wall_volume
+from check_symbols import perpetual_symbols
+from scheduler import RequestScheduler, ScheduledExchange
+from metrics import REGISTRY
+
+logger = logging.getLogger(__name__)
+
+SWEEP_LATENCY = REGISTRY.histogram('scanner_sweep_seconds', "Trajanje jednog prolaza skenera")
+SCANNER_ERRORS = REGISTRY.counter('scanner_errors_total', "Greške skenera")
+
+
+def create_stream_exchange(weight_per_minute=600):
+    """Javni ccxt.pro klijent za depth stream-ove skenera (async_support nema watch_* metode)."""
+    # Cena jednog zahteva u ccxt throttle-u je težina x rateLimit (ms)
+    return ccxt.binance({
+        'enableRateLimit': True,
+        'rateLimit': 60000 / weight_per_minute,
+        # Ređi diff stream je dovoljan za rangiranje, a štedi CPU za stotine simbola
+        'options': {'defaultType': 'future', 'watchOrderBookRate': 500}
+    })
+
+
+def analyze_books(books, spread_pct):
+    """Nalazi najveći zid po simbolu; izvršava se u worker procesu.
+
+    `books` je lista (symbol, bids, asks). Raspon klastera je relativan
+    (spread_pct od mid cene) jer apsolutni WALL_RANGE_SPREAD važi samo za
+    jedan par. Zidovi se rangiraju po notional vrednosti (cena x volumen).
+    """
+    logging.getLogger().setLevel(logging.WARNING)
+    rows = []
+    for symbol, bids, asks in books:
+        if not bids or not asks:
+            continue
+        mid = (bids[0][0] + asks[0][0]) / 2
+        walls = filter_walls({'bids': bids, 'asks': asks}, mid,
+                             wall_range_spread=mid * spread_pct, min_wall_volume=0.0)
+        best = None
+        for side, levels in (('support', walls['support']), ('resistance', walls['resistance'])):
+            for price, volume in levels:
+                if best is None or price * volume > best['notional']:
+                    best = {'side': side, 'price': price, 'volume': volume, 'notional': price * volume}
+        if best is None:
+            continue
+        side_volume = float(np.asarray(bids if best['side'] == 'support' else asks, dtype=float)[:, 1].sum())
+        best.update({
+            'symbol': symbol,
+            'mid': mid,
+            'distance_pct': abs(best['price'] - mid) / mid * 100,
+            'book_share': best['volume'] / side_volume if side_volume else 0.0,
+            'wall_type': classify_wall_volume(best['volume'])
+        })
+        rows.append(best)
+    return rows
+
+
+class WallScanner:
+    """Periodično skenira sve aktivne perpetual simbole i drži rangiranu tabelu zidova.
+
+    REST depth košta najmanje 2 težine po simbolu, pa bi prolaz preko
+    nekoliko stotina simbola u budžetu skenera trajao desetine sekundi.
+    Zato se knjige drže žive preko depth stream-ova (watch_order_book_for_symbols,
+    po `chunk_size` simbola u jednoj pretplati), a prolaz samo analizira
+    poslednje knjige u pool-u procesa, u paketima. REST se troši samo na
+    početne snimke knjiga koje ccxt uzima pri pretplati i posle rupe; njih
+    ccxt throttle drži u budžetu od weight_per_minute.
+    """
+
+    def __init__(self, exchange=None, limit=50, chunk_size=50, weight_per_minute=600,
+                 spread_pct=0.002, processes=2, batch_size=50, retry_delay=5.0):
+        exchange = exchange or create_stream_exchange(weight_per_minute)
+        self.stream = exchange
+        # load_markets ide kroz scheduler; skener nema naloge, pa mu ne treba rezerva
+        self.exchange = ScheduledExchange(exchange, RequestScheduler(weight_per_minute, reserve=0.0))
+        self.limit = limit
+        self.chunk_size = chunk_size
+        self.spread_pct = spread_pct
+        self.processes = processes
+        self.batch_size = batch_size
+        self.retry_delay = retry_delay
+        self.symbols = []
+        self.books = {}
+        self.table = []
+        self.updated = None
+        self.last_sweep_seconds = None
+        self.errors = 0
+        self._pool = None
+        self._task = None
+        self._watchers = []
+
+    async def _watch(self, symbols):
+        """Drži najnovije knjige za grupu simbola u self.books."""
+        while True:
+            try:
+                book = await self.stream.watch_order_book_for_symbols(symbols, limit=self.limit)
+                self.books[book['symbol']] = book
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                self.errors += 1
+                SCANNER_ERRORS.inc()
+                logger.error(f"Scanner: greška u depth stream-u ({symbols[0]}... {len(symbols)} simbola): {e}")
+                await asyncio.sleep(self.retry_delay)
+
+    async def _subscribe(self):
+        await self.exchange.load_markets()
+        self.symbols = perpetual_symbols(self.exchange.markets)
+        chunks = [self.symbols[i:i + self.chunk_size] for i in range(0, len(self.symbols), self.chunk_size)]
+        self._watchers = [asyncio.create_task(self._watch(chunk), name=f"scanner:books:{index}")
+                          for index, chunk in enumerate(chunks)]
+        logger.info(f"Scanner: {len(self.symbols)} perpetual simbola u {len(chunks)} pretplata")
+
+    def _latest_books(self):
+        books = []
+        for symbol in self.symbols:
+            book = self.books.get(symbol)
+            if book is not None:
+                books.append((symbol, [level[:2] for level in book['bids'][:self.limit]],
+                              [level[:2] for level in book['asks'][:self.limit]]))
+        return books
+
+    async def sweep(self):
+        """Jedan prolaz preko poslednjih knjiga svih simbola; vraća rangiranu tabelu."""
+        started = time.monotonic()
+        if not self.symbols:
+            await self._subscribe()
+        books = self._latest_books()
+
+        batches = [books[i:i + self.batch_size] for i in range(0, len(books), self.batch_size)]
+        if self.processes:
+            if self._pool is None:
+                self._pool = ProcessPoolExecutor(max_workers=self.processes)
+            loop = asyncio.get_running_loop()
+            results = await asyncio.gather(*(loop.run_in_executor(self._pool, analyze_books, batch, self.spread_pct)
+                                             for batch in batches))
+        else:
+            results = [analyze_books(batch, self.spread_pct) for batch in batches]
+
+        self.table = sorted((row for rows in results for row in rows), key=lambda r: r['notional'], reverse=True)
+        self.updated = time.time()
+        self.last_sweep_seconds = time.monotonic() - started
+        SWEEP_LATENCY.record(self.last_sweep_seconds)
+        logger.info(f"Scanner: {len(books)}/{len(self.symbols)} knjiga za {self.last_sweep_seconds:.2f}s")
+        return self.table
+
+    async def run(self, interval=10.0):
+        while True:
+            try:
+                await self.sweep()
+            except Exception as e:
+                self.errors += 1
+                SCANNER_ERRORS.inc()
+                logger.error(f"Scanner: greška u prolazu: {e}")
+            await asyncio.sleep(interval)
+
+    def start(self, interval=10.0):
+        self._task = asyncio.create_task(self.run(interval))
+
+    async def close(self):
+        tasks = self._watchers + ([self._task] if self._task else [])
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        self._watchers = []
+        if self._pool:
+            self._pool.shutdown(cancel_futures=True)
+        await self.exchange.close()
+
+    def report(self, limit=50):
+        return {
+            'updated': self.updated,
+            'sweep_seconds': self.last_sweep_seconds,
+            'symbols': len(self.symbols),
+            'books': len(self.books),
+            'errors': self.errors,
+            'walls': self.table[:limit]
+        }
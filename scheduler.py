@@ -0,0 +1,205 @@
+import asyncio
+import functools
+import heapq
+import itertools
+import logging
+import time
+
+logger = logging.getLogger(__name__)
+
+# Klase prioriteta (manji broj = viši prioritet)
+ORDER = 0      # kreiranje/otkazivanje naloga, leverage/margin
+POSITION = 1   # pozicije i otvoreni nalozi
+DATA = 2       # balans i tržišni podaci
+
+# Binance futures težina depth zahteva po limitu (limit <= 50: 2, 100: 5, 500: 10, 1000: 20)
+DEPTH_WEIGHTS = ((50, 2), (100, 5), (500, 10), (1000, 20))
+
+
+def depth_weight(limit):
+    for max_limit, weight in DEPTH_WEIGHTS:
+        if limit <= max_limit:
+            return weight
+    return DEPTH_WEIGHTS[-1][1]
+
+
+def _order_book_weight(args, kwargs):
+    limit = kwargs.get('limit', args[1] if len(args) > 1 else None)
+    # Bez limita binance vraća 500 nivoa
+    return depth_weight(limit or 500)
+
+
+def _open_orders_weight(args, kwargs):
+    symbol = kwargs.get('symbol', args[0] if args else None)
+    return 1 if symbol else 40
+
+
+# (prioritet, težina) po ccxt metodi; težina može biti funkcija (args, kwargs) -> int.
+# Ostale REST metode (REST_PREFIXES) idu kroz scheduler sa težinom 1.
+REQUESTS = {
+    'create_order': (ORDER, 1),
+    'create_orders': (ORDER, 5),
+    'create_limit_buy_order': (ORDER, 1),
+    'create_limit_sell_order': (ORDER, 1),
+    'create_market_order': (ORDER, 1),
+    'cancel_order': (ORDER, 1),
+    'set_leverage': (ORDER, 1),
+    'set_margin_mode': (ORDER, 1),
+    'load_markets': (POSITION, 10),
+    'load_time_difference': (POSITION, 1),
+    'fetch_position': (POSITION, 5),
+    'fetch_positions': (POSITION, 5),
+    'fetch_open_orders': (POSITION, _open_orders_weight),
+    'fetch_order': (POSITION, 1),
+    'fetch_balance': (DATA, 5),
+    'fetch_ticker': (DATA, 1),
+    'fetch_order_book': (DATA, _order_book_weight),
+}
+
+# Prefiksi ccxt REST metoda; watch_* i sinhrone pomoćne metode (set_markets...) prolaze direktno
+REST_PREFIXES = ('fetch_', 'load_', 'create_', 'cancel_', 'edit_', 'set_')
+ORDER_PREFIXES = ('create_', 'cancel_', 'edit_', 'set_')
+
+
+def request_class(name):
+    """(prioritet, težina) za REST metodu; metode van REQUESTS dobijaju težinu 1."""
+    if name in REQUESTS:
+        return REQUESTS[name]
+    return (ORDER if name.startswith(ORDER_PREFIXES) else DATA, 1)
+
+
+class RequestScheduler:
+    """Raspoređuje REST zahteve kroz token bucket težina sa klasama prioriteta.
+
+    Bucket se puni brzinom weight_per_minute / 60 i prima najviše
+    `burst` težine. Zahtevi čekaju u redu po prioritetu; niži prioriteti
+    ne smeju da spuste bucket ispod `reserve` dela kapaciteta, tako da
+    nalozi imaju slobodan budžet i kad monitoring saobraća naglo poraste.
+    Isti read zahtevi (fetch_*) koji su već u toku se spajaju u jedan.
+    """
+
+    def __init__(self, weight_per_minute=1800, burst=None, reserve=0.2):
+        self.rate = weight_per_minute / 60.0
+        self.capacity = burst or weight_per_minute / 4
+        self.reserve = reserve * self.capacity
+        self.tokens = self.capacity
+        self._updated = time.monotonic()
+        self._queue = []
+        self._sequence = itertools.count()
+        self._inflight = {}
+        self._wakeup = asyncio.Event()
+        self._dispatcher = None
+        self.counts = {ORDER: 0, POSITION: 0, DATA: 0}
+        self.coalesced = 0
+        self.max_wait = {ORDER: 0.0, POSITION: 0.0, DATA: 0.0}
+
+    def _refill(self):
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    async def submit(self, name, func, *args, **kwargs):
+        """Izvršava func(*args, **kwargs) kad budžet i prioritet to dozvole."""
+        priority, weight = request_class(name)
+        if callable(weight):
+            weight = weight(args, kwargs)
+        key = None
+        if name.startswith('fetch_'):
+            key = (name, repr(args), repr(sorted(kwargs.items())))
+            if key in self._inflight:
+                self.coalesced += 1
+                return await asyncio.shield(self._inflight[key])
+
+        future = asyncio.get_running_loop().create_future()
+        if key:
+            self._inflight[key] = future
+            future.add_done_callback(lambda _: self._inflight.pop(key, None))
+        heapq.heappush(self._queue, (priority, next(self._sequence), time.monotonic(), weight,
+                                     future, functools.partial(func, *args, **kwargs)))
+        if self._dispatcher is None or self._dispatcher.done():
+            self._dispatcher = asyncio.create_task(self._dispatch())
+        self._wakeup.set()
+        return await (asyncio.shield(future) if key else future)
+
+    async def _dispatch(self):
+        while True:
+            self._wakeup.clear()
+            # Otkazani zahtevi se ne šalju
+            while self._queue and self._queue[0][4].done():
+                heapq.heappop(self._queue)
+            if not self._queue:
+                await self._wakeup.wait()
+                continue
+            priority, _, queued, weight, future, call = self._queue[0]
+            self._refill()
+            needed = weight + (self.reserve if priority > ORDER else 0)
+            if self.tokens < needed:
+                # Čeka dopunu ili novi (možda važniji) zahtev
+                try:
+                    await asyncio.wait_for(self._wakeup.wait(), (needed - self.tokens) / self.rate)
+                except asyncio.TimeoutError:
+                    pass
+                continue
+            heapq.heappop(self._queue)
+            self.tokens -= weight
+            self.counts[priority] += 1
+            self.max_wait[priority] = max(self.max_wait[priority], time.monotonic() - queued)
+            asyncio.create_task(self._run(future, call))
+
+    @staticmethod
+    async def _run(future, call):
+        try:
+            result = await call()
+        except Exception as e:
+            if not future.done():
+                future.set_exception(e)
+            return
+        if not future.done():
+            future.set_result(result)
+
+    def stats(self):
+        self._refill()
+        return {
+            'tokens': round(self.tokens, 1),
+            'capacity': self.capacity,
+            'queued': len(self._queue),
+            'requests': dict(self.counts),
+            'coalesced': self.coalesced,
+            'max_wait': {k: round(v, 3) for k, v in self.max_wait.items()}
+        }
+
+    async def close(self):
+        if self._dispatcher:
+            self._dispatcher.cancel()
+            await asyncio.gather(self._dispatcher, return_exceptions=True)
+        for entry in self._queue:
+            entry[4].cancel()
+        self._queue = []
+
+
+class ScheduledExchange:
+    """Omotač oko ccxt exchange-a: sve REST metode idu kroz scheduler.
+
+    Sve ostalo (watch_*, markets, market(), precisionMode...) prosleđuje se
+    direktno, pa se postojeći kod ne menja.
+    """
+
+    def __init__(self, exchange, scheduler=None):
+        self._exchange = exchange
+        self.scheduler = scheduler or RequestScheduler()
+
+    def __getattr__(self, name):
+        attr = getattr(self._exchange, name)
+        if callable(attr) and (name in REQUESTS or (name.startswith(REST_PREFIXES) and asyncio.iscoroutinefunction(attr))):
+            return functools.partial(self.scheduler.submit, name, attr)
+        return attr
+
+    async def load_markets(self, reload=False, *args, **kwargs):
+        # Već učitani marketi se ne naplaćuju (ccxt tada ne šalje zahtev)
+        if getattr(self._exchange, 'markets', None) and not reload:
+            return await self._exchange.load_markets(reload, *args, **kwargs)
+        return await self.scheduler.submit('load_markets', self._exchange.load_markets, reload, *args, **kwargs)
+
+    async def close(self):
+        await self.scheduler.close()
+        await self._exchange.close()
@@ -0,0 +1,161 @@
+import asyncio
+import json
+import logging
+import os
+import time
+import ccxt.pro as ccxt
+
+logger = logging.getLogger(__name__)
+
+
+def create_binance(config=None):
+    """Binance futures klijent iz ccxt.pro.
+
+    ccxt.async_support ima iste REST metode, ali watch_* su samo stub-ovi
+    koji bacaju NotSupported, pa orderbook, user-data i mark price stream-ovi
+    nikad ne bi proradili.
+    """
+    config = dict(config or {})
+    config['options'] = {'defaultType': 'future', **config.get('options', {})}
+    return ccxt.binance(config)
+
+
+class MarketCache:
+    """Metapodaci marketa (exchange.markets i currencies) u JSON fajlu sa TTL-om.
+
+    load_markets na Binance futures povlači nekoliko MB; sa svežim kešom
+    exchange dobija markete preko set_markets, a ccxt load_markets je posle
+    toga no-op.
+    """
+
+    def __init__(self, path, ttl=3600.0):
+        self.path = path
+        self.ttl = ttl
+
+    def age(self):
+        """Starost keša u sekundama (None ako fajl ne postoji)."""
+        try:
+            return time.time() - os.path.getmtime(self.path)
+        except OSError:
+            return None
+
+    def expires_in(self):
+        age = self.age()
+        return 0.0 if age is None else max(0.0, self.ttl - age)
+
+    def load(self):
+        """Vraća (markets, currencies) ako je keš svež, inače None."""
+        if not self.expires_in():
+            return None
+        try:
+            with open(self.path, 'r') as f:
+                data = json.load(f)
+            return data['markets'], data.get('currencies')
+        except Exception as e:
+            logger.error(f"Greška pri čitanju keša marketa {self.path}: {e}")
+            return None
+
+    def save(self, markets, currencies):
+        if os.path.dirname(self.path) and not os.path.exists(os.path.dirname(self.path)):
+            os.makedirs(os.path.dirname(self.path))
+        tmp_path = f"{self.path}.tmp"
+        with open(tmp_path, 'w') as f:
+            json.dump({'markets': markets, 'currencies': currencies}, f)
+        os.replace(tmp_path, self.path)
+
+    def apply(self, exchange):
+        """Puni exchange iz keša; vraća False ako keš nije svež."""
+        cached = self.load()
+        if cached is None:
+            return False
+        exchange.set_markets(*cached)
+        return True
+
+
+class ExchangeSession:
+    """Dugoživi exchange klijent koji preživljava start/stop trading-a.
+
+    Klijent (sa WebSocket konekcijama i scheduler-om) se pravi pri prvom
+    get() i zatvara tek u close(). Marketi dolaze iz MarketCache-a kad je
+    svež, a pozadinski task ih ponovo učitava sa berze kad keš istekne.
+    configure() pamti poslednji leverage i margin mod po simbolu i ne zove
+    berzu dok se postavke ne promene.
+    """
+
+    def __init__(self, factory, cache_path, ttl=3600.0, retry_delay=60.0):
+        self.factory = factory
+        self.cache = MarketCache(cache_path, ttl)
+        self.retry_delay = retry_delay
+        self.exchange = None
+        self._configured = {}
+        self._lock = asyncio.Lock()
+        self._refresh = None
+
+    async def get(self):
+        """Vraća otvoren klijent sa učitanim marketima (pravi ga samo prvi put)."""
+        async with self._lock:
+            if self.exchange is None:
+                exchange = self.factory()
+                cached = await asyncio.to_thread(self.cache.load)
+                if cached is not None:
+                    exchange.set_markets(*cached)
+                    # Binance fetch_markets inače usput meri razliku satova za potpisane zahteve
+                    if getattr(exchange, 'options', {}).get('adjustForTimeDifference'):
+                        await exchange.load_time_difference()
+                    logger.info(f"Marketi učitani iz keša ({len(exchange.markets)})")
+                else:
+                    await exchange.load_markets()
+                    await self._save(exchange)
+                    logger.info(f"Marketi učitani sa berze ({len(exchange.markets)})")
+                self.exchange = exchange
+                self._refresh = asyncio.create_task(self._refresh_loop(), name="session:markets")
+        return self.exchange
+
+    def warm(self):
+        """Otvara sesiju u pozadini, da prvi start ne čeka load_markets."""
+        task = asyncio.create_task(self.get(), name="session:warm")
+        task.add_done_callback(self._warmed)
+        return task
+
+    @staticmethod
+    def _warmed(task):
+        if not task.cancelled() and task.exception():
+            logger.error(f"Greška pri otvaranju exchange sesije: {task.exception()}")
+
+    async def _save(self, exchange):
+        try:
+            await asyncio.to_thread(self.cache.save, exchange.markets, exchange.currencies)
+        except Exception as e:
+            logger.error(f"Greška pri snimanju keša marketa: {e}")
+
+    async def _refresh_loop(self):
+        """Osvežava markete kad keš istekne (novi listinzi, promene tick size-a)."""
+        while True:
+            await asyncio.sleep(max(self.retry_delay, self.cache.expires_in()))
+            try:
+                await self.exchange.load_markets(reload=True)
+                await self._save(self.exchange)
+                logger.info(f"Marketi osveženi ({len(self.exchange.markets)})")
+            except Exception as e:
+                logger.error(f"Greška pri osvežavanju marketa: {e}")
+
+    async def configure(self, symbol, leverage, margin_mode='isolated', exchange=None):
+        """Postavlja leverage i margin mod; vraća False ako su već postavljeni u ovoj sesiji."""
+        wanted = (leverage, margin_mode)
+        if self._configured.get(symbol) == wanted:
+            return False
+        exchange = exchange or self.exchange
+        await exchange.set_leverage(leverage, symbol)
+        await exchange.set_margin_mode(margin_mode, symbol)
+        self._configured[symbol] = wanted
+        return True
+
+    async def close(self):
+        if self._refresh:
+            self._refresh.cancel()
+            await asyncio.gather(self._refresh, return_exceptions=True)
+            self._refresh = None
+        if self.exchange is not None:
+            await self.exchange.close()
+            self.exchange = None
+        self._configured = {}
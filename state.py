@@ -0,0 +1,338 @@
+import asyncio
+import copy
+import json
+import logging
+import os
+import time
+from metrics import REGISTRY
+
+logger = logging.getLogger(__name__)
+
+SERIALIZE_LATENCY = REGISTRY.histogram('state_persist_seconds', "Snimanje stanja (data.json)", phase='serialize')
+WRITE_LATENCY = REGISTRY.histogram('state_persist_seconds', "Snimanje stanja (data.json)", phase='write')
+COMMAND_LATENCY = REGISTRY.histogram('command_seconds', "Round-trip komande do trading procesa")
+
+DEFAULT_STATE = {
+    'price': 0, 'support': 0, 'resistance': 0, 'position': 'None',
+    'balance': 0, 'unimmr': 0, 'logs': [], 'manual': 'off',
+    'rokada': 'off', 'trade_amount': 0.01, 'leverage': 1, 'rsi': 'off'
+}
+
+
+class StateStore:
+    """Deljeno stanje bota u memoriji sa verzionisanim, atomskim izmenama.
+
+    Trading proces (main.py) je vlasnik stanja: drži Unix socket server i
+    povremeno snima data.json. api.py se povezuje kao klijent i drži repliku
+    koju server ažurira porukama. Poruke su JSON linije:
+    {"op": "state", "version": v, "data": {...}} pri povezivanju, zatim
+    {"op": "update", "version": v, "changes": {...}} za svaku izmenu.
+
+    Istim socket-om klijent šalje komande vlasniku stanja:
+    {"op": "command", "id": n, "command": ..., "args": {...}}. Server odmah
+    vraća {"op": "ack", "id": n}, izvršava handler u zasebnom tasku (van
+    trading petlje) i na kraju šalje {"op": "result", "id": n, "status": ...}.
+    """
+
+    def __init__(self, path, snapshot_interval=1.0):
+        self.path = path
+        self.snapshot_interval = snapshot_interval
+        self.version = 0
+        self._data = dict(DEFAULT_STATE)
+        self._listeners = []
+        self._persisted_version = 0
+        self._role = None  # 'server' u trading procesu, 'client' u api procesu
+        self._server = None
+        self._clients = set()
+        self._writer = None
+        self._pending = {}
+        self._tasks = []
+        self._command_handler = None
+        self._commands = set()
+        self._requests = {}
+        self._request_id = 0
+
+    # --- Lokalni pristup ---
+
+    def load(self):
+        """Učitava poslednji snimak sa diska (samo pri pokretanju)."""
+        try:
+            with open(self.path, 'r') as f:
+                self._data.update(json.load(f))
+        except Exception as e:
+            logger.error(f"Greška pri čitanju {self.path}: {e}, koristim podrazumevano stanje")
+        return self
+
+    def get(self, key, default=None):
+        return self._data.get(key, default)
+
+    def snapshot(self):
+        """Vraća kopiju celog stanja."""
+        return copy.deepcopy(self._data)
+
+    def add_listener(self, callback):
+        """Registruje callback(version, changes) koji se poziva posle svake izmene."""
+        self._listeners.append(callback)
+
+    def remove_listener(self, callback):
+        if callback in self._listeners:
+            self._listeners.remove(callback)
+
+    def update(self, changes, expected_version=None):
+        """Atomski primenjuje izmene i vraća novu verziju.
+
+        Ako je zadat expected_version, a stanje je u međuvremenu promenjeno,
+        podiže ValueError (compare-and-set).
+        """
+        if expected_version is not None and expected_version != self.version:
+            raise ValueError(f"Verzija stanja je {self.version}, očekivana {expected_version}")
+        changes = self._diff(changes)
+        if not changes:
+            return self.version
+        if self._role == 'client':
+            # Primeni lokalno odmah, vlasnik stanja dodeljuje konačnu verziju;
+            # dok veza ne postoji izmene čekaju u _pending
+            self._pending.update(changes)
+            self._flush_pending()
+        return self._apply(self.version + 1, changes)
+
+    def _diff(self, changes):
+        missing = object()
+        return {k: v for k, v in changes.items() if self._data.get(k, missing) != v}
+
+    def _apply(self, version, changes):
+        changes = self._diff(changes)
+        self.version = version
+        if not changes:
+            return version
+        self._data.update(changes)
+        for callback in list(self._listeners):
+            try:
+                callback(version, changes)
+            except Exception as e:
+                logger.error(f"Greška u listener-u stanja: {e}")
+        if self._server is not None:
+            self._broadcast({'op': 'update', 'version': version, 'changes': changes})
+        return version
+
+    # --- Trajni snimci ---
+
+    def persist(self):
+        """Snima stanje na disk ako se promenilo od poslednjeg snimka."""
+        if self.version == self._persisted_version:
+            return False
+        return self._write(self.version, json.dumps(self._data, indent=2))
+
+    def _write(self, version, payload):
+        started = time.perf_counter_ns()
+        tmp_path = f"{self.path}.tmp"
+        try:
+            with open(tmp_path, 'w') as f:
+                f.write(payload)
+            os.replace(tmp_path, self.path)
+        except OSError:
+            # data.json je bind-mount u docker-compose, pa rename preko njega ne uspeva
+            with open(self.path, 'w') as f:
+                f.write(payload)
+        self._persisted_version = version
+        WRITE_LATENCY.record_ns(started)
+        return True
+
+    async def _persist_loop(self):
+        while True:
+            await asyncio.sleep(self.snapshot_interval)
+            # Klijent snima samo dok vlasnik stanja nije dostupan
+            if self._role == 'client' and self._writer is not None:
+                continue
+            if self.version == self._persisted_version:
+                continue
+            try:
+                # Serijalizacija u petlji (stanje se ne menja usred dump-a), pisanje u thread-u
+                started = time.perf_counter_ns()
+                payload = json.dumps(self._data, indent=2)
+                SERIALIZE_LATENCY.record_ns(started)
+                await asyncio.to_thread(self._write, self.version, payload)
+            except Exception as e:
+                logger.error(f"Greška pri snimanju stanja: {e}")
+
+    # --- Server (trading proces) ---
+
+    async def serve(self, socket_path):
+        """Pokreće Unix socket server i periodično snimanje."""
+        self._role = 'server'
+        os.makedirs(os.path.dirname(socket_path), exist_ok=True)
+        if os.path.exists(socket_path):
+            os.unlink(socket_path)
+        self._server = await asyncio.start_unix_server(self._handle_client, path=socket_path)
+        self._tasks.append(asyncio.create_task(self._persist_loop()))
+        logger.info(f"State server sluša na {socket_path}")
+
+    async def _handle_client(self, reader, writer):
+        self._clients.add(writer)
+        try:
+            self._send(writer, {'op': 'state', 'version': self.version, 'data': self._data})
+            while True:
+                line = await reader.readline()
+                if not line:
+                    break
+                message = json.loads(line)
+                if message.get('op') == 'update':
+                    self.update(message.get('changes', {}))
+                elif message.get('op') == 'command':
+                    self._send(writer, {'op': 'ack', 'id': message['id']})
+                    task = asyncio.create_task(self._run_command(writer, message),
+                                               name=f"command:{message.get('command')}")
+                    self._commands.add(task)
+                    task.add_done_callback(self._commands.discard)
+        except Exception as e:
+            logger.error(f"Greška u state konekciji: {e}")
+        finally:
+            self._clients.discard(writer)
+            writer.close()
+
+    def set_command_handler(self, handler):
+        """Registruje async handler(command, args) čiji se rezultat vraća klijentu."""
+        self._command_handler = handler
+
+    async def _run_command(self, writer, message):
+        reply = {'op': 'result', 'id': message['id']}
+        try:
+            if self._command_handler is None:
+                raise RuntimeError("Komande nisu podržane")
+            result = await self._command_handler(message['command'], message.get('args') or {})
+            reply.update(status='success', result=result)
+        except Exception as e:
+            logger.error(f"Greška u komandi {message.get('command')}: {e}")
+            reply.update(status='error', message=str(e))
+        if not writer.is_closing():
+            self._send(writer, reply)
+
+    def _send(self, writer, message):
+        writer.write(json.dumps(message, default=str).encode() + b'\n')
+
+    def _broadcast(self, message):
+        line = json.dumps(message).encode() + b'\n'
+        for writer in list(self._clients):
+            if writer.is_closing():
+                self._clients.discard(writer)
+                continue
+            writer.write(line)
+
+    # --- Klijent (api proces) ---
+
+    async def connect(self, socket_path, retry_delay=1.0):
+        """Pokreće pozadinsko povezivanje na vlasnika stanja sa ponovnim pokušajima."""
+        self._role = 'client'
+        self.load()
+        self._tasks.append(asyncio.create_task(self._client_loop(socket_path, retry_delay)))
+        self._tasks.append(asyncio.create_task(self._persist_loop()))
+
+    async def _client_loop(self, socket_path, retry_delay):
+        while True:
+            try:
+                reader, writer = await asyncio.open_unix_connection(socket_path)
+            except OSError:
+                await asyncio.sleep(retry_delay)
+                continue
+            logger.info(f"Povezan na state server {socket_path}")
+            try:
+                while True:
+                    line = await reader.readline()
+                    if not line:
+                        break
+                    message = json.loads(line)
+                    if message.get('op') == 'state':
+                        # Izmene napravljene dok veza nije postojala ostaju na snazi i šalju se tek sad
+                        self._apply(message['version'], {**message['data'], **self._pending})
+                        self._writer = writer
+                        self._flush_pending()
+                    elif message.get('op') == 'update':
+                        self._apply(message['version'], message['changes'])
+                    elif message.get('op') in ('ack', 'result'):
+                        self._on_reply(message)
+            except Exception as e:
+                logger.error(f"Greška u vezi sa state serverom: {e}")
+            finally:
+                self._writer = None
+                writer.close()
+                # Pozivalac čeka ack ili rezultat, pa se greška postavlja samo na future koji se čeka
+                for ack, result in self._requests.values():
+                    future = result if ack.done() else ack
+                    if not future.done():
+                        future.set_exception(ConnectionError("Veza sa trading procesom prekinuta"))
+            logger.warning("Veza sa state serverom prekinuta, ponovo se povezujem")
+            await asyncio.sleep(retry_delay)
+
+    def _on_reply(self, message):
+        futures = self._requests.get(message['id'])
+        if futures is None:
+            return  # Pozivalac je već odustao (timeout)
+        ack, result = futures
+        if not ack.done():
+            ack.set_result(True)
+        if message['op'] == 'result' and not result.done():
+            result.set_result({k: v for k, v in message.items() if k not in ('op', 'id')})
+
+    @property
+    def connected(self):
+        """Da li replika ima vezu sa vlasnikom stanja (komande mogu da se pošalju)."""
+        return self._writer is not None
+
+    async def request(self, command, args=None, timeout=10.0, ack_timeout=1.0):
+        """Šalje komandu vlasniku stanja i čeka rezultat.
+
+        Vraća {'status': 'success', 'result': ...} ili {'status': 'error',
+        'message': ...}. Podiže ConnectionError ako veza ne postoji ili pukne,
+        a TimeoutError ako ack ne stigne za ack_timeout ili rezultat za timeout.
+        """
+        if self._writer is None:
+            raise ConnectionError("Trading proces nije povezan")
+        self._request_id += 1
+        request_id = self._request_id
+        loop = asyncio.get_running_loop()
+        ack, result = loop.create_future(), loop.create_future()
+        self._requests[request_id] = (ack, result)
+        started = time.perf_counter_ns()
+        try:
+            self._send(self._writer, {'op': 'command', 'id': request_id, 'command': command, 'args': args or {}})
+            try:
+                await asyncio.wait_for(asyncio.shield(ack), ack_timeout)
+            except asyncio.TimeoutError:
+                raise TimeoutError(f"Komanda {command} nije potvrđena za {ack_timeout}s") from None
+            try:
+                reply = await asyncio.wait_for(result, timeout)
+            except asyncio.TimeoutError:
+                raise TimeoutError(f"Komanda {command} nije završena za {timeout}s") from None
+        finally:
+            self._requests.pop(request_id, None)
+        COMMAND_LATENCY.record_ns(started)
+        return reply
+
+    def _flush_pending(self):
+        if self._writer is None or not self._pending:
+            return
+        self._send(self._writer, {'op': 'update', 'changes': self._pending})
+        self._pending = {}
+
+    async def close(self):
+        """Zaustavlja pozadinske taskove, zatvara veze i snima poslednje stanje."""
+        owns_file = self._role == 'server' or self._writer is None
+        for task in self._tasks + list(self._commands):
+            task.cancel()
+        self._tasks = []
+        if self._server is not None:
+            self._server.close()
+            for writer in list(self._clients):
+                writer.close()
+            self._clients.clear()
+            await self._server.wait_closed()
+            self._server = None
+        if self._writer is not None:
+            self._writer.close()
+            self._writer = None
+        if not owns_file:
+            return
+        try:
+            self.persist()
+        except Exception as e:
+            logger.error(f"Greška pri snimanju stanja: {e}")
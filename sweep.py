@@ -0,0 +1,102 @@
+import argparse
+import itertools
+import logging
+import os
+import random
+import tempfile
+from concurrent.futures import ProcessPoolExecutor
+from replay import OrderBookRecorder, OrderBookRecording, synthetic_books, replay
+from backtest import run_backtest, summarize
+
+# Podrazumevani prostor parametara (nazivi kao u config.py, malim slovima)
+DEFAULT_SPACE = {
+    'wall_range_spread': [0.0002, 0.0005, 0.001],
+    'min_wall_volume': [5.0, 10.0, 20.0],
+    'hill_wall_volume': [50.0],
+    'mountain_wall_volume': [100.0],
+    'epic_wall_volume': [500.0],
+    'target_digits': [[2, 3, 7, 8], [2, 8], [3, 7]],
+    'special_digits': [[1, 9]]
+}
+
+# Snimak otvoren jednom po worker procesu (memory-map, stranice deli OS između procesa)
+_recording = None
+_top_of_book = None
+
+
+def grid(space):
+    """Sve kombinacije parametara iz {naziv: [vrednosti]}."""
+    names = list(space)
+    return [dict(zip(names, values)) for values in itertools.product(*(space[n] for n in names))]
+
+
+def random_sample(space, count, seed=None):
+    """`count` nasumičnih kombinacija (bez ponavljanja kad je prostor dovoljno velik)."""
+    rng = random.Random(seed)
+    combinations = grid(space)
+    if count >= len(combinations):
+        return combinations
+    return rng.sample(combinations, count)
+
+
+def _init_worker(path):
+    global _recording, _top_of_book
+    # Pipeline loguje svaki tick na INFO nivou
+    logging.getLogger().setLevel(logging.WARNING)
+    _recording = OrderBookRecording(path)
+    _top_of_book = _recording.top_of_book()
+
+
+def _evaluate(params, rokada_status, start, end, backtest_kwargs):
+    result = replay(_recording.between(start, end), rokada_status=rokada_status, **params)
+    trades = run_backtest(*_top_of_book, result['signals'], **backtest_kwargs)
+    return {
+        'params': params,
+        'summary': summarize(trades),
+        'books': result['books'],
+        'seconds': result['seconds']
+    }
+
+
+def run_sweep(path, param_sets, processes=None, metric='total_pnl', rokada_status='off',
+              start=None, end=None, **backtest_kwargs):
+    """Evaluira skupove parametara nad snimkom u pool-u procesa i vraća ih rangirane po `metric`.
+
+    Svaki worker otvara isti snimak preko memory-mapa, tako da se podaci
+    ne kopiraju niti serijalizuju između procesa; šalju se samo parametri
+    i sumarni rezultati.
+    """
+    with ProcessPoolExecutor(max_workers=processes, initializer=_init_worker, initargs=(path,)) as pool:
+        futures = [pool.submit(_evaluate, params, rokada_status, start, end, backtest_kwargs)
+                   for params in param_sets]
+        results = [future.result() for future in futures]
+    return sorted(results, key=lambda r: r['summary'][metric], reverse=True)
+
+
+def write_synthetic(path, count, levels=100, seed=42):
+    """Upisuje sintetičke knjige u snimak da bi ih workeri čitali preko memory-mapa."""
+    recorder = OrderBookRecorder(path)
+    for book in synthetic_books(count, levels=levels, seed=seed):
+        recorder.record(book, timestamp=book['timestamp'])
+    recorder.close()
+    return path
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Pretraga parametara strategije nad snimljenim knjigama")
+    parser.add_argument('path', nargs='?', help="snimak iz replay.OrderBookRecorder (bez njega sintetički podaci)")
+    parser.add_argument('--samples', type=int, help="broj nasumičnih kombinacija (podrazumevano ceo grid)")
+    parser.add_argument('--processes', type=int, default=os.cpu_count())
+    parser.add_argument('--metric', default='total_pnl')
+    parser.add_argument('--count', type=int, default=5000, help="broj sintetičkih knjiga")
+    parser.add_argument('--top', type=int, default=10)
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.WARNING)
+    path = args.path or write_synthetic(os.path.join(tempfile.mkdtemp(), 'synthetic.bin'), args.count)
+    param_sets = random_sample(DEFAULT_SPACE, args.samples, seed=42) if args.samples else grid(DEFAULT_SPACE)
+    results = run_sweep(path, param_sets, processes=args.processes, metric=args.metric)
+    for rank, result in enumerate(results[:args.top], 1):
+        summary = result['summary']
+        print(f"{rank}. {args.metric}={summary[args.metric]:.6f} win_rate={summary['win_rate']:.2%} "
+              f"trgovina={summary['closed']} {result['params']}")
@@ -0,0 +1,5 @@
+import os
+import sys
+
+# Moduli bota su na vrhu repozitorijuma (bez paketa)
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
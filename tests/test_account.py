@@ -0,0 +1,94 @@
+import asyncio
+from ccxt.base.errors import NotSupported
+from account import AccountCache
+from fake_exchange import FakeExchange
+from state import StateStore
+
+SYMBOL = 'ETH/USDT:USDT'
+
+
+def published(contracts):
+    owner = AccountCache(StateStore('/nonexistent/data.json'))
+    owner.apply_balance({'USDT': {'free': 90.0, 'used': 10.0, 'total': 100.0}})
+    if contracts:
+        owner.apply_position({'symbol': SYMBOL, 'side': 'long', 'contracts': contracts,
+                              'entryPrice': 0.05, 'unrealizedPnl': 0.0})
+    owner.publish()
+    return owner.state.snapshot()
+
+
+def test_follower_mirrors_published_positions():
+    replica = StateStore('/nonexistent/data.json')
+    follower = AccountCache()
+    seen = []
+    follower.add_listener(seen.append)
+    follower.follow(replica)
+
+    replica._apply(1, published(0.01))
+    assert follower.free == 90.0
+    assert follower.position(SYMBOL)['contracts'] == 0.01
+    assert follower.position(SYMBOL)['side'] == 'long'
+
+    # Ista pozicija ponovo objavljena ne budi listener-e
+    replica._apply(2, {'account': {**published(0.01)['account'], 'updated': 1.0}})
+    assert len(seen) == 1
+
+    replica._apply(3, published(0))
+    assert follower.position(SYMBOL)['contracts'] == 0
+    assert [p['contracts'] for p in seen] == [0.01, 0]
+
+
+class NoUserDataExchange(FakeExchange):
+    async def watch_balance(self, params={}):
+        raise NotSupported('watchBalance')
+
+    async def watch_positions(self, symbols=None, since=None, limit=None, params={}):
+        raise NotSupported('watchPositions')
+
+
+def requests(exchange, method):
+    return sum(1 for name, _ in exchange.requests if name == method)
+
+
+def test_unsupported_streams_fall_back_to_rest():
+    exchange = NoUserDataExchange(0)
+    account = AccountCache(retry_delay=0)
+
+    async def scenario():
+        account.start(exchange)
+        for _ in range(20):
+            await asyncio.sleep(0)
+        # Pozicija otvorena mimo stream-a (keš je ne vidi)
+        exchange.positions[SYMBOL] = {'contracts': 0.02, 'side': 'short', 'entryPrice': 0.05}
+        position = await account.current_position(exchange, SYMBOL)
+        await account.close()
+        return position
+
+    position = asyncio.run(scenario())
+    assert not account.live
+    assert position['contracts'] == 0.02 and position['side'] == 'short'
+    # Bez resinhronizacije posle svakog neuspelog stream poziva
+    assert requests(exchange, 'fetch_balance') == 1
+
+
+def test_live_streams_serve_position_from_cache():
+    exchange = FakeExchange(0)
+    account = AccountCache()
+
+    async def scenario():
+        account.start(exchange)
+        exchange.set_balance(50.0)
+        exchange.positions[SYMBOL] = {'contracts': 0.01, 'side': 'long', 'entryPrice': 0.05}
+        exchange._publish_position(SYMBOL)
+        for _ in range(20):
+            await asyncio.sleep(0)
+        before = requests(exchange, 'fetch_positions')
+        position = await account.current_position(exchange, SYMBOL)
+        live = account.live
+        await account.close()
+        return position, live, before
+
+    position, live, before = asyncio.run(scenario())
+    assert live
+    assert position['contracts'] == 0.01
+    assert requests(exchange, 'fetch_positions') == before
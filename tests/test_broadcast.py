@@ -0,0 +1,64 @@
+import asyncio
+from broadcast import BroadcastHub
+from state import StateStore
+
+
+def drain(subscriber):
+    messages = []
+    while not subscriber.queue.empty():
+        messages.append(subscriber.queue.get_nowait())
+    return messages
+
+
+def test_snapshot_first_then_only_changed_keys():
+    state = StateStore('/nonexistent/data.json')
+    state.update({'price': 1.0, 'balance': 100.0})
+    hub = BroadcastHub(state)
+    fast, other = hub.subscribe({'symbols': ['X']}), hub.subscribe()
+    state.update({'price': 1.1, 'balance': 100.0})
+    state.update({'price': 1.1})  # Bez promene nikome se ništa ne šalje
+
+    first, delta = drain(fast)
+    assert first['type'] == 'snapshot' and first['version'] == 1
+    assert first['data'] == {**state.snapshot(), 'price': 1.0, 'symbols': ['X']}
+    assert delta == {'type': 'delta', 'version': 2, 'data': {'price': 1.1}}
+    assert [m['type'] for m in drain(other)] == ['snapshot', 'delta']
+
+
+def test_slow_client_gets_conflated_latest_values():
+    state = StateStore('/nonexistent/data.json')
+    hub = BroadcastHub(state, queue_size=2)
+    subscriber = hub.subscribe()
+    for i in range(5):
+        state.update({'price': i, f"k{i}": i})
+
+    messages = drain(subscriber)
+    assert len(messages) <= 2
+    # Spojeni snapshot ostaje snapshot, a novije vrednosti pobeđuju
+    assert messages[0]['type'] == 'snapshot' and messages[-1]['version'] == state.version
+    data = {}
+    for message in messages:
+        data.update(message['data'])
+    assert data == state.snapshot() and data['price'] == 4
+
+
+def test_client_that_never_reads_is_dropped_without_blocking_others():
+    state = StateStore('/nonexistent/data.json')
+    hub = BroadcastHub(state, queue_size=1, max_conflations=3)
+    stuck, reader = hub.subscribe(), hub.subscribe()
+
+    async def scenario():
+        received = []
+        for i in range(10):
+            state.update({'price': i})
+            received.append(await reader.get())
+        return received
+
+    received = asyncio.run(scenario())
+    assert stuck.dropped and stuck not in hub.subscribers
+    assert reader in hub.subscribers and not reader.dropped
+    assert received[-1]['data']['price'] == 9
+
+    hub.unsubscribe(reader)
+    state.update({'price': 10})
+    assert not hub.subscribers and reader.queue.empty()
@@ -0,0 +1,84 @@
+import asyncio
+from engine import SymbolHealth, TradingEngine
+
+
+def test_repeated_errors_degrade_until_next_tick():
+    health = SymbolHealth('ETH/USDT:USDT', degraded_after=3)
+    health.status = 'running'
+    for _ in range(2):
+        health.error(ValueError('feed'))
+    assert health.status == 'running'
+    health.error(ValueError('feed'))
+    assert health.status == 'degraded'
+    health.tick()
+    assert health.status == 'running'
+    assert health.failures == 0
+    assert health.errors == 3
+
+
+def test_failing_pipeline_is_restarted():
+    calls = []
+
+    async def pipeline(exchange, symbol, health):
+        calls.append(symbol)
+        if len(calls) < 3:
+            raise ConnectionError('feed pao')
+        health.tick()
+        await asyncio.sleep(3600)
+
+    async def scenario():
+        engine = TradingEngine(None, pipeline, restart_delay=0.001, max_restart_delay=0.01)
+        engine.start(['ETH/USDT:USDT'])
+        for _ in range(100):
+            await asyncio.sleep(0.005)
+            if engine.health['ETH/USDT:USDT'].ticks:
+                break
+        report = engine.health_report()['ETH/USDT:USDT']
+        await engine.stop()
+        return report
+
+    report = asyncio.run(scenario())
+    assert report['status'] == 'running'
+    assert report['restarts'] == 2
+    assert report['errors'] == 2
+    assert report['last_error'] == 'feed pao'
+
+
+def ticking_pipeline(exchange, symbol, health):
+    async def run():
+        from metrics import REGISTRY
+        ticks = REGISTRY.counter('ticks_total', "Tikovi", symbol=symbol)
+        while True:
+            ticks.inc()
+            health.tick()
+            await asyncio.sleep(0.01)
+    return run()
+
+
+def metrics_report():
+    from metrics import REGISTRY
+    return {'metrics': REGISTRY.snapshot()}
+
+
+def test_sharded_engine_collects_worker_reports():
+    from engine import ShardedEngine
+    from fake_exchange import FakeExchange
+
+    async def scenario():
+        engine = ShardedEngine(FakeExchange, ticking_pipeline, 2, interval=0.05, report=metrics_report)
+        task = asyncio.create_task(engine.run(['A', 'B']))
+        reports = {}
+        for _ in range(200):
+            await asyncio.sleep(0.05)
+            reports = engine.worker_reports()
+            if len(reports) == 2 and all(report['metrics'] for report in reports.values()):
+                break
+        task.cancel()
+        await asyncio.gather(task, return_exceptions=True)
+        return reports
+
+    reports = asyncio.run(scenario())
+    assert len(reports) == 2
+    symbols = {dict(labels)['symbol'] for report in reports.values()
+               for name, _, _, labels, _ in report['metrics'] if name == 'ticks_total'}
+    assert symbols == {'A', 'B'}
@@ -0,0 +1,114 @@
+import asyncio
+import pytest
+from ccxt.async_support.base.exchange import Exchange as RestExchange
+from fake_exchange import FakeExchange
+from feed import BookFeed
+from session import create_binance
+
+SYMBOL = 'ETH/USDT:USDT'
+
+
+def book_at(price):
+    return [[price - 0.00001, 1.0]], [[price + 0.00001, 1.0]]
+
+
+def new_feed(primary, standby=None, snapshot=None, gap_timeout_ms=50):
+    return BookFeed(primary, SYMBOL, max_age_ms=10_000, standby=standby, snapshot_exchange=snapshot,
+                    gap_timeout_ms=gap_timeout_ms, backoff=0.01, max_backoff=0.01)
+
+
+async def settle(seconds=0.01):
+    await asyncio.sleep(seconds)
+
+
+def test_standby_takes_over_when_primary_drops():
+    async def scenario():
+        primary, standby = FakeExchange(0), FakeExchange(0)
+        feed = new_feed(primary, standby).start()
+        primary.push_order_book(SYMBOL, *book_at(0.05), nonce=1)
+        standby.push_order_book(SYMBOL, *book_at(0.05), nonce=1)
+        first, _ = await feed.next()
+        primary.drop_stream(SYMBOL)
+        await settle()
+        standby.push_order_book(SYMBOL, *book_at(0.051), nonce=2)
+        second, _ = await feed.next()
+        stats = feed.stats()
+        await feed.close()
+        return first, second, stats
+
+    first, second, stats = asyncio.run(scenario())
+    assert first['nonce'] == 1
+    assert second['nonce'] == 2
+    assert stats['active'] == 'standby'
+    assert stats['failovers'] == 1
+    assert stats['sources']['primary']['status'] == 'reconnecting'
+
+
+def test_quiet_market_is_not_a_stall():
+    async def scenario():
+        primary, standby = FakeExchange(0), FakeExchange(0)
+        feed = new_feed(primary, standby, snapshot=FakeExchange(0)).start()
+        primary.push_order_book(SYMBOL, *book_at(0.05), nonce=1)
+        standby.push_order_book(SYMBOL, *book_at(0.05), nonce=1)
+        await feed.next()
+        # Oba izvora ćute duže od gap_timeout_ms: knjiga se nije menjala
+        waiter = asyncio.create_task(feed.next())
+        await settle(0.2)
+        stats = feed.stats()
+        waiter.cancel()
+        await feed.close()
+        return stats
+
+    stats = asyncio.run(scenario())
+    assert stats['snapshots'] == 0
+    assert all(s['reconnects'] == 0 and s['status'] == 'live' for s in stats['sources'].values())
+
+
+def test_source_lagging_behind_the_other_is_resubscribed():
+    async def scenario():
+        primary, standby = FakeExchange(0), FakeExchange(0)
+        feed = new_feed(primary, standby).start()
+        primary.push_order_book(SYMBOL, *book_at(0.05), nonce=1)
+        standby.push_order_book(SYMBOL, *book_at(0.05), nonce=1)
+        await feed.next()
+        for nonce in range(2, 12):
+            standby.push_order_book(SYMBOL, *book_at(0.05), nonce=nonce)
+            await settle(0.02)
+        stats = feed.stats()
+        await feed.close()
+        return stats
+
+    stats = asyncio.run(scenario())
+    assert stats['sources']['primary']['reconnects'] >= 1
+    assert stats['sources']['standby']['reconnects'] == 0
+    assert stats['active'] == 'standby'
+
+
+def test_rest_snapshot_when_no_stream_is_live():
+    async def scenario():
+        feed = new_feed(FakeExchange(0), FakeExchange(0), snapshot=FakeExchange(0))
+        book, _ = await feed.next()
+        stats = feed.stats()
+        await feed.close()
+        return book, stats
+
+    book, stats = asyncio.run(scenario())
+    assert book['bids']
+    assert stats['snapshots'] == 1
+    assert stats['active'] is None
+
+
+@pytest.mark.parametrize('method', ['watch_order_book', 'watch_orders', 'watch_balance', 'watch_positions',
+                                    'watch_mark_price'])
+def test_exchange_factory_implements_streams(method):
+    async def scenario():
+        client = create_binance()
+        try:
+            return type(client), client.options['defaultType']
+        finally:
+            await client.close()
+
+    cls, market_type = asyncio.run(scenario())
+    # Osnovna async_support implementacija samo podiže NotSupported (ili metode nema)
+    assert getattr(cls, method) is not getattr(RestExchange, method, None)
+    assert market_type == 'future'
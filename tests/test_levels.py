@@ -0,0 +1,54 @@
+import pytest
+from config import TARGET_DIGITS
+from levels import generate_signals
+from ticks import TickScale
+
+
+def reference_signals(walls):
+    """Signali po staroj logici (cifra iz str(round(price, 5))), bez rokade."""
+    signals = []
+    for side, digits, kind in (('support', (2, 3), 'LONG'), ('resistance', (7, 8), 'SHORT')):
+        for price, volume in sorted(walls[side], key=lambda x: x[1], reverse=True):
+            last_digit = int(str(round(price, 5))[-1])
+            if last_digit in TARGET_DIGITS and last_digit in digits:
+                signals.append((kind, price, volume))
+    return signals
+
+
+def prices(base, tick):
+    # Cene na tiku bez nule na kraju (stara str() logika je tu davala pogrešnu cifru)
+    return [round(base + i * tick, 8) for i in range(1, 40) if round((base + i * tick) / tick) % 10]
+
+
+@pytest.mark.parametrize('tick, base', [(0.00001, 0.0496), (0.01, 2500.0), (0.1, 65000.0)])
+def test_signals_match_reference(tick, base):
+    levels = prices(base, tick)
+    walls = {
+        'support': [[p, 20.0 + i] for i, p in enumerate(levels)],
+        'resistance': [[p, 60.0 + i] for i, p in enumerate(levels)]
+    }
+    signals = generate_signals(base, walls, 'UP', scale=TickScale(tick))
+    expected = reference_signals(walls)
+    assert expected
+    assert [(s['type'], s['entry_price'], s['volume']) for s in signals] == expected
+
+
+def test_last_digit_uses_tick_decimals():
+    assert TickScale(0.01).last_digit(TickScale(0.01).to_ticks(2500.37)) == 7
+    assert TickScale(0.1).last_digit(TickScale(0.1).to_ticks(65000.3)) == 3
+    assert TickScale(0.0001).last_digit(TickScale(0.0001).to_ticks(1.2348)) == 8
+    # Nula na kraju je cifra 0, ne prethodna cifra kao kod str()
+    assert TickScale(0.01).last_digit(TickScale(0.01).to_ticks(2500.30)) == 0
+
+
+def test_stop_loss_and_take_profit_on_tick_grid():
+    scale = TickScale(0.01)
+    signal, = generate_signals(2500.0, {'support': [[2500.32, 30.0]], 'resistance': []}, 'UP', scale=scale)
+    assert signal['stop_loss'] < signal['entry_price'] < signal['take_profit']
+    for price in (signal['stop_loss'], signal['take_profit']):
+        assert scale.to_price(scale.to_ticks(price)) == price
+
+
+def test_half_tick_rounds_up():
+    # Binarno tačne polovine tika: np.rint bi dao [0, 2, 2]
+    assert TickScale(0.5).to_ticks([0.25, 0.75, 1.25]).tolist() == [1, 2, 3]
@@ -0,0 +1,161 @@
+import asyncio
+import logging
+import queue
+import sqlite3
+import threading
+from logging.handlers import QueueHandler
+from logger import AUDIT, HOT_PATH_LOGGERS, LogBufferHandler, RateLimitFilter, TradeJournal, forward_logging
+
+
+def record(msg, created, level=logging.INFO, args=(), name='bot', extra=None):
+    rec = logging.LogRecord(name, level, __file__, 1, msg, args, None)
+    rec.created = created
+    rec.__dict__.update(extra or {})
+    return rec
+
+
+def test_rate_limit_counts_suppressed_records():
+    log_filter = RateLimitFilter(rate=2.0)
+    passed = [log_filter.filter(record("Signal za %s", 100.0, args=('X',))) for _ in range(5)]
+    assert passed == [True, True, False, False, False]
+    # Posle pola sekunde stiže jedan token, a poruka nosi broj preskočenih
+    late = record("Signal za %s", 100.5, args=('X',))
+    assert log_filter.filter(late)
+    assert late.getMessage() == "Signal za X (+3 preskočeno)"
+
+
+def test_rate_limit_is_per_template_and_lets_errors_through():
+    log_filter = RateLimitFilter(rate=1.0)
+    assert log_filter.filter(record("Signal za %s", 100.0, args=('X',)))
+    assert not log_filter.filter(record("Signal za %s", 100.0, args=('Y',)))
+    assert log_filter.filter(record("Kreiran nalog %s", 100.0, args=('X',)))
+    assert log_filter.filter(record("Signal za %s", 100.0, level=logging.ERROR, args=('X',)))
+
+
+def test_rate_limit_applies_only_to_hot_path_loggers():
+    log_filter = RateLimitFilter(rate=1.0, loggers=HOT_PATH_LOGGERS)
+    hot = [log_filter.filter(record("Signal za %s", 100.0, args=('X',), name='main')) for _ in range(3)]
+    assert hot == [True, False, False]
+    # Nalozi i pozicije: drugi moduli i AUDIT zapisi iz vruće putanje nikad se ne preskaču
+    assert all(log_filter.filter(record("Bracket-i za %s: %d", 100.0, args=('X', 1), name='orders'))
+               for _ in range(10))
+    assert all(log_filter.filter(record("Trailing stop za %s pomeren na %s", 100.0, args=('X', 1.0),
+                                        name='positions')) for _ in range(10))
+    assert all(log_filter.filter(record("Kreiran %s nalog: %s", 100.0, args=('LONG', {}), name='main',
+                                        extra=AUDIT)) for _ in range(10))
+
+
+def test_rate_limit_bounds_its_key_map():
+    log_filter = RateLimitFilter(rate=1.0, max_keys=3)
+    for i in range(10):
+        log_filter.filter(record(f"poruka {i}", 100.0))
+    assert len(log_filter._buckets) <= 3
+
+
+def test_forward_logging_sends_formatted_records_with_local_filters():
+    root = logging.getLogger()
+    saved = root.handlers[:]
+    local = QueueHandler(queue.SimpleQueue())
+    local.addFilter(RateLimitFilter(rate=1.0))
+    root.handlers = [local]
+    level = root.level
+    root.setLevel(logging.INFO)
+    sink = queue.Queue()
+    try:
+        forward_logging(sink)
+        logging.getLogger('worker').info("Tick za %s", 'X')
+        logging.getLogger('worker').info("Tick za %s", 'X')
+    finally:
+        root.handlers = saved
+        root.setLevel(level)
+    forwarded = sink.get_nowait()
+    assert forwarded.getMessage() == "Tick za X"
+    assert forwarded.args is None
+    assert sink.empty()
+
+
+def test_log_buffer_keeps_last_lines():
+    handler = LogBufferHandler(capacity=3)
+    handler.setFormatter(logging.Formatter('%(message)s'))
+    for i in range(5):
+        handler.emit(record("linija %d", 100.0, args=(i,)))
+    assert handler.tail() == ["linija 2", "linija 3", "linija 4"]
+    assert handler.tail(2) == ["linija 3", "linija 4"]
+
+
+def test_log_buffer_pushes_lines_from_other_threads_and_drops_oldest():
+    handler = LogBufferHandler()
+    handler.setFormatter(logging.Formatter('%(message)s'))
+
+    async def scenario():
+        lines = handler.subscribe(queue_size=2)
+        emitter = threading.Thread(target=lambda: [handler.emit(record("linija %d", 100.0, args=(i,)))
+                                                   for i in range(4)])
+        emitter.start()
+        await asyncio.to_thread(emitter.join)
+        for _ in range(10):
+            await asyncio.sleep(0)
+        received = [lines.get_nowait() for _ in range(lines.qsize())]
+        handler.unsubscribe(lines)
+        handler.emit(record("posle", 100.0))
+        await asyncio.sleep(0)
+        return received, lines.empty()
+
+    received, empty_after = asyncio.run(scenario())
+    assert received == ["linija 2", "linija 3"]
+    assert empty_after
+
+
+def test_log_buffer_forgets_subscribers_of_closed_loops():
+    handler = LogBufferHandler()
+
+    async def subscribe():
+        return handler.subscribe()
+
+    asyncio.run(subscribe())
+    handler.emit(record("posle gašenja petlje", 100.0))
+    assert not handler._subscribers
+    assert handler.tail(1) == ["posle gašenja petlje"]
+
+
+def journal_rows(path):
+    with sqlite3.connect(path) as conn:
+        return conn.execute("SELECT price, side, result FROM trades ORDER BY rowid").fetchall()
+
+
+def test_trade_journal_flushes_batches_and_on_interval(tmp_path):
+    path = str(tmp_path / 'logs' / 'trades.db')
+    journal = TradeJournal(path, batch_size=3, flush_interval=0.05)
+
+    async def scenario():
+        await journal.start()
+        for i in range(4):
+            journal.log(0.05 + i, 0.05, 'LONG', 20.0)
+        # Pun batch ide odmah, ostatak posle flush_interval, bez close()
+        for _ in range(50):
+            await asyncio.sleep(0.01)
+            if len(journal_rows(path)) == 4:
+                break
+        rows = journal_rows(path)
+        await journal.close()
+        return rows
+
+    rows = asyncio.run(scenario())
+    assert [price for price, _, _ in rows] == [0.05, 1.05, 2.05, 3.05]
+    with sqlite3.connect(path) as conn:
+        assert conn.execute("PRAGMA journal_mode").fetchone()[0] == 'wal'
+
+
+def test_trade_journal_close_writes_pending_rows(tmp_path):
+    path = str(tmp_path / 'trades.db')
+    journal = TradeJournal(path, batch_size=100, flush_interval=60.0)
+
+    async def scenario():
+        await journal.start()
+        journal.log(0.05, 0.05, 'SHORT', 20.0, result=-1.5)
+        journal.log(0.06, 0.06, 'LONG', 20.0)
+        await journal.close()
+        await journal.close()  # Drugi close ne radi ništa
+
+    asyncio.run(scenario())
+    assert journal_rows(path) == [(0.05, 'SHORT', -1.5), (0.06, 'LONG', None)]
@@ -0,0 +1,20 @@
+from metrics import Registry
+
+
+def test_render_merges_worker_snapshots():
+    worker = Registry()
+    worker.counter('brackets_total', "Postavljeni bracket-i", symbol='ETH/USDT:USDT').inc(3)
+    latency = worker.histogram('stage_seconds', "Trajanje faza", stage='tick', symbol='ETH/USDT:USDT')
+    for seconds in (0.001, 0.002, 0.004):
+        latency.record(seconds)
+
+    parent = Registry()
+    parent.counter('errors_total', "Greške").inc()
+    text = parent.render({4242: worker.snapshot()})
+
+    assert 'psybot_errors_total 1' in text
+    assert 'psybot_brackets_total{symbol="ETH/USDT:USDT",worker="4242"} 3' in text
+    assert 'psybot_stage_seconds_count{stage="tick",symbol="ETH/USDT:USDT",worker="4242"} 3' in text
+    assert text.count('# TYPE psybot_stage_seconds summary') == 1
+    quantile = [line for line in text.splitlines() if 'quantile="0.99"' in line][0]
+    assert abs(float(quantile.split()[-1]) - 0.004) < 0.0002
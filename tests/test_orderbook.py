@@ -0,0 +1,93 @@
+import math
+import random
+from collections import Counter
+import numpy as np
+import pytest
+from config import PRICE_PRECISION
+from orderbook import LocalOrderBook, filter_walls, filter_walls_reference
+from ticks import TickScale
+
+
+def test_scaled_wall_prices_have_uniform_last_digit():
+    scale = TickScale(0.01)
+    rng = random.Random(7)
+    digits = Counter()
+    for _ in range(2000):
+        # Deset uzastopnih tikova: prosek je uvek na pola tika
+        base = rng.randrange(200000, 300000)
+        bids = [[round((base + i) * 0.01, 2), 5.0] for i in range(11)]
+        walls = filter_walls({'bids': bids, 'asks': []}, bids[0][0], threshold=0, window=10,
+                             wall_range_spread=0.1, min_wall_volume=0, scale=scale)
+        (price, volume), = walls['support']
+        assert price == round((base + 5) * 0.01, 2) and volume == 50.0
+        digits[int(scale.last_digit(scale.to_ticks(price)))] += 1
+    assert sorted(digits) == list(range(10))
+    assert min(digits.values()) > 140
+
+
+def brute_force(book, current_price):
+    bids = [[p, a] for p, a in sorted(book['bids'].items(), reverse=True)]
+    asks = [[p, a] for p, a in sorted(book['asks'].items())]
+    buy = sum(a for p, a in bids if p > current_price * 0.99)
+    sell = sum(a for p, a in asks if p < current_price * 1.01)
+    return bids, asks, buy, sell
+
+
+def test_apply_book_tracks_brute_force_totals_and_band():
+    rng = random.Random(3)
+    book = {'bids': {round(100 - i * 0.01, 2): rng.uniform(1, 10) for i in range(300)},
+            'asks': {round(100.01 + i * 0.01, 2): rng.uniform(1, 10) for i in range(300)}}
+    local = LocalOrderBook(depth=1000)
+    local.apply_book(*brute_force(book, 100.0)[:2])
+    snapshots = []
+    local.apply_snapshot = lambda *args: snapshots.append(args)
+    for _ in range(300):
+        # Nekoliko nivoa se menja, briše ili dodaje, kao između dve poruke depth stream-a
+        for side, sign in (('bids', -1), ('asks', 1)):
+            for _ in range(rng.randint(0, 6)):
+                price = round((100 if side == 'bids' else 100.01) + sign * rng.randrange(320) * 0.01, 2)
+                if rng.random() < 0.3:
+                    book[side].pop(price, None)
+                else:
+                    book[side][price] = rng.uniform(1, 10)
+        current_price = 100.0 + rng.uniform(-0.5, 0.5)
+        bids, asks, buy, sell = brute_force(book, current_price)
+        local.apply_book(bids, asks)
+        assert local.bids.tolist() == bids and local.asks.tolist() == asks
+        assert math.isclose(local.total_bid_volume, sum(a for _, a in bids), rel_tol=1e-9)
+        assert math.isclose(local.total_ask_volume, sum(a for _, a in asks), rel_tol=1e-9)
+        local_buy, local_sell = local.pressure(current_price)
+        assert math.isclose(local_buy, buy, rel_tol=1e-9) and math.isclose(local_sell, sell, rel_tol=1e-9)
+    assert not snapshots
+
+
+def random_book(rng, tick, base, levels=200):
+    """Knjiga na mreži tika sa nasumičnim rupama (prozori preko rupe nisu zid) i povremenim zidovima."""
+    def side(sign):
+        ticks = base + sign * np.cumsum(rng.choice([1, 1, 1, 2, 4], levels))
+        volumes = rng.exponential(1.0, levels) + (rng.random(levels) < 0.05) * 20.0
+        return [[round(t * tick, 8), v] for t, v in zip(ticks.tolist(), volumes.tolist())]
+    return {'bids': side(-1), 'asks': side(1)}
+
+
+@pytest.mark.parametrize('tick, base', [(0.00001, 5000), (0.01, 250000), (0.1, 650000)])
+def test_filter_walls_matches_reference(tick, base):
+    rng = np.random.default_rng(11)
+    scale = TickScale(tick)
+    # Granica raspona između tikova: float razlika cena tačno na granici bi zavisila od ulp-a
+    params = {'threshold': 0.01, 'window': 10, 'wall_range_spread': 14.5 * tick, 'min_wall_volume': 10.0}
+    found = 0
+    for _ in range(50):
+        book = random_book(rng, tick, base)
+        mid = (book['bids'][0][0] + book['asks'][0][0]) / 2
+        reference = filter_walls_reference(book, mid, **params)
+        assert filter_walls(book, mid, **params) == reference
+        scaled = filter_walls(book, mid, scale=scale, **params)
+        for side in ('support', 'resistance'):
+            assert [v for _, v in scaled[side]] == [v for _, v in reference[side]]
+            # Prosek na ceo tik (pola naviše) naspram reference zaokružene na PRICE_PRECISION
+            for (price, _), (expected, _) in zip(scaled[side], reference[side]):
+                assert abs(price - expected) <= tick / 2 + 10 ** -PRICE_PRECISION / 2 + 1e-9
+                assert scale.to_price(scale.to_ticks(price)) == price
+            found += len(reference[side])
+    assert found
@@ -0,0 +1,273 @@
+import asyncio
+import pytest
+from ccxt.base.errors import NotSupported
+from fake_exchange import FakeExchange
+from orders import (BracketOrderError, LiveOrderIndex, bracket_legs, parse_client_order_id, place_bracket,
+                    submit_legs)
+
+SYMBOL = 'ETH/USDT:USDT'
+ORDER = (SYMBOL, 'buy', 0.01, 0.05, 0.04995, 0.0501)
+
+
+def run(coroutine):
+    return asyncio.run(coroutine)
+
+
+async def open_bracket(exchange, index, order=ORDER, amount=None):
+    """Postavlja ulaz, popunjava ga (ceo ili `amount`) i šalje SL/TP kao posle watch_orders događaja."""
+    bracket = await place_bracket(exchange, *order)
+    index.add(bracket)
+    exchange.fill(bracket['entry']['id'], amount)
+    drain(exchange, index)
+    await index.protect(exchange, bracket)
+    return bracket
+
+
+def test_reduce_only_legs_are_rejected_without_position():
+    # Binance (-2022) odbija reduceOnly SL/TP u istom batch-u sa još nepopunjenim ulazom
+    exchange = FakeExchange(0)
+    entry, stop, take = run(submit_legs(exchange, bracket_legs(*ORDER)))
+    assert entry['status'] == 'open'
+    assert all(isinstance(r, Exception) and '-2022' in str(r) for r in (stop, take))
+
+
+@pytest.mark.parametrize('batch', [True, False])
+def test_legs_follow_entry_fill_and_are_reduce_only_and_tagged(batch):
+    exchange = FakeExchange(0, batch=batch)
+    index = LiveOrderIndex()
+
+    async def scenario():
+        bracket = await place_bracket(exchange, *ORDER)
+        assert bracket['stop_loss'] is None and len(exchange.orders) == 1
+        index.add(bracket)
+        assert await index.protect(exchange, bracket) and len(exchange.orders) == 1
+        exchange.fill(bracket['entry']['id'])
+        drain(exchange, index)
+        assert await index.protect(exchange, bracket)
+        return bracket
+
+    bracket = run(scenario())
+    for leg, role in (('entry', 'entry'), ('stop_loss', 'stop_loss'), ('take_profit', 'take_profit')):
+        assert parse_client_order_id(bracket[leg]) == (bracket['tag'], role)
+    for leg in ('stop_loss', 'take_profit'):
+        assert bracket[leg]['status'] == 'open' and bracket[leg]['amount'] == 0.01
+        assert bracket[leg]['info'].get('reduceOnly') and not bracket[leg]['info'].get('closePosition')
+
+
+def test_second_bracket_on_same_side_is_accepted():
+    exchange = FakeExchange(0)
+    index = LiveOrderIndex()
+
+    async def scenario():
+        await open_bracket(exchange, index)
+        return await open_bracket(exchange, index, (SYMBOL, 'buy', 0.01, 0.0499, 0.04985, 0.05))
+
+    assert run(scenario())['stop_loss']['status'] == 'open'
+
+
+@pytest.mark.parametrize('batch', [True, False])
+def test_failed_stop_closes_position(batch):
+    exchange = FakeExchange(0, fail={'stop_market': 2}, batch=batch)
+    index = LiveOrderIndex()
+    run(open_bracket(exchange, index))
+    assert len(index) == 0
+    assert all(o['status'] in ('canceled', 'closed') for o in exchange.orders.values())
+    assert not exchange.positions
+
+
+@pytest.mark.parametrize('filled', [0.004, None])
+def test_failed_take_profit_closes_filled_part_of_entry(filled):
+    exchange = FakeExchange(0, fail={'take_profit_market': 2})
+    index = LiveOrderIndex()
+    run(open_bracket(exchange, index, amount=filled))
+    closes = [o for o in exchange.orders.values() if o['type'] == 'market']
+    assert len(closes) == 1
+    assert closes[0]['amount'] == (filled or 0.01) and closes[0]['info'] == {'reduceOnly': True}
+    assert not exchange.positions
+    assert not [o for o in exchange.orders.values() if o['status'] == 'open']
+
+
+def test_rejected_entry_raises():
+    exchange = FakeExchange(0, fail={'limit': 1})
+    with pytest.raises(BracketOrderError):
+        run(place_bracket(exchange, *ORDER))
+    assert not exchange.orders
+
+
+def drain(exchange, index):
+    """Primenjuje sve watch_orders događaje koji čekaju; vraća naloge za otkazivanje."""
+    stream = exchange._stream('orders')
+    cancels = []
+    while not stream.empty():
+        cancels += index.apply(stream.get_nowait())
+    return cancels
+
+
+def test_filled_entry_stays_in_index_and_is_not_canceled():
+    exchange = FakeExchange(0)
+    index = LiveOrderIndex()
+
+    async def scenario():
+        bracket = await open_bracket(exchange, index)
+        assert index.get(bracket['tag'])['filled'] == 0.01
+        assert await index.cancel_stale(exchange, SYMBOL, set()) == 0
+        return bracket
+
+    bracket = run(scenario())
+    assert len(index) == 1
+    assert exchange.orders[bracket['stop_loss']['id']]['status'] == 'open'
+
+
+def test_stale_unfilled_bracket_is_canceled():
+    exchange = FakeExchange(0)
+    index = LiveOrderIndex()
+
+    async def scenario():
+        index.add(await place_bracket(exchange, *ORDER))
+        return await index.cancel_stale(exchange, SYMBOL, set())
+
+    assert run(scenario()) == 1
+    assert len(index) == 0
+    assert [o['status'] for o in exchange.orders.values()] == ['canceled']
+
+
+def test_partially_filled_stale_entry_gets_protection():
+    exchange = FakeExchange(0)
+    index = LiveOrderIndex()
+
+    async def scenario():
+        bracket = await place_bracket(exchange, *ORDER)
+        key = index.add(bracket)
+        exchange.fill(bracket['entry']['id'], 0.004)
+        assert await index.cancel_stale(exchange, SYMBOL, set()) == 0
+        return bracket, key
+
+    bracket, key = run(scenario())
+    assert key in index and index.get(bracket['tag'])['filled'] == 0.004
+    assert exchange.orders[bracket['entry']['id']]['status'] == 'canceled'
+    assert exchange.orders[bracket['stop_loss']['id']]['status'] == 'open'
+
+
+def test_executed_stop_cancels_take_profit():
+    exchange = FakeExchange(0)
+    index = LiveOrderIndex()
+
+    async def scenario():
+        bracket = await open_bracket(exchange, index)
+        exchange.fill(bracket['stop_loss']['id'])
+        assert [o['id'] for o in drain(exchange, index)] == [bracket['take_profit']['id']]
+        return bracket
+
+    assert index.get(run(scenario())['tag']) is None
+    assert not exchange.positions
+
+
+def test_sync_adopts_own_brackets_and_ignores_foreign_orders():
+    exchange = FakeExchange(0)
+
+    async def scenario():
+        # Stanje pre restarta: jedan nepopunjen ulaz i jedan zaštićen bracket
+        before = LiveOrderIndex()
+        placed = await place_bracket(exchange, *ORDER)
+        filled = await open_bracket(exchange, before, (SYMBOL, 'buy', 0.01, 0.0499, 0.04985, 0.05))
+        foreign = await exchange.create_order(SYMBOL, 'limit', 'buy', 1, 0.04)
+        index = LiveOrderIndex()
+        await index.sync(exchange, SYMBOL)
+        assert index.get(filled['tag'])['filled'] == 0.01
+        assert index.get(filled['tag'])['stop_loss']['id'] == filled['stop_loss']['id']
+        assert await index.cancel_stale(exchange, SYMBOL, set()) == 0
+        return index, placed, foreign, filled
+
+    index, placed, foreign, filled = run(scenario())
+    # Ulaz bez SL/TP čije cene indeks ne zna se povlači
+    assert index.get(placed['tag']) is None
+    assert exchange.orders[placed['entry']['id']]['status'] == 'canceled'
+    assert exchange.orders[foreign['id']]['status'] == 'open'
+    assert exchange.orders[filled['stop_loss']['id']]['status'] == 'open'
+
+
+def test_events_before_add_are_applied():
+    exchange = FakeExchange(0)
+    index = LiveOrderIndex()
+
+    async def scenario():
+        bracket = await place_bracket(exchange, *ORDER)
+        exchange.fill(bracket['entry']['id'])
+        drain(exchange, index)
+        index.add(bracket)
+        await index.protect(exchange, bracket)
+        return bracket
+
+    bracket = run(scenario())
+    assert index.get(bracket['tag'])['filled'] == 0.01
+    assert bracket['stop_loss']['status'] == 'open' and bracket['take_profit']['status'] == 'open'
+
+
+def test_sync_protects_entry_filled_without_order_event():
+    exchange = FakeExchange(0)
+    index = LiveOrderIndex()
+
+    async def scenario():
+        bracket = await place_bracket(exchange, *ORDER)
+        index.add(bracket)
+        exchange.fill(bracket['entry']['id'])
+        await index.sync(exchange, SYMBOL)
+        return bracket
+
+    bracket = run(scenario())
+    assert index.get(bracket['tag'])['filled'] == 0.01
+    assert exchange.orders[bracket['stop_loss']['id']]['status'] == 'open'
+    assert exchange.orders[bracket['take_profit']['id']]['status'] == 'open'
+
+
+def test_sync_cancels_sibling_of_executed_leg():
+    exchange = FakeExchange(0)
+    index = LiveOrderIndex()
+
+    async def scenario():
+        executed = await open_bracket(exchange, index)
+        abandoned = await place_bracket(exchange, SYMBOL, 'buy', 0.01, 0.0499, 0.04985, 0.05)
+        index.add(abandoned)
+        # Bez drain(): watch_orders događaji nikad ne stignu
+        exchange.fill(executed['take_profit']['id'])
+        await exchange.cancel_order(abandoned['entry']['id'], SYMBOL)
+        await index.sync(exchange, SYMBOL)
+        return executed
+
+    executed = run(scenario())
+    assert len(index) == 0
+    assert exchange.orders[executed['stop_loss']['id']]['status'] == 'canceled'
+    assert not [o for o in exchange.orders.values() if o['status'] == 'open']
+
+
+class NoOrderStreamExchange(FakeExchange):
+    async def watch_orders(self, symbol=None, since=None, limit=None, params={}):
+        raise NotSupported('watchOrders')
+
+
+def test_watch_without_order_stream_keeps_oco_by_polling():
+    exchange = NoOrderStreamExchange(0)
+    index = LiveOrderIndex()
+
+    async def until(condition):
+        for _ in range(100):
+            await asyncio.sleep(0.01)
+            if condition():
+                return
+
+    async def scenario():
+        bracket = await place_bracket(exchange, *ORDER)
+        index.add(bracket)
+        task = asyncio.create_task(index.watch(exchange, SYMBOL, poll_interval=0.01))
+        exchange.fill(bracket['entry']['id'])
+        await until(lambda: index.get(bracket['tag'])['stop_loss'])
+        stop_loss, take_profit = (index.get(bracket['tag'])[leg]['id'] for leg in ('stop_loss', 'take_profit'))
+        exchange.fill(stop_loss)
+        await until(lambda: exchange.orders[take_profit]['status'] != 'open')
+        task.cancel()
+        await asyncio.gather(task, return_exceptions=True)
+        return take_profit
+
+    take_profit = run(scenario())
+    assert exchange.orders[take_profit]['status'] == 'canceled'
+    assert len(index) == 0
@@ -0,0 +1,121 @@
+import asyncio
+from fake_exchange import FakeExchange
+from orders import LiveOrderIndex, place_bracket
+from positions import PositionMonitor
+
+SYMBOL = 'ETH/USDT:USDT'
+
+
+async def open_brackets(exchange, index, monitor, fill=True):
+    brackets = []
+    for entry, amount in ((0.05, 0.01), (0.0501, 0.02)):
+        bracket = await place_bracket(exchange, SYMBOL, 'buy', amount, entry, entry - 0.00005, entry + 0.0001)
+        index.add(bracket)
+        monitor.track(bracket, 0.00005)
+        if fill:
+            exchange.fill(bracket['entry']['id'])
+        brackets.append(bracket)
+    stream = exchange._stream('orders')
+    while not stream.empty():
+        index.apply(stream.get_nowait())
+    await index.protect_filled(exchange, SYMBOL)
+    return brackets
+
+
+async def move_mark(exchange, monitor, price):
+    monitor.start(exchange, SYMBOL)
+    exchange.set_mark_price(SYMBOL, price)
+    for _ in range(20):
+        await asyncio.sleep(0)
+
+
+def open_stops(exchange):
+    return [o for o in exchange.orders.values() if o['type'] == 'stop_market' and o['status'] == 'open']
+
+
+def test_each_bracket_trails_its_own_stop():
+    exchange = FakeExchange(0)
+    index = LiveOrderIndex()
+    monitor = PositionMonitor(index)
+
+    async def scenario():
+        brackets = await open_brackets(exchange, index, monitor)
+        original = [b['stop_loss']['id'] for b in brackets]
+        await move_mark(exchange, monitor, 0.0505)
+        await monitor.close()
+        return brackets, original
+
+    brackets, original = asyncio.run(scenario())
+    stops = open_stops(exchange)
+    assert sorted(o['amount'] for o in stops) == [0.01, 0.02]
+    assert all(o['stopPrice'] == 0.05045 and o['info']['reduceOnly'] for o in stops)
+    assert all(exchange.orders[id]['status'] == 'canceled' for id in original)
+    for bracket in brackets:
+        assert index.get(bracket['tag'])['stop_loss']['id'] in {o['id'] for o in stops}
+
+
+def test_unfilled_entry_does_not_trail():
+    exchange = FakeExchange(0)
+    index = LiveOrderIndex()
+    monitor = PositionMonitor(index)
+
+    async def scenario():
+        brackets = await open_brackets(exchange, index, monitor, fill=False)
+        await move_mark(exchange, monitor, 0.0505)
+        await monitor.close()
+        return brackets
+
+    brackets = asyncio.run(scenario())
+    # Bez pozicije nema ni SL-a (šalje se tek posle popunjavanja ulaza)
+    assert all(b['stop_loss'] is None for b in brackets)
+    assert not open_stops(exchange)
+
+
+def test_closed_bracket_leaves_table():
+    exchange = FakeExchange(0)
+    index = LiveOrderIndex()
+    monitor = PositionMonitor(index)
+
+    async def scenario():
+        brackets = await open_brackets(exchange, index, monitor)
+        index.discard(brackets[0]['tag'])
+        await move_mark(exchange, monitor, 0.0505)
+        await monitor.close()
+        return brackets
+
+    brackets = asyncio.run(scenario())
+    assert list(monitor.table) == [brackets[1]['tag']]
+    monitor.on_position({'symbol': SYMBOL, 'contracts': 0})
+    assert not monitor.table
+
+
+class RestOnlyExchange:
+    """Klijent bez mark price stream-a (kao ccxt.async_support)."""
+
+    def __init__(self, exchange):
+        self.exchange = exchange
+
+    def __getattr__(self, name):
+        if name == 'watch_mark_price':
+            raise AttributeError(name)
+        return getattr(self.exchange, name)
+
+
+def test_trails_by_polling_without_mark_price_stream():
+    exchange = FakeExchange(0)
+    index = LiveOrderIndex()
+    monitor = PositionMonitor(index, poll_interval=0.01)
+
+    async def scenario():
+        brackets = await open_brackets(exchange, index, monitor)
+        monitor.start(RestOnlyExchange(exchange), SYMBOL)
+        exchange.set_mark_price(SYMBOL, 0.0505)
+        for _ in range(50):
+            await asyncio.sleep(0.01)
+            if len(open_stops(exchange)) == 2 and all(o['stopPrice'] == 0.05045 for o in open_stops(exchange)):
+                break
+        await monitor.close()
+        return brackets
+
+    asyncio.run(scenario())
+    assert sorted(o['stopPrice'] for o in open_stops(exchange)) == [0.05045, 0.05045]
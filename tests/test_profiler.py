@@ -0,0 +1,51 @@
+import asyncio
+import threading
+import time
+from profiler import LoopMonitor, SamplingProfiler
+
+
+def spin(stop):
+    while not stop.is_set():
+        sum(range(1000))
+
+
+def test_sampling_profiler_attributes_samples_to_target_thread():
+    stop = threading.Event()
+    worker = threading.Thread(target=spin, args=(stop,))
+    worker.start()
+    profiler = SamplingProfiler(interval=0.001, thread_id=worker.ident).start()
+    time.sleep(0.2)
+    samples = profiler.stop()
+    stop.set()
+    worker.join()
+
+    assert not profiler.running and profiler.duration >= 0.2
+    assert sum(samples.values()) > 10
+    assert all('spin (test_profiler.py' in stack for stack in samples)
+    top = profiler.top(3)
+    assert top[0]['share'] <= 1.0 and sum(row['samples'] for row in profiler.top()) == sum(samples.values())
+    lines = profiler.collapsed().splitlines()
+    assert len(lines) == len(samples) and all(line.rsplit(' ', 1)[1].isdigit() for line in lines)
+
+
+def block_loop(seconds):
+    time.sleep(seconds)
+
+
+def test_loop_monitor_records_lag_and_blocking_stack():
+    monitor = LoopMonitor(interval=0.01, threshold=0.05)
+
+    async def scenario():
+        monitor.start()
+        await asyncio.sleep(0.05)
+        block_loop(0.2)
+        await asyncio.sleep(0.05)
+        stats = monitor.stats()
+        await monitor.stop()
+        return stats
+
+    stats = asyncio.run(scenario())
+    assert stats['lag_max_ms'] >= 150
+    stall, = stats['stalls']
+    assert stall['blocked_ms'] >= 50
+    assert 'block_loop (test_profiler.py' in stall['stack']
@@ -0,0 +1,37 @@
+import os
+import tempfile
+import numpy as np
+from replay import OrderBookRecorder, OrderBookRecording
+
+
+def test_top_of_book_skips_frames_with_an_empty_side():
+    frames = [
+        (1.0, [[0.0500, 1.0], [0.0499, 2.0]], [[0.0501, 1.0]]),
+        (2.0, [], [[0.0502, 1.0]]),
+        (3.0, [[0.0498, 1.0]], []),
+        (4.0, [[0.0503, 1.0]], [[0.0504, 3.0], [0.0505, 1.0]]),
+        (5.0, [[0.0501, 1.0]], []),
+    ]
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, 'book.bin')
+        recorder = OrderBookRecorder(path)
+        for timestamp, bids, asks in frames:
+            recorder.record({'bids': bids, 'asks': asks}, timestamp=timestamp)
+        recorder.close()
+        timestamps, bids, asks = OrderBookRecording(path).top_of_book()
+
+    np.testing.assert_array_equal(timestamps, [1.0, 4.0])
+    np.testing.assert_array_equal(bids, [0.0500, 0.0503])
+    np.testing.assert_array_equal(asks, [0.0501, 0.0504])
+
+
+def test_recorder_flushes_every_n_frames():
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, 'book.bin')
+        recorder = OrderBookRecorder(path, flush_every=3, flush_interval=3600)
+        for i in range(7):
+            recorder.record({'bids': [[0.05, 1.0]], 'asks': [[0.0501, 1.0]]}, timestamp=float(i))
+        # Čitalac vidi prvih 6 zapisa pre close()
+        assert len(OrderBookRecording(path)) == 6
+        recorder.close()
+        assert len(OrderBookRecording(path)) == 7
@@ -0,0 +1,59 @@
+import asyncio
+import random
+from ccxt.async_support.base.exchange import Exchange as RestExchange
+from scanner import WallScanner, create_stream_exchange
+
+
+def test_stream_client_implements_order_book_streams():
+    async def scenario():
+        client = create_stream_exchange(600)
+        try:
+            return type(client), dict(client.has)
+        finally:
+            await client.close()
+
+    cls, has = asyncio.run(scenario())
+    # Osnovna async_support implementacija samo podiže NotSupported
+    assert cls.watch_order_book_for_symbols is not RestExchange.watch_order_book_for_symbols
+    assert has.get('watchOrderBookForSymbols')
+
+
+class StreamStub:
+    def __init__(self, count):
+        self.markets = {f"S{i}/USDT:USDT": {'active': True, 'swap': True, 'linear': True} for i in range(count)}
+        self.rng = random.Random(1)
+        self.position = {}
+
+    async def load_markets(self, reload=False, params={}):
+        return self.markets
+
+    async def watch_order_book_for_symbols(self, symbols, limit=None, params={}):
+        await asyncio.sleep(0)
+        key = tuple(symbols)
+        index = self.position.get(key, 0)
+        self.position[key] = index + 1
+        symbol = symbols[index % len(symbols)]
+        bids = [[100.0 - 0.01 * k, self.rng.random() * 10] for k in range(1, 101)]
+        asks = [[100.0 + 0.01 * k, self.rng.random() * 10] for k in range(1, 101)]
+        return {'symbol': symbol, 'bids': bids, 'asks': asks}
+
+    async def close(self):
+        pass
+
+
+def test_sweep_ranks_latest_streamed_books():
+    async def scenario():
+        scanner = WallScanner(StreamStub(120), limit=50, chunk_size=50, processes=0)
+        await scanner.sweep()
+        for _ in range(1000):
+            await asyncio.sleep(0)
+            if len(scanner.books) == 120:
+                break
+        table = await scanner.sweep()
+        await scanner.close()
+        return scanner, table
+
+    scanner, table = asyncio.run(scenario())
+    assert len(scanner.books) == 120
+    assert len(table) == 120
+    assert [row['notional'] for row in table] == sorted((row['notional'] for row in table), reverse=True)
@@ -0,0 +1,144 @@
+import asyncio
+from scheduler import ORDER, POSITION, DATA, RequestScheduler, ScheduledExchange
+
+
+class RestClient:
+    def __init__(self):
+        self.markets = None
+        self.calls = []
+
+    async def load_markets(self, reload=False, params={}):
+        self.calls.append('load_markets')
+        self.markets = {'ETH/USDT:USDT': {}}
+        return self.markets
+
+    async def fetch_funding_rate(self, symbol, params={}):
+        self.calls.append('fetch_funding_rate')
+        return {'symbol': symbol}
+
+    async def set_position_mode(self, hedged, symbol=None, params={}):
+        self.calls.append('set_position_mode')
+
+    def set_markets(self, markets, currencies=None):
+        self.markets = markets
+
+
+def test_every_rest_method_is_scheduled():
+    async def scenario():
+        exchange = ScheduledExchange(RestClient(), RequestScheduler(600))
+        await exchange.fetch_funding_rate('ETH/USDT:USDT')
+        await exchange.set_position_mode(False)
+        exchange.set_markets({'BTC/USDT:USDT': {}})
+        stats = exchange.scheduler.stats()
+        await exchange.scheduler.close()
+        return exchange, stats
+
+    exchange, stats = asyncio.run(scenario())
+    assert stats['requests'][DATA] == 1
+    assert stats['requests'][ORDER] == 1
+    assert exchange.markets == {'BTC/USDT:USDT': {}}
+
+
+def test_load_markets_is_charged_only_when_it_hits_the_exchange():
+    async def scenario():
+        client = RestClient()
+        exchange = ScheduledExchange(client, RequestScheduler(600))
+        await exchange.load_markets()
+        await exchange.load_markets()
+        await exchange.load_markets(reload=True)
+        stats = exchange.scheduler.stats()
+        await exchange.scheduler.close()
+        return client, stats
+
+    client, stats = asyncio.run(scenario())
+    assert client.calls == ['load_markets'] * 3
+    assert stats['requests'][POSITION] == 2
+
+
+class SlowClient:
+    """Beleži redosled poziva i stanje bucket-a u trenutku slanja."""
+
+    def __init__(self):
+        self.scheduler = None
+        self.calls = []
+        self.tokens = []
+
+    async def _call(self, name, result):
+        self.calls.append(name)
+        self.tokens.append((name, self.scheduler.tokens))
+        await asyncio.sleep(0.01)
+        return result
+
+    async def fetch_ticker(self, symbol, params={}):
+        return await self._call('fetch_ticker', {'symbol': symbol})
+
+    async def fetch_order_book(self, symbol, limit=None, params={}):
+        return await self._call('fetch_order_book', {'symbol': symbol, 'bids': [], 'asks': []})
+
+    async def create_order(self, symbol, type, side, amount, price=None, params={}):
+        return await self._call('create_order', {'symbol': symbol, 'side': side})
+
+
+def slow_exchange():
+    client = SlowClient()
+    exchange = ScheduledExchange(client, RequestScheduler(1200, burst=10, reserve=0.2))
+    client.scheduler = exchange.scheduler
+    return client, exchange
+
+
+def test_orders_jump_queued_reads_when_budget_is_low():
+    async def scenario():
+        client, exchange = slow_exchange()
+        reads = [asyncio.create_task(exchange.fetch_ticker(f'S{i}/USDT:USDT')) for i in range(12)]
+        # Bucket 10, rezerva 2: read zahtevi troše samo 8, ostali čekaju dopunu
+        while len(client.calls) < 8:
+            await asyncio.sleep(0.001)
+        orders = [asyncio.create_task(exchange.create_order('ETH/USDT:USDT', 'limit', side, 1, 100))
+                  for side in ('buy', 'sell')]
+        await asyncio.gather(*reads, *orders)
+        stats = exchange.scheduler.stats()
+        await exchange.scheduler.close()
+        return client, stats
+
+    client, stats = asyncio.run(scenario())
+    assert client.calls == ['fetch_ticker'] * 8 + ['create_order'] * 2 + ['fetch_ticker'] * 4
+    assert stats['requests'] == {ORDER: 2, POSITION: 0, DATA: 12}
+    # Nalozi ne čekaju dopunu, read zahtevi čekaju
+    assert stats['max_wait'][ORDER] < 0.05
+    assert stats['max_wait'][DATA] > stats['max_wait'][ORDER]
+
+
+def test_reads_never_spend_the_order_reserve():
+    async def scenario():
+        client, exchange = slow_exchange()
+        reads = [asyncio.create_task(exchange.fetch_ticker(f'S{i}/USDT:USDT')) for i in range(8)]
+        while len(client.calls) < 8:
+            await asyncio.sleep(0.001)
+        await exchange.create_order('ETH/USDT:USDT', 'limit', 'buy', 1, 100)
+        await exchange.create_order('ETH/USDT:USDT', 'limit', 'sell', 1, 100)
+        await asyncio.gather(*reads)
+        await exchange.scheduler.close()
+        return client, exchange.scheduler.reserve
+
+    client, reserve = asyncio.run(scenario())
+    reads = [tokens for name, tokens in client.tokens if name == 'fetch_ticker']
+    orders = [tokens for name, tokens in client.tokens if name == 'create_order']
+    assert min(reads) >= reserve - 1e-9
+    assert min(orders) < reserve
+
+
+def test_identical_reads_in_flight_are_coalesced():
+    async def scenario():
+        client, exchange = slow_exchange()
+        books = await asyncio.gather(*[exchange.fetch_order_book('ETH/USDT:USDT', 50) for _ in range(5)],
+                                     exchange.fetch_order_book('BTC/USDT:USDT', 50))
+        stats = exchange.scheduler.stats()
+        await exchange.scheduler.close()
+        return client, books, stats
+
+    client, books, stats = asyncio.run(scenario())
+    assert client.calls == ['fetch_order_book'] * 2
+    assert stats['coalesced'] == 4
+    assert stats['requests'][DATA] == 2
+    assert all(book is books[0] for book in books[:5])
+    assert books[5]['symbol'] == 'BTC/USDT:USDT'
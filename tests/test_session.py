@@ -0,0 +1,86 @@
+import asyncio
+import os
+from fake_exchange import FakeExchange
+from session import ExchangeSession, MarketCache
+
+MARKETS = {'ETH/USDT:USDT': {'symbol': 'ETH/USDT:USDT', 'precision': {'price': 0.01}}}
+
+
+class MarketExchange(FakeExchange):
+    def __init__(self):
+        super().__init__(0)
+        self.markets = None
+        self.currencies = None
+        self.closed = False
+
+    async def load_markets(self, reload=False):
+        await self._round_trip('load_markets')
+        self.markets, self.currencies = dict(MARKETS), {'USDT': {}}
+        return self.markets
+
+    def set_markets(self, markets, currencies=None):
+        self.markets, self.currencies = markets, currencies
+
+    async def close(self):
+        self.closed = True
+
+
+def counting_factory(created):
+    def factory():
+        created.append(MarketExchange())
+        return created[-1]
+    return factory
+
+
+def calls(exchange, method):
+    return sum(1 for name, _ in exchange.requests if name == method)
+
+
+def test_session_reuses_client_and_market_cache(tmp_path):
+    path = str(tmp_path / 'markets.json')
+    created = []
+
+    async def scenario():
+        session = ExchangeSession(counting_factory(created), path)
+        first, second = await asyncio.gather(session.get(), session.get())
+        assert first is second and await session.get() is first
+        await session.close()
+        assert first.closed and session.exchange is None
+        # Nova sesija (npr. posle restarta) čita markete iz svežeg keša
+        restarted = ExchangeSession(counting_factory(created), path)
+        client = await restarted.get()
+        await restarted.close()
+        return client
+
+    client = asyncio.run(scenario())
+    assert len(created) == 2
+    assert calls(created[0], 'load_markets') == 1 and os.path.exists(path)
+    assert calls(client, 'load_markets') == 0 and client.markets == MARKETS
+
+
+def test_expired_market_cache_is_not_used(tmp_path):
+    cache = MarketCache(str(tmp_path / 'markets.json'), ttl=60.0)
+    cache.save(MARKETS, {})
+    assert cache.load() == (MARKETS, {})
+    os.utime(cache.path, (0, 0))
+    assert cache.load() is None and cache.expires_in() == 0.0
+    assert not cache.apply(MarketExchange())
+
+
+def test_configure_skips_repeated_leverage_and_margin_calls(tmp_path):
+    created = []
+
+    async def scenario():
+        session = ExchangeSession(counting_factory(created), str(tmp_path / 'markets.json'))
+        exchange = await session.get()
+        results = [await session.configure('ETH/USDT:USDT', 5),
+                   await session.configure('ETH/USDT:USDT', 5),
+                   await session.configure('ETH/USDT:USDT', 10)]
+        await session.close()
+        # Posle close() nova sesija ponovo postavlja leverage
+        results.append(await session.configure('ETH/USDT:USDT', 10, exchange=exchange))
+        return exchange, results
+
+    exchange, results = asyncio.run(scenario())
+    assert results == [True, False, True, True]
+    assert calls(exchange, 'set_leverage') == 3 and calls(exchange, 'set_margin_mode') == 3
@@ -0,0 +1,64 @@
+import asyncio
+import tempfile
+import os
+from state import StateStore
+
+
+async def wait_connected(client):
+    for _ in range(100):
+        if client.connected:
+            return
+        await asyncio.sleep(0.01)
+    raise AssertionError("replika se nije povezala")
+
+
+def test_command_round_trip():
+    async def handler(command, args):
+        if command == 'fail':
+            raise ValueError("nalog odbijen")
+        await asyncio.sleep(0.01)
+        return {'command': command, 'symbol': args.get('symbol')}
+
+    async def scenario(directory):
+        socket_path = os.path.join(directory, 'state.sock')
+        server = StateStore(os.path.join(directory, 'server.json'))
+        server.set_command_handler(handler)
+        await server.serve(socket_path)
+        client = StateStore(os.path.join(directory, 'client.json'))
+        await client.connect(socket_path, retry_delay=0.01)
+        await wait_connected(client)
+        try:
+            ok = await client.request('close_position', {'symbol': 'ETH/USDT:USDT'})
+            failed = await client.request('fail')
+            client.update({'manual': 'on'})
+            await asyncio.sleep(0.05)
+            manual = server.get('manual')
+        finally:
+            await server.close()
+            await client.close()
+        return ok, failed, manual
+
+    with tempfile.TemporaryDirectory() as directory:
+        ok, failed, manual = asyncio.run(scenario(directory))
+    assert ok == {'status': 'success', 'result': {'command': 'close_position', 'symbol': 'ETH/USDT:USDT'}}
+    assert failed == {'status': 'error', 'message': 'nalog odbijen'}
+    assert manual == 'on'
+
+
+def test_request_without_owner_fails_fast():
+    async def scenario(directory):
+        client = StateStore(os.path.join(directory, 'client.json'))
+        await client.connect(os.path.join(directory, 'missing.sock'), retry_delay=0.01)
+        try:
+            assert not client.connected
+            await client.request('close_position')
+        finally:
+            await client.close()
+
+    with tempfile.TemporaryDirectory() as directory:
+        try:
+            asyncio.run(scenario(directory))
+        except ConnectionError:
+            pass
+        else:
+            raise AssertionError("request bez veze mora da podigne ConnectionError")
@@ -0,0 +1,63 @@
+import numpy as np
+from decimal import Decimal
+from config import PRICE_PRECISION
+
+# ccxt precisionMode konstante (ccxt.DECIMAL_PLACES, ccxt.TICK_SIZE)
+DECIMAL_PLACES = 2
+TICK_SIZE = 4
+
+
+class TickScale:
+    """Pretvaranje cena u celobrojne tikove i nazad za jedan market.
+
+    Interno se cene drže kao int64 broj tikova (cena / tick_size), pa su
+    pomeraji za SL/TP, poređenja i "poslednja cifra" celobrojna aritmetika.
+    U float se vraća samo na granici (slanje naloga, izlaz signala).
+    Poslednja cifra se računa na `digit_precision` decimala, podrazumevano
+    na decimalama tika (0.01 -> cifra stotih delova), pa važi za svaki market.
+    """
+
+    def __init__(self, tick_size=10 ** -PRICE_PRECISION, digit_precision=None):
+        self.tick_size = float(tick_size)
+        # Broj decimala tika (0.00001 -> 5, 0.01 -> 2, 0.5 -> 1)
+        self.decimals = max(0, -Decimal(repr(self.tick_size)).normalize().as_tuple().exponent)
+        self.digit_precision = self.decimals if digit_precision is None else digit_precision
+        unit = 10 ** -self.digit_precision
+        ratio = self.tick_size / unit
+        # Koliko jedinica poslednje cifre ima u jednom tiku (ili obrnuto ako je tik sitniji)
+        self._units_per_tick = int(round(ratio)) if ratio >= 1 else None
+        self._ticks_per_unit = int(round(1 / ratio)) if ratio < 1 else None
+
+    @classmethod
+    def from_market(cls, market, precision_mode=TICK_SIZE):
+        """Pravi skalu iz ccxt market-a (exchange.precisionMode; binance koristi TICK_SIZE)."""
+        tick = (market.get('precision') or {}).get('price')
+        if not tick:
+            return cls()
+        if precision_mode == DECIMAL_PLACES:
+            tick = 10 ** -int(tick)
+        return cls(tick)
+
+    def to_ticks(self, prices):
+        """Cena (ili niz cena) -> int64 tikovi, zaokruženo na najbliži tik (pola tika naviše)."""
+        # np.rint zaokružuje pola na parno, što bi prosečne cene na pola tika gomilalo na parnim ciframa
+        ticks = np.floor(np.asarray(prices, dtype=float) / self.tick_size + 0.5).astype(np.int64)
+        return ticks if ticks.ndim else int(ticks)
+
+    def offset(self, distance):
+        """Udaljenost u ceni (npr. STOP_LOSS_OFFSET) -> broj tikova, najmanje 1."""
+        return max(1, int(round(distance / self.tick_size)))
+
+    def to_price(self, ticks):
+        """Tikovi -> float cena zaokružena na decimale tika (za slanje naloga)."""
+        prices = np.round(np.asarray(ticks, dtype=np.int64) * self.tick_size, self.decimals)
+        return prices.tolist() if prices.ndim else float(prices)
+
+    def last_digit(self, ticks):
+        """Poslednja cifra cene na digit_precision decimala, celobrojno."""
+        ticks = np.asarray(ticks, dtype=np.int64)
+        if self._units_per_tick is not None:
+            units = ticks * self._units_per_tick
+        else:
+            units = (ticks + self._ticks_per_unit // 2) // self._ticks_per_unit
+        return units % 10